@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+批量报告生成：一次生成多个系统、多个周期的HTML或DOCX报告
+功能：相同 (系统, 周期) 的任务共享一次取数，各数据并发获取；
+     HTML报告先查报告缓存，未命中时渲染并写入缓存；渲染和写文件提交到服务共用的渲染执行器，
+     与其他请求共用并发上限、排队和拒绝策略（REPORT_RENDER_*）及阶段指标，返回包含各任务耗时的清单
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from template_engine import build_template_values, build_template_rows
+from report_writer import ReportWriter
+from docx_report import DocxTemplateLoader, build_docx_values
+from period_engine import PERIOD_TYPES
+
+
+OUTPUT_FORMATS = ("html", "docx")
+
+# 工作进程内的DOCX模板缓存：模板路径 -> 加载器
+_docx_templates: Dict[str, DocxTemplateLoader] = {}
+
+
+def _render_docx_to_file(template_path: str, values: Dict[str, str], rows: Dict[str, List[Dict[str, str]]],
+                         writer: ReportWriter, output_path: str, output_dir: Optional[str]) -> Tuple[float, int]:
+    """在渲染执行器中根据Word模板生成DOCX报告，返回 (耗时毫秒, 字节数)"""
+    started = time.perf_counter()
+    loader = _docx_templates.get(template_path)
+    if loader is None:
+        loader = _docx_templates[template_path] = DocxTemplateLoader(template_path)
+    template = loader.get()
+    writer.write_with(output_path, lambda f: template.write(f, values, rows), output_dir)
+    return round((time.perf_counter() - started) * 1000, 2), os.path.getsize(output_path)
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+class BatchReportRunner:
+    """批量报告生成器
+
+    渲染使用生成器的渲染执行器（REPORT_RENDER_MODE 为 process 时在其进程池中渲染），不另建进程池；
+    同一批任务同时提交的渲染不超过执行器的并发上限，批量任务不会占满排队名额而拒绝其他请求。
+    """
+
+    def __init__(self, generator):
+        self.generator = generator
+
+    def resolve_job(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """解析任务：{"system_name": ..., "report_type": "week|month|quarter|year|fiscal_quarter|fiscal_year"} 或 {"system_name": ..., "start_date": ..., "end_date": ...}，
+        可选 "output_format": "html|docx"
+        """
+        system_name = job.get("system_name") or None
+        output_format = job.get("output_format", "html")
+        if output_format not in OUTPUT_FORMATS:
+            raise Exception(f"不支持的输出格式: {output_format}")
+        if job.get("start_date") or job.get("end_date"):
+            report_type = "custom"
+            period = self.generator.get_custom_period(job.get("start_date", ""), job.get("end_date", ""))
+        else:
+            report_type = job.get("report_type", "week")
+            if report_type not in PERIOD_TYPES:
+                raise Exception(f"不支持的报告类型: {report_type}")
+            period = self.generator.get_time_period(report_type)
+        return {"system_name": system_name, "report_type": report_type, "period": period,
+                "output_format": output_format}
+
+    async def run(self, jobs: List[Dict[str, Any]], output_dir: Optional[str] = None) -> Dict[str, Any]:
+        """执行批量任务，返回清单；output_dir 为空时使用报告写入器的输出目录"""
+        started = time.perf_counter()
+
+        entries: List[Dict[str, Any]] = []
+        resolved: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        for job in jobs:
+            entry = {"system_name": job.get("system_name"), "report_type": job.get("report_type"),
+                     "status": "failed", "output_path": None}
+            entries.append(entry)
+            try:
+                resolved_job = self.resolve_job(job)
+            except Exception as e:
+                entry["error"] = str(e)
+                continue
+            entry["report_type"] = resolved_job["report_type"]
+            entry["output_format"] = resolved_job["output_format"]
+            entry["period"] = resolved_job["period"]["period"]
+            resolved.append((entry, resolved_job))
+
+        # 重复任务复用同一份报告：(系统, 周期, 输出格式) -> 任务
+        render_jobs: Dict[Tuple[Optional[str], str, str], Dict[str, Any]] = {}
+        for _, resolved_job in resolved:
+            key = (resolved_job["system_name"], resolved_job["period"]["period"], resolved_job["output_format"])
+            render_jobs.setdefault(key, resolved_job)
+
+        # HTML报告先查报告缓存，命中的不再取数和渲染
+        generator = self.generator
+        metrics = generator.metrics
+
+        async def lookup(resolved_job: Dict[str, Any]):
+            key, template = await generator._report_key(resolved_job["report_type"], resolved_job["system_name"],
+                                                        resolved_job["period"])
+            return key, template, await generator.report_cache.get_async(key)
+
+        html_keys = [key for key in render_jobs if key[2] == "html"]
+        lookups = dict(zip(html_keys, await asyncio.gather(
+            *(lookup(render_jobs[key]) for key in html_keys), return_exceptions=True)))
+        for key, result in lookups.items():
+            if not isinstance(result, BaseException):
+                metrics.increment("cache_hits" if result[2] is not None else "cache_misses")
+
+        # 需要渲染的 (系统, 周期) 只取数一次，所有取数并发进行
+        fetch_keys = {}
+        for key, resolved_job in render_jobs.items():
+            result = lookups.get(key)
+            if result is None or isinstance(result, BaseException) or result[2] is None:
+                fetch_keys.setdefault(key[:2], resolved_job)
+
+        async def fetch(resolved_job: Dict[str, Any]):
+            fetch_started = time.perf_counter()
+            try:
+                data = await self.generator.fetch_data(resolved_job["period"], resolved_job["system_name"])
+                return data, None, _elapsed_ms(fetch_started)
+            except Exception as e:
+                return None, str(e), _elapsed_ms(fetch_started)
+
+        fetched = dict(zip(fetch_keys, await asyncio.gather(*(fetch(job) for job in fetch_keys.values()))))
+
+        # 渲染和写文件提交到渲染执行器，同时提交的数量不超过其并发上限
+        executor = generator.render_executor
+        writer = generator.report_writer
+        slots = asyncio.Semaphore(executor.max_concurrency)
+
+        async def render_html(key: Tuple, template, data: Dict[str, Any], period: Dict[str, Any],
+                              system_name: Optional[str]) -> Dict[str, Any]:
+            with metrics.stage("render") as timing:
+                content = await executor.render(template, build_template_values(data, period),
+                                                build_template_rows(data))
+                timing.bytes = len(content.encode("utf-8"))
+            return await generator._store_report(key, content, period, system_name)
+
+        async def render(key: Tuple[Optional[str], str, str], output_path: str) -> Tuple[float, int]:
+            resolved_job = render_jobs[key]
+            system_name, period = resolved_job["system_name"], resolved_job["period"]
+            async with slots:
+                render_started = time.perf_counter()
+                if key[2] == "docx":
+                    data = fetched[key[:2]][0]
+                    with metrics.stage("docx_write") as timing:
+                        _, timing.bytes = await executor.run(
+                            _render_docx_to_file, generator.docx_template_path,
+                            build_docx_values(data, period, system_name), build_template_rows(data),
+                            writer, output_path, output_dir,
+                        )
+                    return _elapsed_ms(render_started), timing.bytes
+                report_key, template, cached = lookups[key]
+                if cached is None:
+                    # 与并发的单个报告请求共享一次渲染
+                    cached = await generator.single_flight.do(
+                        ("report",) + report_key,
+                        lambda: render_html(report_key, template, fetched[key[:2]][0], period, system_name))
+                with metrics.stage("write") as timing:
+                    timing.bytes = len(cached["content"].encode("utf-8"))
+                    await executor.call(writer.write, cached["content"], output_path, True, output_dir)
+                return _elapsed_ms(render_started), timing.bytes
+
+        renders: Dict[Tuple[Optional[str], str, str], Tuple[str, "asyncio.Task"]] = {}
+        tasks = []
+        for entry, resolved_job in resolved:
+            system_name, period = resolved_job["system_name"], resolved_job["period"]
+            key = (system_name, period["period"], resolved_job["output_format"])
+            lookup_result = lookups.get(key)
+            if isinstance(lookup_result, BaseException):
+                entry["error"] = str(lookup_result)
+                continue
+            if lookup_result is not None and lookup_result[2] is not None:
+                entry["cached"] = True
+            else:
+                data, error, entry["fetch_ms"] = fetched[key[:2]]
+                if error is not None:
+                    entry["error"] = error
+                    continue
+            if key not in renders:
+                output_path = writer.path_for(system_name, period, output_dir,
+                                              suffix=f".{resolved_job['output_format']}")
+                renders[key] = output_path, asyncio.ensure_future(render(key, output_path))
+            entry["output_path"], task = renders[key]
+            tasks.append((entry, task))
+
+        for entry, task in tasks:
+            try:
+                entry["render_ms"], entry["bytes"] = await task
+                entry["status"] = "ok"
+            except Exception as e:
+                entry["output_path"] = None
+                entry["error"] = str(e)
+
+        for entry in entries:
+            entry["total_ms"] = round(entry.get("fetch_ms", 0) + entry.get("render_ms", 0), 2)
+
+        succeeded = sum(1 for entry in entries if entry["status"] == "ok")
+        return {
+            "jobs": len(entries),
+            "succeeded": succeeded,
+            "failed": len(entries) - succeeded,
+            "data_fetches": len(fetch_keys),
+            "workers": executor.max_concurrency,
+            "elapsed_ms": _elapsed_ms(started),
+            "reports": entries,
+        }
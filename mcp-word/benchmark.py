@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+基准测试：测量报告生成流水线各阶段的性能
+功能：覆盖模板加载、时间周期计算、数据获取、图表绘制、变量替换、完整报告生成、流式生成和保存报告，
+     统计延迟分位数、吞吐量和内存峰值；按模板规模和服务类别数量组合场景，
+     结果保存为JSON，可在不同提交之间对比
+
+用法：
+    python benchmark.py                        # 完整场景，结果保存到 benchmark_results/
+    python benchmark.py --quick                # 少量场景和迭代次数
+    python benchmark.py --compare 旧.json 新.json  # 对比两次结果的延迟中位数
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional
+
+from data_providers import DataProvider, METRIC_GROUPS
+from latency_stats import percentile
+from report_cache import ReportCache
+from report_writer import ReportWriter
+from streaming_main import StreamingReportGenerator
+from svg_charts import ChartCache, category_chart, trend_chart
+from template_engine import CompiledTemplate, build_template_values, build_template_rows
+from template_registry import TemplateRegistry, DEFAULT_TEMPLATE
+
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "统建系统运维服务周月报模板-20251110.html")
+RESULTS_DIR = "benchmark_results"
+
+FULL_SCENARIOS = {"template_scales": [1, 4, 16], "category_counts": [9, 100, 1000]}
+QUICK_SCENARIOS = {"template_scales": [1, 4], "category_counts": [9, 100]}
+
+# 中位数变化超过该比例时标记为退化
+REGRESSION_THRESHOLD = 0.10
+
+
+class StaticDataProvider(DataProvider):
+    """固定数据源：排除数据源本身的波动，只测量生成流水线"""
+
+    def __init__(self, category_count: int):
+        self.data = {
+            "total_service": 120, "service_request": 70, "incident": 3, "approval": 47,
+            "self_service": 30, "manual_service": 40, "previous_total": 100, "change_rate": 20.0,
+            "resolution_rate": 98, "completion_rate": 97, "timeliness_rate": 96.5, "satisfaction_rate": 99,
+            "unresolved_current": 2, "unresolved_history": 4, "knowledge_base": 1,
+            "service_categories": [{"name": f"装备调度管理系统/类别{index:04d}", "count": index % 37 + 1, "percentage": 0}
+                                   for index in range(category_count)],
+            "trend_series": [{"period": f"第{index + 1}周", "label": f"第{index + 1}周", "total": 100 + index % 5 * 5,
+                              "change_rate": None} for index in range(13)],
+        }
+
+    async def fetch_group(self, group: str, period: Dict[str, Any], system_name: Optional[str]) -> Dict[str, Any]:
+        # 类别列表和趋势序列会被补全派生字段，返回副本
+        return {field: [dict(item) for item in self.data[field]] if isinstance(self.data[field], list) else self.data[field]
+                for field in METRIC_GROUPS[group]}
+
+    async def fingerprint(self, period: Dict[str, Any], system_name: Optional[str] = None) -> str:
+        return "static"
+
+
+def scale_template(source: str, scale: int) -> str:
+    """把模板正文的各章节重复 scale 次，得到更大的模板"""
+    start = source.index('<div class="section">')
+    end = source.index('<div class="footer">')
+    return source[:start] + source[start:end] * scale + source[end:]
+
+
+def measure(func: Callable[[], Any], iterations: int, warmup: int) -> Dict[str, Any]:
+    """测量 func 的延迟分布、吞吐量和单次调用的内存峰值"""
+    for _ in range(warmup):
+        func()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter_ns()
+        func()
+        latencies.append((time.perf_counter_ns() - call_started) / 1e6)
+    elapsed = time.perf_counter() - started
+
+    # tracemalloc 会拖慢执行，内存峰值单独测量
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "iterations": iterations,
+        "min_ms": round(latencies[0], 4),
+        "p50_ms": round(percentile(latencies, 0.50), 4),
+        "p95_ms": round(percentile(latencies, 0.95), 4),
+        "p99_ms": round(percentile(latencies, 0.99), 4),
+        "max_ms": round(latencies[-1], 4),
+        "mean_ms": round(statistics.fmean(latencies), 4),
+        "ops_per_sec": round(iterations / elapsed, 2) if elapsed > 0 else None,
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def run_scenario(template_scale: int, category_count: int, iterations: int, warmup: int,
+                 work_dir: str) -> List[Dict[str, Any]]:
+    """在一个场景下测量所有阶段"""
+    with open(TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+        source = scale_template(f.read(), template_scale)
+    template_path = os.path.join(work_dir, f"template_x{template_scale}.html")
+    with open(template_path, 'w', encoding='utf-8') as f:
+        f.write(source)
+
+    # 不缓存报告，每次都走完整流水线
+    generator = StreamingReportGenerator(
+        template_path,
+        report_cache=ReportCache(max_entries=0),
+        data_provider=StaticDataProvider(category_count),
+        report_writer=ReportWriter(os.path.join(work_dir, f"reports_x{template_scale}_c{category_count}")),
+    )
+    # 流水线各阶段测量完整渲染，章节片段缓存的效果单独测量
+    generator.compiled_template.fragment_cache = None
+    cached_template = CompiledTemplate(source)
+    loop = asyncio.new_event_loop()
+    period = generator.get_time_period("week")
+    data = loop.run_until_complete(generator.fetch_data(period))
+    content = generator.generate_report("week")
+    counter = iter(range(10 ** 9))
+
+    async def consume_stream():
+        async for _ in generator.generate_report_streaming("week"):
+            pass
+
+    stages: Dict[str, Callable[[], Any]] = {
+        "template_load": lambda: TemplateRegistry().register(DEFAULT_TEMPLATE, template_path),
+        "get_time_period": lambda: generator.get_time_period("week"),
+        "fetch_data": lambda: loop.run_until_complete(generator.fetch_data(period)),
+        # 每次使用新的图表缓存，测量实际绘制的开销
+        "render_charts": lambda: (trend_chart(data["trend_series"], ChartCache()),
+                                  category_chart(data["service_categories"], ChartCache())),
+        "replace_template_variables": lambda: generator.replace_template_variables(
+            generator.template_content, data, period),
+        "replace_template_variables_cached": lambda: cached_template.render(
+            build_template_values(data, period), build_template_rows(data)),
+        "generate_report": lambda: loop.run_until_complete(generator.generate_report_async("week")),
+        "generate_report_streaming": lambda: loop.run_until_complete(consume_stream()),
+        # 每次保存不同的内容，避免内容寻址去重使写入变成创建链接
+        "save_report": lambda: generator.save_report(f"{content}<!-- {next(counter)} -->"),
+    }
+
+    results = []
+    try:
+        for stage, func in stages.items():
+            result = {
+                "scenario": f"template_x{template_scale}_categories_{category_count}",
+                "template_scale": template_scale,
+                "category_count": category_count,
+                "template_bytes": len(source.encode("utf-8")),
+                "report_bytes": len(content.encode("utf-8")),
+                "stage": stage,
+            }
+            result.update(measure(func, iterations, warmup))
+            results.append(result)
+    finally:
+        loop.close()
+        generator.render_executor.shutdown()
+    return results
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(quick: bool = False, iterations: Optional[int] = None, warmup: int = 5) -> Dict[str, Any]:
+    """运行全部场景，返回结果"""
+    scenarios = QUICK_SCENARIOS if quick else FULL_SCENARIOS
+    iterations = iterations or (30 if quick else 200)
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for template_scale in scenarios["template_scales"]:
+            for category_count in scenarios["category_counts"]:
+                results.extend(run_scenario(template_scale, category_count, iterations, warmup, work_dir))
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "iterations": iterations,
+            "warmup": warmup,
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def compare(base: Dict[str, Any], head: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """按 (场景, 阶段) 对比延迟中位数，返回变化列表"""
+    base_results = {(result["scenario"], result["stage"]): result for result in base["results"]}
+    changes = []
+    for result in head["results"]:
+        previous = base_results.get((result["scenario"], result["stage"]))
+        if previous is None or not previous["p50_ms"]:
+            continue
+        change = (result["p50_ms"] - previous["p50_ms"]) / previous["p50_ms"]
+        changes.append({
+            "scenario": result["scenario"],
+            "stage": result["stage"],
+            "base_p50_ms": previous["p50_ms"],
+            "head_p50_ms": result["p50_ms"],
+            "change": round(change, 4),
+            "regression": change > REGRESSION_THRESHOLD,
+        })
+    return changes
+
+
+def print_results(report: Dict[str, Any]):
+    print(f"{'场景':<32}{'阶段':<28}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'ops/s':>12}{'峰值(KB)':>10}")
+    for result in report["results"]:
+        print(f"{result['scenario']:<32}{result['stage']:<28}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}"
+              f"{result['p99_ms']:>10.3f}{result['ops_per_sec'] or 0:>12.1f}{result['peak_memory_kb']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="报告生成流水线基准测试")
+    parser.add_argument("--quick", action="store_true", help="只运行少量场景和迭代次数")
+    parser.add_argument("--iterations", type=int, help="每个阶段的迭代次数")
+    parser.add_argument("--warmup", type=int, default=5, help="每个阶段的预热次数")
+    parser.add_argument("--output", help="结果文件路径，默认 benchmark_results/<时间>_<提交>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="对比两次结果")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        with open(args.compare[1], 'r', encoding='utf-8') as f:
+            head = json.load(f)
+        changes = compare(base, head)
+        for change in changes:
+            flag = "  ← 退化" if change["regression"] else ""
+            print(f"{change['scenario']:<32}{change['stage']:<28}{change['base_p50_ms']:>10.3f}"
+                  f"{change['head_p50_ms']:>10.3f}{change['change'] * 100:>+9.1f}%{flag}")
+        sys.exit(1 if any(change["regression"] for change in changes) else 0)
+
+    report = run_benchmarks(args.quick, args.iterations, args.warmup)
+    print_results(report)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{report['meta']['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存至: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+数据源：异步获取报告数据
+功能：按指标组并发获取数据，提供模拟数据、本地文件和HTTP接口三种实现；
+     HTTP实现使用连接池，支持单次请求超时和失败重试，等待期间不阻塞事件循环
+"""
+
+import asyncio
+import json
+import os
+import random
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, List
+
+import httpx
+
+from period_engine import format_period, get_period_engine
+
+
+# 指标组 -> 字段，各组相互独立，可并发获取
+METRIC_GROUPS: Dict[str, List[str]] = {
+    "volume": ["total_service", "service_request", "incident", "approval", "self_service", "manual_service"],
+    "trend": ["previous_total", "change_rate", "trend_series"],
+    "indicators": ["resolution_rate", "completion_rate", "timeliness_rate", "satisfaction_rate"],
+    "backlog": ["unresolved_current", "unresolved_history", "knowledge_base"],
+    "categories": ["service_categories"],
+}
+
+# 数据源可以不提供的字段及其默认值
+OPTIONAL_FIELDS: Dict[str, Any] = {
+    "trend_series": [],
+}
+
+
+def change_rate(total: int, previous_total: int) -> float:
+    """环比变化率（%），上一周期为 0 时记为 0"""
+    return round((total - previous_total) / previous_total * 100, 1) if previous_total else 0.0
+
+
+def build_trend_series(periods: List[Dict[str, Any]], totals: List[int]) -> List[Dict[str, Any]]:
+    """由周期（按时间先后）和对应的服务总量组装趋势序列，每项含与前一周期相比的变化率"""
+    series = []
+    previous = None
+    for period, total in zip(periods, totals):
+        text = period.get("period") or format_period(period["start_date"], period["end_date"])
+        series.append({
+            "period": text,
+            "label": period.get("label", text),
+            "total": total,
+            "change_rate": change_rate(total, previous) if previous is not None else None,
+        })
+        previous = total
+    return series
+
+
+def finalize_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """补全派生字段：计算各服务类别的占比；有趋势序列时上一周期总量和变化率以序列为准"""
+    service_categories = data.get("service_categories", [])
+    total_count = sum(category["count"] for category in service_categories)
+    for category in service_categories:
+        category["percentage"] = round((category["count"] / total_count) * 100, 2) if total_count > 0 else 0
+
+    trend_series = data.get("trend_series")
+    if trend_series and "total_service" in data:
+        # 各指标组分别获取，序列末项（本期）与服务总量对齐
+        current = trend_series[-1]
+        current["total"] = data["total_service"]
+        if len(trend_series) > 1:
+            data["previous_total"] = trend_series[-2]["total"]
+            current["change_rate"] = change_rate(current["total"], data["previous_total"])
+            data["change_rate"] = current["change_rate"]
+    return data
+
+
+class DataProvider(ABC):
+    """数据源基类：子类实现 fetch_group，按指标组返回字段"""
+
+    async def fetch(self, period: Dict[str, Any], system_name: Optional[str] = None) -> Dict[str, Any]:
+        """并发获取所有指标组并合并为报告数据"""
+        results = await asyncio.gather(
+            *(self.fetch_group(group, period, system_name) for group in METRIC_GROUPS)
+        )
+        data: Dict[str, Any] = {}
+        for result in results:
+            data.update(result)
+        return finalize_data(data)
+
+    @abstractmethod
+    async def fetch_group(self, group: str, period: Dict[str, Any], system_name: Optional[str]) -> Dict[str, Any]:
+        """获取一个指标组的字段"""
+
+    async def fingerprint(self, period: Dict[str, Any], system_name: Optional[str] = None) -> str:
+        """数据指纹，数据源内容变化时应随之变化"""
+        return ""
+
+    async def aclose(self):
+        """释放数据源在当前事件循环上占用的资源"""
+
+
+class MockDataProvider(DataProvider):
+    """模拟数据源：返回随机数据，趋势序列的本期总量、上一周期总量和变化率相互一致"""
+
+    async def fetch_group(self, group: str, period: Dict[str, Any], system_name: Optional[str]) -> Dict[str, Any]:
+        if group == "volume":
+            return {
+                "total_service": random.randint(50, 150),
+                "service_request": random.randint(20, 80),
+                "incident": random.randint(0, 5),
+                "approval": random.randint(20, 70),
+                "self_service": random.randint(10, 40),
+                "manual_service": random.randint(15, 50),
+            }
+        if group == "trend":
+            periods = get_period_engine().trend(period)
+            totals = [random.randint(40, 140) for _ in periods]
+            return {
+                "previous_total": totals[-2] if len(totals) > 1 else 0,
+                "change_rate": 0.0,
+                "trend_series": build_trend_series(periods, totals),
+            }
+        if group == "indicators":
+            return {
+                "resolution_rate": random.randint(95, 100),
+                "completion_rate": random.randint(95, 100),
+                "timeliness_rate": random.randint(95, 100),
+                "satisfaction_rate": random.randint(95, 100),
+            }
+        if group == "backlog":
+            return {
+                "unresolved_current": random.randint(0, 10),
+                "unresolved_history": random.randint(0, 15),
+                "knowledge_base": random.randint(0, 5),
+            }
+        # 生成随机的服务类别数据
+        return {
+            "service_categories": [
+                {"name": "装备调度管理系统/问题答疑/系统功能类", "count": random.randint(10, 40), "percentage": 0},
+                {"name": "装备调度管理系统/问题答疑/流程类", "count": random.randint(3, 15), "percentage": 0},
+                {"name": "装备调度管理系统/问题答疑/业务类", "count": random.randint(5, 20), "percentage": 0},
+                {"name": "装备调度管理系统/系统BUG", "count": random.randint(5, 25), "percentage": 0},
+                {"name": "装备调度管理系统/数据修改/装备信息数据修改", "count": random.randint(0, 5), "percentage": 0},
+                {"name": "装备调度管理系统/权限开通/账号开通", "count": random.randint(1, 8), "percentage": 0},
+                {"name": "装备调度管理系统/权限开通/功能调整", "count": random.randint(0, 5), "percentage": 0},
+                {"name": "装备调度管理系统/问题答疑/财务云资产卡片推送", "count": random.randint(0, 3), "percentage": 0},
+                {"name": "装备调度管理系统/权限开通/管理员申请", "count": random.randint(0, 3), "percentage": 0}
+            ]
+        }
+
+    async def fingerprint(self, period: Dict[str, Any], system_name: Optional[str] = None) -> str:
+        # 模拟数据没有版本信息，在缓存有效期内视为不变
+        return "mock"
+
+
+class FileDataProvider(DataProvider):
+    """本地文件数据源：离线开发和测试时替代真实接口
+
+    文件为JSON格式，顶层是完整的报告数据字段；
+    可选的 "systems" 字段按系统名称提供覆盖数据。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._cache_key = None
+        self._content: Dict[str, Any] = {}
+
+    def _load(self) -> Dict[str, Any]:
+        stat = os.stat(self.path)
+        cache_key = (stat.st_mtime_ns, stat.st_size)
+        if cache_key != self._cache_key:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._content = json.load(f)
+            self._cache_key = cache_key
+        return self._content
+
+    async def fetch_group(self, group: str, period: Dict[str, Any], system_name: Optional[str]) -> Dict[str, Any]:
+        try:
+            content = await asyncio.to_thread(self._load)
+        except FileNotFoundError:
+            raise Exception(f"数据文件不存在: {self.path}")
+        data = dict(content)
+        data.update(content.get("systems", {}).get(system_name, {}))
+        result = {}
+        for field in METRIC_GROUPS[group]:
+            value = data.get(field, OPTIONAL_FIELDS[field]) if field in OPTIONAL_FIELDS else data[field]
+            # 类别列表和趋势序列会被补全派生字段，返回副本避免修改文件缓存
+            if field in ("service_categories", "trend_series"):
+                value = [dict(item) for item in value]
+            result[field] = value
+        return result
+
+    async def fingerprint(self, period: Dict[str, Any], system_name: Optional[str] = None) -> str:
+        stat = await asyncio.to_thread(os.stat, self.path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+class HttpDataProvider(DataProvider):
+    """HTTP接口数据源
+
+    每个指标组对应一个接口：GET {base_url}/{group}?start_date=...&end_date=...&system_name=...，
+    返回该组字段组成的JSON对象；GET {base_url}/fingerprint 返回 {"fingerprint": "..."}。
+    """
+
+    def __init__(self, base_url: str, timeout: float = 5.0, retries: int = 2, backoff: float = 0.2,
+                 max_connections: int = 20, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_connections = max_connections
+        self.transport = transport
+        # 事件循环 -> 连接池客户端；连接池与事件循环绑定，只能在创建它的事件循环中使用和关闭
+        self._clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环的连接池客户端，没有时创建"""
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            # 事件循环已关闭的连接池无法再关闭，只能丢弃
+            for closed in [other for other in self._clients if other.is_closed()]:
+                del self._clients[closed]
+            client = self._clients[loop] = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                transport=self.transport,
+            )
+        return client
+
+    async def _get_json(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """发送GET请求，超时、连接错误和5xx响应时重试"""
+        client = self._get_client()
+        last_error: Optional[Exception] = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff * (2 ** (attempt - 1)))
+            try:
+                response = await client.get(path, params=params)
+                if response.status_code >= 500:
+                    last_error = Exception(f"HTTP {response.status_code}")
+                    continue
+                response.raise_for_status()
+                return response.json()
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                last_error = e
+        raise Exception(f"请求数据接口失败: {path}: {last_error}")
+
+    @staticmethod
+    def _params(period: Dict[str, Any], system_name: Optional[str]) -> Dict[str, Any]:
+        params = {
+            "start_date": period["start_date"].strftime("%Y-%m-%d"),
+            "end_date": period["end_date"].strftime("%Y-%m-%d"),
+        }
+        if system_name:
+            params["system_name"] = system_name
+        return params
+
+    async def fetch_group(self, group: str, period: Dict[str, Any], system_name: Optional[str]) -> Dict[str, Any]:
+        return await self._get_json(f"/{group}", self._params(period, system_name))
+
+    async def fingerprint(self, period: Dict[str, Any], system_name: Optional[str] = None) -> str:
+        try:
+            result = await self._get_json("/fingerprint", self._params(period, system_name))
+        except Exception:
+            # 接口不提供指纹时，报告在缓存有效期内视为不变
+            return ""
+        return str(result.get("fingerprint", ""))
+
+    async def aclose(self):
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+
+def create_data_provider_from_env() -> DataProvider:
+    """根据环境变量创建数据源：REPORT_DATA_API（HTTP接口）、REPORT_ROLLUP_DB（日汇总存储）、
+    REPORT_TICKET_FILE（原始工单导出）、REPORT_DATA_FILE（本地文件），默认使用模拟数据"""
+    if os.environ.get("REPORT_DATA_API"):
+        return HttpDataProvider(
+            os.environ["REPORT_DATA_API"],
+            timeout=float(os.environ.get("REPORT_DATA_TIMEOUT", "5")),
+            retries=int(os.environ.get("REPORT_DATA_RETRIES", "2")),
+        )
+    if os.environ.get("REPORT_ROLLUP_DB"):
+        from rollup_store import RollupStore, RollupDataProvider
+        return RollupDataProvider(RollupStore(os.environ["REPORT_ROLLUP_DB"]))
+    if os.environ.get("REPORT_TICKET_FILE"):
+        from metrics_engine import TicketDataProvider
+        return TicketDataProvider(os.environ["REPORT_TICKET_FILE"])
+    if os.environ.get("REPORT_DATA_FILE"):
+        return FileDataProvider(os.environ["REPORT_DATA_FILE"])
+    return MockDataProvider()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+DOCX报告：根据Word模板生成周月报
+功能：加载时把 word/document.xml 整理为与HTML模板相同的渲染计划（拆分在多个文本段中的占位符合并为一段，
+     表格中的示例数据替换为槽位或循环行块），生成时把渲染片段直接写入zip条目流，
+     不构建文档对象模型，每份报告的内存占用与模板大小相当
+"""
+
+import html
+import io
+import itertools
+import os
+import re
+import zipfile
+from typing import Dict, Any, BinaryIO, Iterable, List, Optional, Tuple
+
+from template_engine import CompiledTemplate, build_template_values, DEFAULT_ROW_FIELDS
+
+
+DOCUMENT_XML = "word/document.xml"
+ALL_SYSTEMS = "全部系统"
+
+# 段落中的占位符 -> 槽位名称（按出现顺序依次分配，规则同HTML模板）
+# 渠道细分（自助工单/微应用/客服助手、交建通/400热线/在线客服/运维群）没有数据来源，显示为【/】
+DOCX_PLACEHOLDERS: Dict[str, Tuple[str, ...]] = {
+    "【周|月】": ("period_type",),
+    "【装备调度管理平台】": ("system_name",),
+    "【（2025年10月01日-2025年10月31日）】": ("period_range_paren",),
+    "【2025年10月01日-2025年10月31日】": ("period_range",),
+    "【90】": ("total_service",),
+    "【44】": ("service_request", "total_service", "service_request"),
+    "【0】": ("incident", "not_available", "not_available", "not_available", "not_available", "incident"),
+    "【46】": ("approval",),
+    "【18】": ("self_service", "not_available"),
+    "【26】": ("manual_service", "not_available"),
+    "【3】": ("not_available", "unresolved_current"),
+    "【下降|上升】": ("change_direction",),
+    "【2.2】": ("change_rate",),
+    "【100】": ("resolution_rate",),
+    "【100%】": ("completion_rate", "timeliness_rate_percent", "satisfaction_rate_percent"),
+    "【5】": ("unresolved_history",),
+    "【空】": ("knowledge_base", "no_content", "no_content"),
+}
+
+# 该占位符所在段落及其后的统计说明不输出
+HIDDEN_REGION_MARKER = "【此区域不显示】"
+
+# 表格单元格：(表格序号, 行序号) -> {单元格序号: 槽位名称}
+DOCX_TABLE_CELLS: Dict[Tuple[int, int], Dict[int, str]] = {
+    # 服务总量：渠道细分无数据，按工单类型统计，以及上一周期总量和环比
+    (0, 3): {**{index: "table_not_available" for index in range(1, 15)},
+             15: "cell_service_request", 16: "cell_incident", 17: "cell_approval",
+             18: "cell_previous_total", 19: "cell_change_rate"},
+    # 服务请求分类、事件类工单、审批类工单的合计行
+    (1, 10): {1: "cell_category_total"},
+    (2, 11): {1: "cell_incident"},
+    (3, 3): {1: "cell_approval"},
+    # 服务指标
+    (4, 2): {1: "table_not_available", 2: "table_not_available", 3: "cell_resolution_rate",
+             4: "cell_total_service", 5: "table_not_available", 6: "table_not_available",
+             7: "table_not_available", 8: "cell_completion_rate", 9: "cell_timeliness_rate",
+             10: "table_not_available", 11: "cell_satisfaction_rate"},
+}
+
+# 表格循环行：表格序号 -> (循环名称, 行模板序号, {单元格序号: 行占位符})，行模板之后的示例行删除
+DOCX_TABLE_LOOPS: Dict[int, Tuple[str, int, Dict[int, str]]] = {
+    1: ("service_categories", 1, {0: "【类别名称】", 1: "【类别数量】", 2: "【类别占比】%"}),
+}
+
+# 没有数据来源的示例行：表格序号 -> 行序号
+DOCX_SAMPLE_ROWS: Dict[int, Iterable[int]] = {
+    1: range(2, 10),
+    2: range(2, 11),
+    3: range(1, 3),
+    5: (*range(2, 5), *range(8, 13)),
+}
+
+CELL_MARKER = "【单元格:{}】"
+
+PARAGRAPH_PATTERN = re.compile(r"<w:p(?:\s[^>]*)?>.*?</w:p>", re.DOTALL)
+TEXT_PATTERN = re.compile(r"<w:t(?:\s[^>]*)?>([^<]*)</w:t>")
+TABLE_PATTERN = re.compile(r"<w:tbl>.*?</w:tbl>", re.DOTALL)
+ROW_PATTERN = re.compile(r"<w:tr(?:\s[^>]*)?>.*?</w:tr>", re.DOTALL)
+CELL_PATTERN = re.compile(r"<w:tc(?:\s[^>]*)?>.*?</w:tc>", re.DOTALL)
+BOOKMARK_PATTERN = re.compile(r"<w:bookmark(?:Start|End)\s[^>]*/>")
+
+
+def _text_element(text: str) -> str:
+    return f'<w:t xml:space="preserve">{text}</w:t>'
+
+
+def _merge_split_markers(paragraph: str, markers: List[str]) -> str:
+    """Word会把一个占位符拆到多个文本段中，把每个占位符合并到其第一个文本段"""
+    texts = list(TEXT_PATTERN.finditer(paragraph))
+    if not texts:
+        return paragraph
+    contents = [html.unescape(match.group(1)) for match in texts]
+    joined = "".join(contents)
+    if "【" not in joined:
+        return paragraph
+
+    # 字符位置 -> 所属文本段序号；占位符的全部字符归入其第一个字符所在的文本段
+    owners = [index for index, content in enumerate(contents) for _ in content]
+    pattern = re.compile("|".join(re.escape(marker) for marker in sorted(markers, key=len, reverse=True)))
+    for match in pattern.finditer(joined):
+        first = owners[match.start()]
+        owners[match.start():match.end()] = [first] * (match.end() - match.start())
+    pieces: List[List[str]] = [[] for _ in contents]
+    for char, owner in zip(joined, owners):
+        pieces[owner].append(char)
+
+    out = []
+    position = 0
+    for match, content, piece in zip(texts, contents, pieces):
+        out.append(paragraph[position:match.start()])
+        merged = "".join(piece)
+        out.append(match.group(0) if merged == content else _text_element(html.escape(merged, quote=False)))
+        position = match.end()
+    out.append(paragraph[position:])
+    return "".join(out)
+
+
+def _set_cell_text(cell: str, text: str) -> str:
+    """把单元格的文本替换为 text：第一个文本段写入，其余文本段清空"""
+    texts = list(TEXT_PATTERN.finditer(cell))
+    if not texts:
+        return cell
+    out = []
+    position = 0
+    for index, match in enumerate(texts):
+        out.append(cell[position:match.start()])
+        out.append(_text_element(text if index == 0 else ""))
+        position = match.end()
+    out.append(cell[position:])
+    return "".join(out)
+
+
+def _prepare_table(index: int, table: str) -> str:
+    rows = list(ROW_PATTERN.finditer(table))
+    sample_rows = set(DOCX_SAMPLE_ROWS.get(index, ()))
+    loop = DOCX_TABLE_LOOPS.get(index)
+    out = []
+    position = 0
+    for row_index, match in enumerate(rows):
+        out.append(table[position:match.start()])
+        position = match.end()
+        if row_index in sample_rows:
+            continue
+        row = match.group(0)
+        cell_slots = DOCX_TABLE_CELLS.get((index, row_index), {})
+        if loop is not None and row_index == loop[1]:
+            cell_slots = {cell_index: marker for cell_index, marker in loop[2].items()}
+        elif cell_slots:
+            cell_slots = {cell_index: CELL_MARKER.format(slot) for cell_index, slot in cell_slots.items()}
+        if cell_slots:
+            cells = list(CELL_PATTERN.finditer(row))
+            row_out = []
+            cell_position = 0
+            for cell_index, cell_match in enumerate(cells):
+                row_out.append(row[cell_position:cell_match.start()])
+                cell = cell_match.group(0)
+                if cell_index in cell_slots:
+                    cell = _set_cell_text(cell, cell_slots[cell_index])
+                row_out.append(cell)
+                cell_position = cell_match.end()
+            row_out.append(row[cell_position:])
+            row = "".join(row_out)
+        if loop is not None and row_index == loop[1]:
+            row = f"<!--【循环:{loop[0]}】-->{row}<!--【循环结束】-->"
+        out.append(row)
+    out.append(table[position:])
+    return "".join(out)
+
+
+def prepare_document_xml(source: str) -> str:
+    """把 document.xml 整理为模板源码：合并拆分的占位符、替换表格示例数据、删除不显示的区域"""
+    markers = [*DOCX_PLACEHOLDERS, HIDDEN_REGION_MARKER]
+    source = PARAGRAPH_PATTERN.sub(lambda match: _merge_split_markers(match.group(0), markers), source)
+
+    table_index = itertools.count()
+    source = TABLE_PATTERN.sub(lambda match: _prepare_table(next(table_index), match.group(0)), source)
+
+    marker_position = source.find(HIDDEN_REGION_MARKER)
+    if marker_position >= 0:
+        start = max(source.rfind("<w:p>", 0, marker_position), source.rfind("<w:p ", 0, marker_position))
+        end = source.rfind("<w:sectPr", start)
+        # 保留书签标记，避免删除区域外的书签失去配对
+        bookmarks = "".join(BOOKMARK_PATTERN.findall(source[start:end]))
+        source = source[:start] + bookmarks + source[end:]
+    return source
+
+
+def _cell(value: Any, suffix: str = "") -> str:
+    """表格单元格取值：数据为0时显示为 /"""
+    return "/" if not value else f"{value}{suffix}"
+
+
+def build_docx_values(data: Dict[str, Any], period: Dict[str, Any],
+                      system_name: Optional[str] = None) -> Dict[str, str]:
+    """DOCX模板各槽位的替换文本（已做XML转义）"""
+    values = {name: html.escape(value, quote=False)
+              for name, value in build_template_values(data, period, charts=False).items()}
+    category_total = sum(category["count"] for category in data.get("service_categories", []))
+    values.update({
+        "system_name": f"【{html.escape(system_name or ALL_SYSTEMS, quote=False)}】",
+        "timeliness_rate_percent": f"【{data['timeliness_rate']}%】",
+        "satisfaction_rate_percent": f"【{data['satisfaction_rate']}%】",
+        "not_available": "【/】",
+        "no_content": "【空】",
+    })
+    cells = {
+        "table_not_available": "/",
+        "cell_service_request": _cell(data["service_request"]),
+        "cell_incident": _cell(data["incident"]),
+        "cell_approval": _cell(data["approval"]),
+        "cell_previous_total": _cell(data["previous_total"]),
+        "cell_change_rate": _cell(data["change_rate"], "%"),
+        "cell_category_total": _cell(category_total),
+        "cell_total_service": _cell(data["total_service"]),
+        "cell_resolution_rate": _cell(data["resolution_rate"], "%"),
+        "cell_completion_rate": _cell(data["completion_rate"], "%"),
+        "cell_timeliness_rate": _cell(data["timeliness_rate"], "%"),
+        "cell_satisfaction_rate": _cell(data["satisfaction_rate"], "%"),
+    }
+    values.update({CELL_MARKER.format(name): value for name, value in cells.items()})
+    return values
+
+
+class _ZipTextStream:
+    """把渲染片段编码后分块写入zip条目流，缓冲区满时写出，内存占用固定"""
+
+    def __init__(self, stream: BinaryIO, buffer_size: int = 64 * 1024):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._pending: List[str] = []
+        self._pending_size = 0
+
+    def append(self, text: str):
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.stream.write("".join(self._pending).encode("utf-8"))
+            self._pending = []
+            self._pending_size = 0
+
+
+class DocxTemplate:
+    """编译后的DOCX模板：除 document.xml 外的条目原样保留，document.xml 编译为渲染计划"""
+
+    def __init__(self, path: str):
+        self.path = path
+        # (条目信息, 内容)；document.xml 的内容为 None，渲染时生成
+        self.entries: List[Tuple[zipfile.ZipInfo, Optional[bytes]]] = []
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.filename == DOCUMENT_XML:
+                    source = prepare_document_xml(archive.read(info).decode("utf-8"))
+                    self.entries.append((info, None))
+                else:
+                    self.entries.append((info, archive.read(info)))
+        placeholders = dict(DOCX_PLACEHOLDERS)
+        placeholders.update({CELL_MARKER.format(name): (CELL_MARKER.format(name),)
+                             for cells in DOCX_TABLE_CELLS.values() for name in cells.values()})
+        # 文档内容边渲染边写入压缩包，不缓存整篇文档
+        self.compiled = CompiledTemplate(source, placeholders, DEFAULT_ROW_FIELDS, cache_fragments=False)
+
+    def write(self, output: BinaryIO, values: Dict[str, str], rows: Dict[str, Iterable[Dict[str, Any]]]):
+        """把报告写入 output（文件路径或二进制文件对象）"""
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+            for info, content in self.entries:
+                entry = zipfile.ZipInfo(info.filename, info.date_time)
+                entry.compress_type = zipfile.ZIP_DEFLATED
+                entry.external_attr = info.external_attr
+                if content is not None:
+                    archive.writestr(entry, content)
+                    continue
+                with archive.open(entry, "w") as stream:
+                    text_stream = _ZipTextStream(stream)
+                    self.compiled.render_into(text_stream, values, rows)
+                    text_stream.flush()
+
+    def render(self, values: Dict[str, str], rows: Dict[str, Iterable[Dict[str, Any]]]) -> bytes:
+        """渲染为DOCX字节内容"""
+        buffer = io.BytesIO()
+        self.write(buffer, values, rows)
+        return buffer.getvalue()
+
+
+class DocxTemplateLoader:
+    """按文件修改时间缓存编译后的DOCX模板"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._template: Optional[DocxTemplate] = None
+        self._cache_key = None
+
+    def get(self) -> DocxTemplate:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            raise Exception(f"DOCX模板文件不存在: {self.path}")
+        cache_key = (stat.st_mtime_ns, stat.st_size)
+        if cache_key != self._cache_key:
+            self._template = DocxTemplate(self.path)
+            self._cache_key = cache_key
+        return self._template
@@ -48,7 +48,7 @@ async def test_complete_system():
     print("\n🧪 测试2: 文件保存功能")
     print("-" * 40)
     
-    report_content = generator.generate_report("week")
+    report_content = await generator.generate_report_async("week")
     output_path = generator.save_report(report_content)
     
     if os.path.exists(output_path):
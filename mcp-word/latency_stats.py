@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+延迟统计：基准测试和负载测试共用的分位数计算
+功能：只依赖标准库，负载测试的客户端进程导入时不会加载报告生成器和服务模块
+"""
+
+from typing import List
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """线性插值的分位数"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+负载测试：多个并发客户端通过MCP协议调用真实工具
+功能：支持进程内（memory）、stdio、SSE 和 streamable-HTTP 传输，
+     按工具统计延迟分位数、吞吐量和错误率，为容量规划提供数据
+
+用法：
+    python load_test.py --transport memory --clients 8 --requests 50
+    python load_test.py --transport stdio --clients 4 --duration 10
+    python load_test.py --transport http --clients 16 --workers 4          # 自动启动 serve.py
+    python load_test.py --transport sse --url http://127.0.0.1:8000/sse    # 连接已运行的服务
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.sse import sse_client
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from latency_stats import percentile
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+TRANSPORTS = ("memory", "stdio", "sse", "http")
+
+# 默认调用组合：(工具名称, 参数)，各客户端依次循环调用；只生成内容不写文件
+DEFAULT_MIX: List[Tuple[str, Dict[str, Any]]] = [
+    ("get_report_template_info", {}),
+    ("generate_weekly_report_streaming", {"system_name": "装备调度管理平台", "include_content": False}),
+    ("get_report_cache_info", {}),
+    ("generate_monthly_report_streaming", {"include_content": False}),
+]
+
+# 工具以返回文本报告错误
+ERROR_MARKERS = ("失败", "出错", "服务繁忙")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise Exception(f"服务进程已退出，退出码: {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise Exception(f"服务在 {timeout} 秒内未开始监听端口 {port}")
+
+
+def start_server(transport: str, app: str, workers: int) -> Tuple[subprocess.Popen, str]:
+    """启动被测服务进程，返回 (进程, 地址)：sse 运行单进程服务，http 运行多进程 serve.py"""
+    port = _free_port()
+    env = dict(os.environ)
+    if transport == "sse":
+        env.update(REPORT_MCP_TRANSPORT="sse", REPORT_MCP_PORT=str(port))
+        command = [sys.executable, os.path.join(APP_DIR, f"{app}.py")]
+        url = f"http://127.0.0.1:{port}/sse"
+    else:
+        command = [sys.executable, os.path.join(APP_DIR, "serve.py"), "--app", app, "--port", str(port),
+                   "--workers", str(workers)]
+        url = f"http://127.0.0.1:{port}/mcp"
+    process = subprocess.Popen(command, cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_for_port(port, process)
+    except BaseException:
+        process.kill()
+        raise
+    return process, url
+
+
+@asynccontextmanager
+async def open_session(transport: str, app: str, url: Optional[str]) -> AsyncIterator[ClientSession]:
+    """按传输方式建立一个已初始化的客户端会话"""
+    if transport == "memory":
+        module = importlib.import_module(app)
+        async with create_connected_server_and_client_session(module.mcp) as session:
+            yield session
+        return
+
+    with open(os.devnull, 'w') as devnull:
+        if transport == "stdio":
+            params = StdioServerParameters(command=sys.executable, args=[os.path.join(APP_DIR, f"{app}.py")],
+                                           env=dict(os.environ, REPORT_MCP_TRANSPORT="stdio"), cwd=APP_DIR)
+            # 服务进程的日志输出到 stderr，不混入统计结果
+            client = stdio_client(params, errlog=devnull)
+        elif transport == "sse":
+            client = sse_client(url)
+        else:
+            client = streamablehttp_client(url)
+        async with client as streams:
+            async with ClientSession(streams[0], streams[1]) as session:
+                await session.initialize()
+                yield session
+
+
+def summarize(samples: List[Tuple[str, float, bool]], elapsed: float) -> Dict[str, Any]:
+    """按工具汇总 (工具, 延迟秒, 是否出错) 样本"""
+    by_tool: Dict[str, List[Tuple[float, bool]]] = {}
+    for tool, latency, error in samples:
+        by_tool.setdefault(tool, []).append((latency, error))
+
+    def stats(items: List[Tuple[float, bool]]) -> Dict[str, Any]:
+        latencies = sorted(latency * 1000 for latency, _ in items)
+        errors = sum(1 for _, error in items if error)
+        return {
+            "calls": len(items),
+            "errors": errors,
+            "error_rate": round(errors / len(items), 4),
+            "p50_ms": round(percentile(latencies, 0.50), 3),
+            "p95_ms": round(percentile(latencies, 0.95), 3),
+            "p99_ms": round(percentile(latencies, 0.99), 3),
+            "max_ms": round(latencies[-1], 3),
+            "throughput_per_sec": round(len(items) / elapsed, 2) if elapsed > 0 else None,
+        }
+
+    all_items = [(latency, error) for _, latency, error in samples]
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "total": stats(all_items) if all_items else {},
+        "tools": {tool: stats(items) for tool, items in sorted(by_tool.items())},
+    }
+
+
+async def run_load(transport: str = "memory", clients: int = 4, requests: Optional[int] = 20,
+                   duration: Optional[float] = None, app: str = "streaming_main", url: Optional[str] = None,
+                   mix: Optional[List[Tuple[str, Dict[str, Any]]]] = None, workers: int = 2) -> Dict[str, Any]:
+    """运行负载测试
+
+    clients 个客户端并发调用，每个客户端调用 requests 次，或持续 duration 秒；
+    每个客户端使用独立的会话（stdio 传输下每个客户端启动一个服务进程）；
+    sse 和 http 传输未指定 url 时自动启动被测服务
+    """
+    if transport not in TRANSPORTS:
+        raise Exception(f"不支持的传输方式: {transport}")
+    mix = mix or DEFAULT_MIX
+    process = None
+    if transport in ("sse", "http") and url is None:
+        process, url = start_server(transport, app, workers)
+
+    samples: List[Tuple[str, float, bool]] = []
+
+    async def client_loop(session: ClientSession, index: int, deadline: Optional[float]):
+        count = 0
+        while (deadline is None and count < requests) or (deadline is not None and time.monotonic() < deadline):
+            tool, arguments = mix[(index + count) % len(mix)]
+            count += 1
+            started = time.perf_counter()
+            try:
+                result = await session.call_tool(tool, arguments)
+                text = result.content[0].text if result.content else ""
+                error = bool(result.isError) or any(marker in text.split("\n", 1)[0] for marker in ERROR_MARKERS)
+            except Exception:
+                error = True
+            samples.append((tool, time.perf_counter() - started, error))
+
+    ready = asyncio.Event()
+    sessions_ready = 0
+    timing: Dict[str, float] = {}
+
+    async def connected_client(index: int):
+        nonlocal sessions_ready
+        async with open_session(transport, app, url) as session:
+            # 所有客户端连接后同时开始
+            sessions_ready += 1
+            if sessions_ready == clients:
+                timing["started"] = time.perf_counter()
+                timing["deadline"] = time.monotonic() + duration if duration else None
+                ready.set()
+            await ready.wait()
+            await client_loop(session, index, timing["deadline"])
+            # 最后一个结束的客户端决定总耗时，不含断开连接的时间
+            timing["finished"] = time.perf_counter()
+
+    try:
+        await asyncio.gather(*(connected_client(index) for index in range(clients)))
+        elapsed = timing["finished"] - timing["started"]
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    result = summarize(samples, elapsed)
+    result["config"] = {"transport": transport, "clients": clients, "requests": requests, "duration": duration,
+                        "app": app, "url": url, "workers": workers if transport == "http" else None,
+                        "created_at": datetime.now().isoformat(timespec="seconds")}
+    return result
+
+
+def print_report(result: Dict[str, Any]):
+    config = result["config"]
+    print(f"传输: {config['transport']}，客户端: {config['clients']}，耗时: {result['elapsed_seconds']} 秒")
+    print(f"{'工具':<38}{'调用':>8}{'错误率':>9}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}{'次/秒':>10}")
+    rows = list(result["tools"].items()) + [("合计", result["total"])]
+    for tool, stats in rows:
+        if not stats:
+            continue
+        print(f"{tool:<38}{stats['calls']:>8}{stats['error_rate'] * 100:>8.1f}%{stats['p50_ms']:>10.2f}"
+              f"{stats['p95_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['throughput_per_sec'] or 0:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCP工具负载测试")
+    parser.add_argument("--transport", choices=TRANSPORTS, default="memory", help="传输方式")
+    parser.add_argument("--clients", type=int, default=4, help="并发客户端数")
+    parser.add_argument("--requests", type=int, default=20, help="每个客户端的调用次数")
+    parser.add_argument("--duration", type=float, help="持续时间（秒），指定时忽略 --requests")
+    parser.add_argument("--app", choices=("streaming_main", "main"), default="streaming_main", help="被测服务模块")
+    parser.add_argument("--url", help="已运行服务的地址（sse 为 /sse，http 为 /mcp），为空时自动启动")
+    parser.add_argument("--workers", type=int, default=2, help="自动启动 http 服务时的工作进程数")
+    parser.add_argument("--mix", help='调用组合JSON文件：[["工具名称", {参数}], ...]')
+    parser.add_argument("--output", help="结果JSON文件路径")
+    args = parser.parse_args()
+
+    # 只输出统计结果，不输出每个请求的日志
+    for name in ("mcp", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    mix = None
+    if args.mix:
+        with open(args.mix, 'r', encoding='utf-8') as f:
+            mix = [(tool, arguments) for tool, arguments in json.load(f)]
+    result = asyncio.run(run_load(args.transport, args.clients, None if args.duration else args.requests,
+                                  args.duration, args.app, args.url, mix, args.workers))
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"结果已保存至: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
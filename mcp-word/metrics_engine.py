@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+"""
+指标计算引擎：根据ITSM导出的原始工单计算报告数据
+功能：工单按列加载为NumPy数组（分类字段编码为整数），
+     统计全部使用布尔掩码、bincount 等批量运算，不逐条循环工单
+"""
+
+import asyncio
+import csv
+import json
+import os
+import re
+import threading
+import warnings
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from data_providers import DataProvider, METRIC_GROUPS, build_trend_series, change_rate
+from period_engine import get_period_engine
+
+
+# 工单类型编码：服务请求、事件、审批，其他类型只计入服务总量
+TICKET_TYPES: Dict[str, int] = {
+    "服务请求": 0, "service_request": 0,
+    "事件": 1, "incident": 1,
+    "审批": 2, "approval": 2,
+}
+OTHER_TYPE = 3
+
+# 服务渠道编码：自助、人工
+CHANNELS: Dict[str, int] = {
+    "自助": 0, "self": 0, "self_service": 0,
+    "人工": 1, "manual": 1, "manual_service": 1,
+}
+OTHER_CHANNEL = 2
+
+TRUE_VALUES = ["1", "true", "yes", "y", "是"]
+FALSE_VALUES = ["0", "false", "no", "n", "否"]
+
+REQUIRED_COLUMNS = ["created_at", "ticket_type", "category"]
+
+# 创建时间末尾的时区偏移：Z、+08:00、+0800
+_UTC_OFFSET = re.compile(r"(?:Z|[+-]\d{2}:?\d{2})$")
+# 可选列缺失时的默认值
+OPTIONAL_COLUMNS = {
+    "system": "", "channel": "", "resolved": "0", "completed": "0",
+    "on_time": "0", "satisfaction": "", "knowledge": "0",
+}
+
+
+def _encode(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """分类字段编码：返回 (去重后的取值, 每条工单的编码)"""
+    uniques, codes = np.unique(values, return_inverse=True)
+    return uniques, codes.astype(np.int32)
+
+
+def _encode_with(values: np.ndarray, mapping: Dict[str, int], other: int) -> np.ndarray:
+    """按映射表编码，只对去重后的取值查表"""
+    uniques, codes = np.unique(values, return_inverse=True)
+    lookup = np.array([mapping.get(str(value).strip().lower(), other) for value in uniques], dtype=np.int8)
+    return lookup[codes]
+
+
+def _parse_flags(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """解析布尔字段：返回 (是否为真, 是否有值)"""
+    uniques, codes = np.unique(values, return_inverse=True)
+    normalized = [str(value).strip().lower() for value in uniques]
+    true_lookup = np.array([value in TRUE_VALUES for value in normalized], dtype=bool)
+    known_lookup = np.array([value in TRUE_VALUES or value in FALSE_VALUES for value in normalized], dtype=bool)
+    return true_lookup[codes], known_lookup[codes]
+
+
+def _parse_created_at(values: Sequence[Any]) -> np.ndarray:
+    """解析创建时间；带时区偏移的时间按导出方的本地时间计（去掉偏移，保留钟面时间），
+    本地午夜前后的工单计入本地日期，而不是换算为UTC后的日期
+    """
+    with warnings.catch_warnings():
+        # NumPy 遇到时区偏移时发出警告并换算为UTC
+        warnings.filterwarnings("error", message="no explicit representation of timezones")
+        try:
+            return np.asarray(values, dtype="datetime64[s]")
+        except UserWarning:
+            pass
+    local = [value.replace(tzinfo=None) if isinstance(value, datetime) else _UTC_OFFSET.sub("", str(value).strip())
+             for value in values]
+    return np.asarray(local, dtype="datetime64[s]")
+
+
+def _rate(numerator: int, denominator: int) -> float:
+    """百分比，保留一位小数；分母为0时返回0"""
+    if denominator == 0:
+        return 0
+    value = round(numerator / denominator * 100, 1)
+    return int(value) if value == int(value) else value
+
+
+def _day(value: datetime) -> np.datetime64:
+    return np.datetime64(value.strftime("%Y-%m-%d"), "s")
+
+
+# 可累加的计数器，报告中的比率都由计数器作为分子分母计算
+COUNTER_FIELDS = [
+    "total_service", "service_request", "incident", "approval", "self_service", "manual_service",
+    "resolved", "completed", "on_time", "rated", "satisfied", "unresolved", "knowledge",
+]
+
+
+def build_report_data(counters: Dict[str, int], previous_total: int, unresolved_history: int,
+                      category_counts: Iterable[Tuple[str, int]],
+                      trend_series: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """由计数器汇总结果组装报告数据"""
+    total = counters["total_service"]
+    # 按数量降序，数量相同时按类别名称排序
+    categories = sorted(((name, count) for name, count in category_counts if count),
+                        key=lambda item: (-item[1], item[0]))
+    category_total = sum(count for _, count in categories)
+    return {
+        "total_service": total,
+        "service_request": counters["service_request"],
+        "incident": counters["incident"],
+        "approval": counters["approval"],
+        "self_service": counters["self_service"],
+        "manual_service": counters["manual_service"],
+        "previous_total": previous_total,
+        "change_rate": change_rate(total, previous_total),
+        "resolution_rate": _rate(counters["resolved"], total),
+        "completion_rate": _rate(counters["completed"], total),
+        "timeliness_rate": _rate(counters["on_time"], counters["resolved"]),
+        "satisfaction_rate": _rate(counters["satisfied"], counters["rated"]),
+        "unresolved_current": counters["unresolved"],
+        "unresolved_history": unresolved_history,
+        "knowledge_base": counters["knowledge"],
+        "service_categories": [
+            {"name": name, "count": count, "percentage": round(count / category_total * 100, 2)}
+            for name, count in categories
+        ],
+        "trend_series": trend_series or [],
+    }
+
+
+class TicketTable:
+    """列式工单表"""
+
+    def __init__(self, columns: Dict[str, Sequence[Any]]):
+        missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+        if missing:
+            raise Exception(f"工单数据缺少字段: {', '.join(missing)}")
+        try:
+            created_at = _parse_created_at(columns["created_at"])
+        except ValueError as e:
+            raise Exception(f"工单创建时间格式错误: {e}")
+        # 按创建时间排序，日期范围查询用二分查找定位，只统计范围内的工单
+        order = np.argsort(created_at, kind="stable")
+        self.created_at = created_at[order]
+
+        def column(name: str) -> np.ndarray:
+            if name in columns:
+                return np.asarray(columns[name], dtype=str)[order]
+            return np.full(len(order), OPTIONAL_COLUMNS[name])
+
+        self.systems, self.system = _encode(column("system"))
+        self.categories, self.category = _encode(column("category"))
+        self.ticket_type = _encode_with(column("ticket_type"), TICKET_TYPES, OTHER_TYPE)
+        self.channel = _encode_with(column("channel"), CHANNELS, OTHER_CHANNEL)
+        self.resolved, _ = _parse_flags(column("resolved"))
+        self.completed, _ = _parse_flags(column("completed"))
+        self.on_time, _ = _parse_flags(column("on_time"))
+        self.satisfied, self.rated = _parse_flags(column("satisfaction"))
+        self.knowledge, _ = _parse_flags(column("knowledge"))
+        self._counter_masks: Optional[Dict[str, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.created_at)
+
+    def counter_masks(self) -> Dict[str, np.ndarray]:
+        """每个计数器对应的工单掩码（首次使用时计算）"""
+        if self._counter_masks is None:
+            self._counter_masks = {
+                "total_service": np.ones(len(self), dtype=bool),
+                "service_request": self.ticket_type == 0,
+                "incident": self.ticket_type == 1,
+                "approval": self.ticket_type == 2,
+                "self_service": self.channel == 0,
+                "manual_service": self.channel == 1,
+                "resolved": self.resolved,
+                "completed": self.completed,
+                "on_time": self.resolved & self.on_time,
+                "rated": self.rated,
+                "satisfied": self.rated & self.satisfied,
+                "unresolved": ~self.resolved,
+                "knowledge": self.knowledge,
+            }
+        return self._counter_masks
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]]) -> "TicketTable":
+        """从工单字典列表构建"""
+        if not records:
+            return cls({name: [] for name in REQUIRED_COLUMNS})
+        names = [name for name in (*REQUIRED_COLUMNS, *OPTIONAL_COLUMNS) if name in records[0]]
+        return cls({name: [record.get(name, OPTIONAL_COLUMNS.get(name, "")) for record in records]
+                    for name in names})
+
+    @classmethod
+    def from_csv(cls, path: str) -> "TicketTable":
+        """从CSV导出文件构建（首行为列名）"""
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            header = [name.strip() for name in next(reader)]
+            rows = list(reader)
+        # 行转列在C层完成
+        columns = list(zip(*rows)) if rows else [()] * len(header)
+        return cls(dict(zip(header, columns)))
+
+    @classmethod
+    def from_jsonl(cls, path: str) -> "TicketTable":
+        """从JSONL导出文件构建（每行一个工单对象）"""
+        with open(path, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        return cls.from_records(records)
+
+    @classmethod
+    def from_file(cls, path: str) -> "TicketTable":
+        """按扩展名选择CSV或JSONL格式"""
+        if not os.path.exists(path):
+            raise Exception(f"工单数据文件不存在: {path}")
+        if path.lower().endswith((".jsonl", ".json")):
+            return cls.from_jsonl(path)
+        return cls.from_csv(path)
+
+
+class MetricsEngine:
+    """根据工单表计算报告数据"""
+
+    def __init__(self, table: TicketTable):
+        self.table = table
+
+    def system_mask(self, system_name: Optional[str]) -> np.ndarray:
+        """系统过滤掩码，未指定系统时包含全部工单"""
+        table = self.table
+        if not system_name:
+            return np.ones(len(table), dtype=bool)
+        index = np.searchsorted(table.systems, system_name)
+        if index < len(table.systems) and table.systems[index] == system_name:
+            return table.system == index
+        return np.zeros(len(table), dtype=bool)
+
+    def compute(self, start: datetime, end: datetime, system_name: Optional[str] = None,
+                trend_periods: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """计算 [start, end] 日期范围内的报告数据
+
+        trend_periods 为本期及之前各周期（按时间先后、首尾相接，最后一项为本期），
+        各周期的服务总量在一次遍历中得出，组成趋势序列，上一周期为其中的倒数第二项；
+        为空时上一周期为紧邻的等长区间，不计算趋势序列
+        """
+        table = self.table
+        lo = _day(start)
+        hi = _day(end) + np.timedelta64(1, "D")
+        if trend_periods and len(trend_periods) > 1:
+            starts = [_day(period["start_date"]) for period in trend_periods[:-1]]
+        else:
+            starts = [lo - (hi - lo)]
+        # 工单按创建时间有序：之前各周期、本期的起止位置
+        bounds = np.searchsorted(table.created_at, starts + [lo, hi])
+        period_lo, period_hi = int(bounds[-2]), int(bounds[-1])
+        period = slice(period_lo, period_hi)
+
+        in_system = self.system_mask(system_name)
+        in_period = in_system[period]
+        counters = {name: int(np.count_nonzero(in_period & mask[period]))
+                    for name, mask in table.counter_masks().items()}
+        category_counts = np.bincount(table.category[period][in_period], minlength=len(table.categories))
+        present = np.flatnonzero(category_counts)
+        # 各周期的工单数：对整个趋势范围的系统掩码做一次前缀和，按周期边界相减
+        prefix = np.concatenate(([0], np.cumsum(in_system[bounds[0]:period_hi])))
+        totals = np.diff(prefix[bounds - bounds[0]]).tolist()
+        return build_report_data(
+            counters,
+            previous_total=totals[-2],
+            unresolved_history=int(np.count_nonzero(in_system[:period_lo] & ~table.resolved[:period_lo])),
+            category_counts=zip(table.categories[present].tolist(), category_counts[present].tolist()),
+            trend_series=build_trend_series(trend_periods, totals[-len(trend_periods):]) if trend_periods else None,
+        )
+
+
+class TicketDataProvider(DataProvider):
+    """工单文件数据源：从ITSM导出的CSV/JSONL工单计算报告数据
+
+    工单表在文件变化时重新加载，计算在线程中执行，不阻塞事件循环。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._engine: Optional[MetricsEngine] = None
+        self._cache_key = None
+        self._lock = threading.Lock()
+
+    def get_engine(self) -> MetricsEngine:
+        """获取与文件当前内容对应的计算引擎"""
+        stat = os.stat(self.path)
+        cache_key = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if cache_key != self._cache_key:
+                self._engine = MetricsEngine(TicketTable.from_file(self.path))
+                self._cache_key = cache_key
+            return self._engine
+
+    def _compute(self, period: Dict[str, Any], system_name: Optional[str]) -> Dict[str, Any]:
+        # 上一周期取日历上的前一周期（如上个自然月），而不是等长区间
+        return self.get_engine().compute(period["start_date"], period["end_date"], system_name,
+                                         get_period_engine().trend(period))
+
+    async def fetch(self, period: Dict[str, Any], system_name: Optional[str] = None) -> Dict[str, Any]:
+        """所有指标组由同一次批量计算得出"""
+        return await asyncio.to_thread(self._compute, period, system_name)
+
+    async def fetch_group(self, group: str, period: Dict[str, Any], system_name: Optional[str]) -> Dict[str, Any]:
+        data = await self.fetch(period, system_name)
+        return {field: data[field] for field in METRIC_GROUPS[group]}
+
+    async def fingerprint(self, period: Dict[str, Any], system_name: Optional[str] = None) -> str:
+        stat = await asyncio.to_thread(os.stat, self.path)
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
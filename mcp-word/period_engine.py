@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+周期引擎：基于预先计算的日历表获取报告周期
+功能：加载时为每一天计算所属的ISO周、月、季度、年度以及财季、财年序号，
+     并记录每个周期的首日；查询某天所在周期的起止日期、上一周期和周期对应的日序号范围
+     都只需查表，不再做日期运算
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple, Union
+
+import numpy as np
+
+
+EPOCH = datetime(1970, 1, 1)
+
+# 周期粒度 -> 报告类型名称
+PERIOD_TYPES: Dict[str, str] = {
+    "week": "周",
+    "month": "月",
+    "quarter": "季",
+    "year": "年",
+    "fiscal_quarter": "财季",
+    "fiscal_year": "财年",
+}
+CUSTOM = "custom"
+CUSTOM_TYPE = "阶段"
+
+# 趋势序列包含的周期数（含本期）
+TREND_LENGTHS: Dict[str, int] = {
+    "week": 13,
+    "month": 12,
+    "quarter": 8,
+    "year": 5,
+    "fiscal_quarter": 8,
+    "fiscal_year": 5,
+    CUSTOM: 6,
+}
+
+# 自定义日期范围按此顺序匹配完整周期
+_CLASSIFY_ORDER = ("week", "month", "quarter", "year", "fiscal_quarter", "fiscal_year")
+
+
+def day_number(day: Union[date, datetime]) -> int:
+    """1970-01-01 起的天数"""
+    if isinstance(day, datetime):
+        day = day.date()
+    return (day - EPOCH.date()).days
+
+
+def format_period(start: datetime, end: datetime) -> str:
+    """周期显示文本，如 2025年11月01日-2025年11月30日"""
+    return f"{start.strftime('%Y年%m月%d日')}-{end.strftime('%Y年%m月%d日')}"
+
+
+def format_label(granularity: str, start: datetime, end: datetime, fiscal_year_start: int = 1) -> str:
+    """周期简称，用于趋势序列，如 2025年第45周、2025年11月、2025财年第2季度"""
+    if granularity == "week":
+        year, week, _ = start.isocalendar()
+        return f"{year}年第{week}周"
+    if granularity == "month":
+        return start.strftime("%Y年%m月")
+    if granularity == "quarter":
+        return f"{start.year}年第{(start.month - 1) // 3 + 1}季度"
+    if granularity == "year":
+        return f"{start.year}年"
+    # 财年以起始月份所在的年份命名
+    fiscal_year = start.year if start.month >= fiscal_year_start else start.year - 1
+    if granularity == "fiscal_quarter":
+        return f"{fiscal_year}财年第{(start.month - fiscal_year_start) % 12 // 3 + 1}季度"
+    if granularity == "fiscal_year":
+        return f"{fiscal_year}财年"
+    return f"{start.strftime('%m月%d日')}-{end.strftime('%m月%d日')}"
+
+
+class PeriodEngine:
+    """预计算日历表
+
+    覆盖 first_year 至 last_year 的每一天；财年从 fiscal_year_start 月开始（1 表示与自然年相同）。
+    周期字典与报告生成器使用的格式相同：{"period", "type", "start_date", "end_date"}，
+    另有 "label"（周期简称）、"granularity"（周期粒度，自定义范围为 custom）
+    和 "index"（周期序号，相邻周期序号相差 1）。
+    """
+
+    def __init__(self, fiscal_year_start: int = 1, first_year: int = 2000, last_year: int = 2100):
+        if not 1 <= fiscal_year_start <= 12:
+            raise Exception(f"财年起始月份应为 1-12: {fiscal_year_start}")
+        self.fiscal_year_start = fiscal_year_start
+        days = np.arange(np.datetime64(f"{first_year}-01-01"), np.datetime64(f"{last_year + 1}-01-01"),
+                         dtype="datetime64[D]")
+        self.first_day = int(days[0].astype(np.int64))
+        self.last_day = int(days[-1].astype(np.int64))
+
+        day_numbers = days.astype(np.int64)
+        months = days.astype("datetime64[M]").astype(np.int64)
+        fiscal_months = months - (fiscal_year_start - 1)
+        # 1970-01-01 是周四，ISO周从周一开始
+        keys = {
+            "week": (day_numbers + 3) // 7,
+            "month": months,
+            "quarter": months // 3,
+            "year": months // 12,
+            "fiscal_quarter": fiscal_months // 3,
+            "fiscal_year": fiscal_months // 12,
+        }
+        # 粒度 -> (每天所属周期的序号, 每个周期首日的天数)
+        self._period_ids: Dict[str, List[int]] = {}
+        self._period_starts: Dict[str, List[int]] = {}
+        for granularity, key in keys.items():
+            changes = np.flatnonzero(np.diff(key)) + 1
+            ids = np.zeros(len(days), dtype=np.int64)
+            ids[changes] = 1
+            self._period_ids[granularity] = np.cumsum(ids).tolist()
+            self._period_starts[granularity] = (np.concatenate(([0], changes, [len(days)])) + self.first_day).tolist()
+
+    def _check_granularity(self, granularity: str):
+        if granularity not in PERIOD_TYPES:
+            raise Exception(f"不支持的报告类型: {granularity}")
+
+    def _make_period(self, granularity: str, index: int) -> Dict[str, Any]:
+        starts = self._period_starts[granularity]
+        # 日历表首尾的周期可能不完整
+        if not 0 < index < len(starts) - 2:
+            raise Exception(f"周期超出日历范围: {granularity} {index}")
+        start = EPOCH + timedelta(days=starts[index])
+        end = EPOCH + timedelta(days=starts[index + 1] - 1)
+        return {
+            "period": format_period(start, end),
+            "label": format_label(granularity, start, end, self.fiscal_year_start),
+            "type": PERIOD_TYPES[granularity],
+            "start_date": start,
+            "end_date": end,
+            "granularity": granularity,
+            "index": index,
+        }
+
+    def index_of(self, granularity: str, day: Union[date, datetime]) -> int:
+        """某天所在周期的序号"""
+        self._check_granularity(granularity)
+        number = day_number(day)
+        if not self.first_day <= number <= self.last_day:
+            raise Exception(f"日期超出日历范围: {day}")
+        return self._period_ids[granularity][number - self.first_day]
+
+    def period_at(self, granularity: str, day: Union[date, datetime]) -> Dict[str, Any]:
+        """某天所在的周期"""
+        return self._make_period(granularity, self.index_of(granularity, day))
+
+    def current(self, granularity: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """当前时间所在的周期"""
+        return self.period_at(granularity, now or datetime.now())
+
+    def custom(self, start: datetime, end: datetime) -> Dict[str, Any]:
+        """日期范围对应的周期：恰好是完整周期时使用该周期，否则为自定义阶段"""
+        start = datetime.combine(start.date() if isinstance(start, datetime) else start, datetime.min.time())
+        end = datetime.combine(end.date() if isinstance(end, datetime) else end, datetime.min.time())
+        for granularity in _CLASSIFY_ORDER:
+            # 财年与自然年相同时不单独区分
+            if granularity.startswith("fiscal_") and self.fiscal_year_start == 1:
+                continue
+            index = self.index_of(granularity, start)
+            starts = self._period_starts[granularity]
+            if starts[index] == day_number(start) and starts[index + 1] - 1 == day_number(end):
+                return self._make_period(granularity, index)
+        return {
+            "period": format_period(start, end),
+            "label": format_label(CUSTOM, start, end),
+            "type": CUSTOM_TYPE,
+            "start_date": start,
+            "end_date": end,
+            "granularity": CUSTOM,
+        }
+
+    def previous(self, period: Dict[str, Any], count: int = 1) -> Dict[str, Any]:
+        """前第 count 个周期；自定义范围（或没有粒度信息的周期）为紧邻的等长区间"""
+        granularity = period.get("granularity")
+        if granularity in PERIOD_TYPES and "index" in period:
+            return self._make_period(granularity, period["index"] - count)
+        lo, hi = self.day_range(period)
+        length = hi - lo
+        start = EPOCH + timedelta(days=lo - length * count)
+        end = start + timedelta(days=length - 1)
+        return {
+            "period": format_period(start, end),
+            "label": format_label(CUSTOM, start, end),
+            "type": period.get("type", CUSTOM_TYPE),
+            "start_date": start,
+            "end_date": end,
+            "granularity": CUSTOM,
+        }
+
+    def series(self, period: Dict[str, Any], count: int) -> List[Dict[str, Any]]:
+        """以 period 结尾的连续 count 个周期，按时间先后排列"""
+        return [self.previous(period, offset) if offset else period for offset in range(count - 1, -1, -1)]
+
+    def trend(self, period: Dict[str, Any], count: Optional[int] = None) -> List[Dict[str, Any]]:
+        """趋势序列的周期：本期及之前的若干周期，周期数默认按粒度取 TREND_LENGTHS
+
+        靠近日历表起点时只包含日历范围内的周期
+        """
+        if count is None:
+            count = TREND_LENGTHS.get(period.get("granularity"), TREND_LENGTHS[CUSTOM])
+        if period.get("granularity") in PERIOD_TYPES and "index" in period:
+            # 序号 0 是日历表起点处不完整的周期
+            count = min(count, period["index"])
+        return self.series(period, count)
+
+    def day_range(self, period: Dict[str, Any]) -> Tuple[int, int]:
+        """周期对应的日序号范围 [lo, hi)（1970-01-01 起的天数），可直接用于按天分桶的数组"""
+        granularity = period.get("granularity")
+        if granularity in PERIOD_TYPES and "index" in period:
+            starts = self._period_starts[granularity]
+            return starts[period["index"]], starts[period["index"] + 1]
+        return day_number(period["start_date"]), day_number(period["end_date"]) + 1
+
+
+_default_engine: Optional[PeriodEngine] = None
+
+
+def get_period_engine() -> PeriodEngine:
+    """进程内共享的周期引擎，财年起始月份由环境变量 REPORT_FISCAL_YEAR_START 指定（默认 1）"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = PeriodEngine(int(os.environ.get("REPORT_FISCAL_YEAR_START", "1")))
+    return _default_engine
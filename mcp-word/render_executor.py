@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+渲染执行器：把报告渲染和文件读写移出事件循环，并限制并发
+功能：渲染在线程池或进程池中执行，文件读写在线程池中执行；同时执行的任务数不超过并发上限，
+     超出的任务排队等待，排队已满或等待超时时立即拒绝（服务繁忙），
+     事件循环始终空闲，查询模板信息等轻量工具的响应不受大批量报告生成的影响
+"""
+
+import asyncio
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Dict, Any, Callable, Deque, List, Optional
+
+from template_engine import CompiledTemplate
+
+
+RENDER_MODES = ("thread", "process")
+
+# 工作进程内的模板缓存：模板版本 -> 渲染计划
+_compiled_templates: Dict[str, CompiledTemplate] = {}
+
+
+def process_pool_context():
+    """进程池的启动方式：不使用 fork，避免子进程继承服务进程的事件循环、线程和锁"""
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+
+def render_in_worker(version: str, source: str, values: Dict[str, str],
+                     rows: Dict[str, List[Dict[str, str]]]) -> str:
+    """在工作进程中渲染模板，按模板版本缓存编译结果"""
+    template = _compiled_templates.get(version)
+    if template is None:
+        template = _compiled_templates[version] = CompiledTemplate(source)
+    return template.render(values, rows)
+
+
+class ServerBusyError(Exception):
+    """渲染队列已满或排队超时"""
+
+
+class RenderExecutor:
+    """有界并发的渲染执行器
+
+    同时执行的任务不超过 max_concurrency 个，最多 max_queue 个任务排队；
+    排队任务最多等待 queue_timeout 秒（为空时一直等待），超时或排队已满时抛出 ServerBusyError。
+    名额只在事件循环中分配和释放，无需加锁。
+    """
+
+    def __init__(self, mode: str = "thread", max_concurrency: Optional[int] = None, max_queue: int = 32,
+                 queue_timeout: Optional[float] = 30.0):
+        if mode not in RENDER_MODES:
+            raise Exception(f"不支持的渲染方式: {mode}")
+        self.mode = mode
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: Deque["asyncio.Future"] = deque()
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self.completed = 0
+        self.rejected = 0
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="report-render")
+        return self._threads
+
+    def _render_pool(self) -> Executor:
+        if self.mode == "thread":
+            return self._thread_pool()
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(max_workers=self.max_concurrency, mp_context=process_pool_context())
+        return self._processes
+
+    async def _acquire(self):
+        """获取执行名额：有空闲名额时直接获得，否则排队"""
+        if self._active < self.max_concurrency and not self._waiters:
+            self._active += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise ServerBusyError(f"服务繁忙：{self._active} 个任务执行中，{len(self._waiters)} 个任务排队，请稍后重试")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            if self.queue_timeout is None:
+                await waiter
+            else:
+                await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # 已经获得名额但调用方被取消，交还名额
+                self._release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise ServerBusyError(f"服务繁忙：排队超过 {self.queue_timeout} 秒，请稍后重试") from None
+            raise
+
+    def _release(self):
+        """释放名额：有排队任务时直接转交给最早的排队任务"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._active -= 1
+
+    async def _submit(self, executor: Executor, func: Callable, *args) -> Any:
+        await self._acquire()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+        finally:
+            self._release()
+            self.completed += 1
+
+    async def call(self, func: Callable, *args) -> Any:
+        """在线程池中执行阻塞调用（文件读写、逐章节渲染等）"""
+        return await self._submit(self._thread_pool(), func, *args)
+
+    async def render(self, template, values: Dict[str, str], rows: Dict[str, List[Dict[str, str]]]) -> str:
+        """渲染模板；template 为模板快照（TemplateSnapshot），进程模式下只传递模板版本和源码"""
+        if self.mode == "thread":
+            return await self._submit(self._thread_pool(), template.compiled.render, values, rows)
+        return await self._submit(self._render_pool(), render_in_worker, template.version, template.content,
+                                  values, rows)
+
+    async def run(self, func: Callable, *args) -> Any:
+        """在渲染池中执行 func（批量生成DOCX等），进程模式下 func 和参数须可序列化；与渲染共用并发上限和排队"""
+        return await self._submit(self._render_pool(), func, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        """执行器状态"""
+        return {
+            "mode": self.mode,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "queued": len(self._waiters),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        """关闭线程池和进程池"""
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown()
+        self._threads = self._processes = None
+
+
+def create_render_executor_from_env() -> RenderExecutor:
+    """根据环境变量创建渲染执行器
+
+    REPORT_RENDER_MODE: thread（默认）或 process
+    REPORT_RENDER_WORKERS: 并发上限，默认CPU核数
+    REPORT_RENDER_QUEUE: 排队上限，默认 32；为 0 时所有名额占满即拒绝
+    REPORT_RENDER_QUEUE_TIMEOUT: 排队等待秒数，默认 30
+    """
+    workers = os.environ.get("REPORT_RENDER_WORKERS")
+    return RenderExecutor(
+        mode=os.environ.get("REPORT_RENDER_MODE", "thread"),
+        max_concurrency=int(workers) if workers else None,
+        max_queue=int(os.environ.get("REPORT_RENDER_QUEUE", "32")),
+        queue_timeout=float(os.environ.get("REPORT_RENDER_QUEUE_TIMEOUT", "30")),
+    )
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+报告缓存：带过期时间的LRU缓存
+功能：按条目数和总字节数限制内存占用，超出时淘汰最久未使用的条目；
+     条目超过存活时间后视为失效；统计命中、未命中、淘汰和过期次数；
+     多进程部署时可使用基于SQLite的共享缓存，各工作进程看到同一份缓存；
+     协程中使用 get_async/put_async，共享缓存的数据库读写在线程中执行，不阻塞事件循环
+"""
+
+import asyncio
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, Optional
+
+
+class ReportCache:
+    """LRU + TTL 缓存"""
+
+    def __init__(self, max_entries: int = 128, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (过期时间, 字节数, 值)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """获取缓存值，未命中或已过期时返回 None"""
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, size, value = item
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, size: int = 0):
+        """写入缓存，size 为值占用的字节数（用于总量限制）；超过总量上限的值不缓存，并删除该键的旧条目"""
+        if size > self.max_bytes:
+            self.invalidate(key)
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (time.monotonic() + self.ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    async def get_async(self, key: Hashable) -> Optional[Any]:
+        """协程中获取缓存值（内存缓存直接读取）"""
+        return self.get(key)
+
+    async def put_async(self, key: Hashable, value: Any, size: int = 0):
+        """协程中写入缓存（内存缓存直接写入）"""
+        self.put(key, value, size)
+
+    def invalidate(self, key: Hashable):
+        """删除指定缓存条目"""
+        with self._lock:
+            item = self._entries.pop(key, None)
+            if item is not None:
+                self._bytes -= item[1]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0,
+        }
+
+
+SHARED_CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+DROP INDEX IF EXISTS report_cache_accessed;
+CREATE INDEX IF NOT EXISTS report_cache_lru ON report_cache (accessed_at, size);
+"""
+
+# 命中时最近访问时间落后超过该秒数才更新，多数读取不需要写事务
+ACCESS_UPDATE_INTERVAL = 5.0
+
+
+class SharedReportCache:
+    """基于SQLite的 LRU + TTL 缓存，接口与 ReportCache 相同
+
+    多个进程打开同一个数据库文件即共享缓存内容；数据库使用WAL模式，读取互不阻塞。
+    值以pickle序列化保存，过期时间使用系统时钟；命中等统计只计本进程的访问。
+    最近访问时间按 access_update_interval 秒的精度记录，淘汰顺序为近似的LRU；
+    淘汰按 (accessed_at, size) 索引顺序读取，找够要淘汰的条目即停止。
+    get/put 会阻塞，协程中应使用 get_async/put_async。
+    """
+
+    def __init__(self, path: str, max_entries: int = 128, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300.0,
+                 access_update_interval: float = ACCESS_UPDATE_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.access_update_interval = access_update_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connect().executescript(SHARED_CACHE_SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """获取缓存值，未命中或已过期时返回 None"""
+        db_key = repr(key)
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute("SELECT value, expires_at, accessed_at FROM report_cache WHERE key = ?",
+                                     (db_key,)).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            if row[1] <= now:
+                connection.execute("DELETE FROM report_cache WHERE key = ?", (db_key,))
+                self._count("expirations")
+                self._count("misses")
+                return None
+            if now - row[2] > self.access_update_interval:
+                connection.execute("UPDATE report_cache SET accessed_at = ? WHERE key = ?", (now, db_key))
+        self._count("hits")
+        return pickle.loads(row[0])
+
+    async def get_async(self, key: Hashable) -> Optional[Any]:
+        """在线程中获取缓存值，数据库读写和锁等待不阻塞事件循环"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def put_async(self, key: Hashable, value: Any, size: int = 0):
+        """在线程中写入缓存"""
+        await asyncio.to_thread(self.put, key, value, size)
+
+    def put(self, key: Hashable, value: Any, size: int = 0):
+        """写入缓存，size 为值占用的字节数（用于总量限制）；超过总量上限的值不缓存，并删除该键的旧条目"""
+        if size > self.max_bytes:
+            self.invalidate(key)
+            return
+        now = time.time()
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO report_cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (repr(key), data, size, now + self.ttl, now),
+            )
+            entries, total = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM report_cache").fetchone()
+            if entries <= self.max_entries and total <= self.max_bytes:
+                return
+            evicted = []
+            for evicted_key, evicted_size in connection.execute(
+                    "SELECT key, size FROM report_cache ORDER BY accessed_at, rowid"):
+                if entries <= self.max_entries and total <= self.max_bytes:
+                    break
+                evicted.append((evicted_key,))
+                entries -= 1
+                total -= evicted_size
+            connection.executemany("DELETE FROM report_cache WHERE key = ?", evicted)
+        self._count("evictions", len(evicted))
+
+    def invalidate(self, key: Hashable):
+        """删除指定缓存条目"""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM report_cache WHERE key = ?", (repr(key),))
+
+    def clear(self):
+        """清空缓存"""
+        with self._connect() as connection:
+            connection.execute("DELETE FROM report_cache")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM report_cache").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息：条目数和字节数为共享缓存的总量，其余为本进程的访问统计"""
+        entries, total = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM report_cache").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups * 100, 2) if lookups else 0.0,
+        }
+
+
+def create_report_cache_from_env():
+    """根据环境变量创建报告缓存：设置 REPORT_CACHE_DB 时使用多进程共享的SQLite缓存"""
+    path = os.environ.get("REPORT_CACHE_DB")
+    if path:
+        return SharedReportCache(path)
+    return ReportCache()
@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+报告生成器：main 和 streaming_main 两个服务共用
+功能：按报告类型或日期范围确定周期，取数、渲染并缓存报告，保存HTML或DOCX文件
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable, Coroutine
+
+from template_engine import CompiledTemplate, build_template_values, build_template_rows
+from template_registry import TemplateRegistry, TemplateSnapshot, DEFAULT_TEMPLATE
+from report_cache import ReportCache, create_report_cache_from_env
+from data_providers import DataProvider, create_data_provider_from_env
+from report_writer import ReportWriter, create_report_writer_from_env
+from report_reader import ReportReader
+from docx_report import DocxTemplateLoader, build_docx_values
+from render_executor import RenderExecutor, create_render_executor_from_env
+from single_flight import SingleFlight
+from server_metrics import ServerMetrics
+from period_engine import PeriodEngine, get_period_engine
+from report_resources import report_etag
+
+
+def run_sync(coroutine: Coroutine) -> Any:
+    """在同步接口中运行协程
+
+    只能在没有运行中的事件循环时调用；在事件循环中（如异步脚本）应直接 await 对应的 *_async 接口。
+    另开线程运行会与调用方的事件循环共用单飞任务和渲染执行器的等待状态，且调用方的事件循环仍被阻塞
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+    coroutine.close()
+    raise Exception("同步接口不能在运行中的事件循环内调用，请改用对应的异步接口，"
+                    "如 await generator.generate_report_async(...)")
+
+
+class ReportGenerator:
+    """周月报生成器"""
+    
+    def __init__(self, template_path: str, templates: Optional[TemplateRegistry] = None,
+                 report_cache: Optional[ReportCache] = None, data_provider: Optional[DataProvider] = None,
+                 report_writer: Optional[ReportWriter] = None, docx_template_path: Optional[str] = None,
+                 metrics: Optional[ServerMetrics] = None, render_executor: Optional[RenderExecutor] = None,
+                 period_engine: Optional[PeriodEngine] = None):
+        self.template_path = template_path
+        # Word模板默认与HTML模板同名
+        self.docx_template_path = docx_template_path or os.path.splitext(template_path)[0] + ".docx"
+        self.docx_templates = DocxTemplateLoader(self.docx_template_path)
+        self.templates = templates if templates is not None else TemplateRegistry()
+        self.report_cache = report_cache if report_cache is not None else create_report_cache_from_env()
+        self.data_provider = data_provider if data_provider is not None else create_data_provider_from_env()
+        self.report_writer = report_writer if report_writer is not None else create_report_writer_from_env()
+        # 按句柄分段读取归档中的报告
+        self.report_reader = ReportReader(self.report_writer)
+        self.metrics = metrics if metrics is not None else ServerMetrics()
+        # 渲染和文件读写在执行器中进行，不阻塞事件循环
+        self.render_executor = render_executor if render_executor is not None else create_render_executor_from_env()
+        # 相同的并发请求共享一次取数、渲染和写文件
+        self.single_flight = SingleFlight(self.metrics)
+        # 周期边界查预计算的日历表
+        self.periods = period_engine if period_engine is not None else get_period_engine()
+        # 新渲染的报告依次交给这些回调（如资源更新通知）
+        self.report_listeners: List[Callable[[Dict[str, Any], Optional[str]], Awaitable[None]]] = []
+        self.load_template()
+    
+    def load_template(self):
+        """加载（或重新加载）默认模板文件"""
+        self.templates.register(DEFAULT_TEMPLATE, self.template_path)
+    
+    @property
+    def template_content(self) -> str:
+        """默认模板内容"""
+        return self.templates.get().content
+    
+    @property
+    def compiled_template(self) -> CompiledTemplate:
+        """默认模板的渲染计划"""
+        return self.templates.get().compiled
+    
+    def get_time_period(self, report_type: str) -> Dict[str, Any]:
+        """根据报告类型（week/month/quarter/year/fiscal_quarter/fiscal_year）获取当前时间周期"""
+        return self.periods.current(report_type)
+    
+    def get_custom_period(self, start_date: str, end_date: str) -> Dict[str, Any]:
+        """根据起止日期（YYYY-MM-DD）获取自定义时间周期"""
+        try:
+            start = datetime.strptime(start_date, "%Y-%m-%d")
+            end = datetime.strptime(end_date, "%Y-%m-%d")
+        except ValueError:
+            raise Exception(f"日期格式错误，应为 YYYY-MM-DD: {start_date}, {end_date}")
+        if end < start:
+            raise Exception(f"结束日期早于开始日期: {start_date}, {end_date}")
+        # 恰好是自然周、自然月、季度、年度或财年时使用对应的报告类型
+        return self.periods.custom(start, end)
+    
+    def get_previous_period(self, current_period: Dict[str, Any]) -> Dict[str, Any]:
+        """获取上一个周期：周期报告和恰好为完整周期的日期范围（如 2025-03-01 至 2025-03-31）
+        取日历上的前一周期（2月），其他自定义范围为紧邻的等长区间
+        """
+        return self.periods.previous(current_period)
+    
+    async def get_data_fingerprint(self, period: Dict[str, Any], system_name: Optional[str] = None) -> str:
+        """获取数据源指纹，数据源内容变化时指纹随之变化"""
+        return await self.data_provider.fingerprint(period, system_name)
+    
+    async def fetch_data(self, period: Dict[str, Any], system_name: Optional[str] = None) -> Dict[str, Any]:
+        """从数据源异步获取数据，相同 (周期, 系统) 的并发请求只取数一次"""
+        return await self.single_flight.do(("fetch", period["period"], system_name),
+                                           lambda: self.data_provider.fetch(period, system_name))
+    
+    def _run_sync(self, coroutine: Coroutine) -> Any:
+        """同步接口在临时事件循环中运行，结束前释放数据源在该事件循环上的连接"""
+        async def run():
+            try:
+                return await coroutine
+            finally:
+                await self.data_provider.aclose()
+        try:
+            return run_sync(run())
+        finally:
+            # 被拒绝时协程未开始运行，关闭它以免出现协程未被等待的警告；已运行完的协程关闭无影响
+            coroutine.close()
+
+    def fetch_data_from_api(self, period: Dict[str, Any], system_name: Optional[str] = None) -> Dict[str, Any]:
+        """从数据源获取数据（同步接口，供脚本使用）"""
+        return self._run_sync(self.fetch_data(period, system_name))
+    
+    def replace_template_variables(self, content: str, data: Dict[str, Any], period: Dict[str, Any]) -> str:
+        """替换模板中的变量"""
+        # 加载的模板已预编译，其他内容按需编译
+        snapshot = self.templates.get().snapshot
+        if content == snapshot.content:
+            template = snapshot.compiled
+        else:
+            template = CompiledTemplate(content)
+        
+        return template.render(build_template_values(data, period), build_template_rows(data))
+    
+    def generate_report(self, report_type: str = "month", system_name: Optional[str] = None,
+                        period: Optional[Dict[str, Any]] = None) -> str:
+        """生成报告（同步接口，供脚本使用）"""
+        return self._run_sync(self.generate_report_async(report_type, system_name, period))
+    
+    async def generate_report_async(self, report_type: str = "month", system_name: Optional[str] = None,
+                                    period: Optional[Dict[str, Any]] = None) -> str:
+        """生成报告"""
+        cached = await self._get_cached_report(report_type, system_name, period)
+        return cached["content"]
+    
+    async def get_report_async(self, report_type: str = "month", system_name: Optional[str] = None,
+                               period: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """获取报告及其 ETag（报告内容的哈希），返回 {"content", "etag", "period"}"""
+        cached = await self._get_cached_report(report_type, system_name, period)
+        # 共享缓存中可能有未记录 ETag 的旧条目
+        etag = cached.get("etag") or report_etag(cached["content"])
+        return {"content": cached["content"], "etag": etag, "period": cached["period"]}
+    
+    def generate_and_save_report(self, report_type: str = "month", system_name: Optional[str] = None,
+                                 period: Optional[Dict[str, Any]] = None, output_format: str = "html") -> str:
+        """生成并保存报告（同步接口，供脚本使用）"""
+        return self._run_sync(self.generate_and_save_report_async(report_type, system_name, period, output_format))
+    
+    async def generate_and_save_report_async(self, report_type: str = "month", system_name: Optional[str] = None,
+                                             period: Optional[Dict[str, Any]] = None, output_format: str = "html") -> str:
+        """生成并保存报告，output_format 为 html 或 docx；HTML报告缓存命中且文件仍存在时不重复写入
+        
+        相同 (输出格式, 报告类型, 周期, 系统) 的并发请求共享一次生成，返回同一个文件
+        """
+        if output_format not in ("html", "docx"):
+            raise Exception(f"不支持的输出格式: {output_format}")
+        if period is None:
+            with self.metrics.stage("period"):
+                period = self.get_time_period(report_type)
+        key = ("save", output_format, report_type, period["period"], system_name)
+        if output_format == "docx":
+            return await self.single_flight.do(
+                key, lambda: self._generate_and_save_docx(report_type, system_name, period))
+        return await self.single_flight.do(key, lambda: self._generate_and_save_html(report_type, system_name, period))
+    
+    async def _generate_and_save_html(self, report_type: str, system_name: Optional[str],
+                                      period: Dict[str, Any]) -> str:
+        """生成HTML报告，缓存中的报告文件仍存在时不重复写入"""
+        cached = await self._get_cached_report(report_type, system_name, period)
+        output_path = cached["output_path"]
+        if output_path is None or not await asyncio.to_thread(os.path.exists, output_path):
+            cached["output_path"] = await self.save_report_async(cached["content"], system_name=system_name,
+                                                                 period=cached["period"])
+            # 共享缓存保存的是副本，写回文件路径供其他进程复用
+            await self.report_cache.put_async(cached["key"], cached, len(cached["content"].encode("utf-8")))
+        return cached["output_path"]
+    
+    async def _generate_and_save_docx(self, report_type: str, system_name: Optional[str],
+                                      period: Optional[Dict[str, Any]] = None) -> str:
+        """根据Word模板生成DOCX报告，渲染结果直接写入文件"""
+        if period is None:
+            with self.metrics.stage("period"):
+                period = self.get_time_period(report_type)
+        with self.metrics.stage("fetch"):
+            data = await self.fetch_data(period, system_name)
+        values = build_docx_values(data, period, system_name)
+        rows = build_template_rows(data)
+        template = await self.render_executor.call(self.docx_templates.get)
+        output_path = self.report_writer.path_for(system_name, period, suffix=".docx")
+        # DOCX边渲染边写入，渲染和写文件合并计时
+        with self.metrics.stage("docx_write") as timing:
+            await self.render_executor.call(self.report_writer.write_with, output_path,
+                                            lambda f: template.write(f, values, rows))
+            timing.bytes = await asyncio.to_thread(os.path.getsize, output_path)
+        return output_path
+    
+    async def _report_key(self, report_type: str, system_name: Optional[str],
+                          period: Dict[str, Any]) -> Tuple[Tuple, TemplateSnapshot]:
+        """报告的缓存键 (模板版本, 报告类型, 周期, 系统, 数据指纹) 和渲染使用的模板版本
+
+        缓存键和渲染使用同一个模板快照，取数期间模板重新加载也不会把新模板的结果存到旧版本的键下
+        """
+        template = self.templates.get(system=system_name).snapshot
+        with self.metrics.stage("fingerprint"):
+            fingerprint = await self.get_data_fingerprint(period, system_name)
+        return (template.version, report_type, period["period"], system_name, fingerprint), template
+    
+    async def _get_cached_report(self, report_type: str, system_name: Optional[str],
+                                 period: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """按 (模板版本, 报告类型, 周期, 系统, 数据指纹) 获取缓存的报告，未命中时生成
+        
+        period 为空时使用报告类型对应的当前周期
+        """
+        # 获取时间周期
+        if period is None:
+            with self.metrics.stage("period"):
+                period = self.get_time_period(report_type)
+        key, template = await self._report_key(report_type, system_name, period)
+        cached = await self.report_cache.get_async(key)
+        if cached is not None:
+            self.metrics.increment("cache_hits")
+            return cached
+        self.metrics.increment("cache_misses")
+        return await self.single_flight.do(("report",) + key,
+                                           lambda: self._render_report(key, template, period, system_name))
+    
+    async def _render_report(self, key: Tuple, template: TemplateSnapshot, period: Dict[str, Any],
+                             system_name: Optional[str]) -> Dict[str, Any]:
+        """取数并渲染报告，结果写入缓存"""
+        # 获取数据
+        with self.metrics.stage("fetch"):
+            data = await self.fetch_data(period, system_name)
+        
+        # 使用系统对应的模板渲染
+        with self.metrics.stage("render") as timing:
+            report_content = await self.render_executor.render(template, build_template_values(data, period),
+                                                               build_template_rows(data))
+            timing.bytes = len(report_content.encode("utf-8"))
+        
+        return await self._store_report(key, report_content, period, system_name)
+    
+    async def _store_report(self, key: Tuple, report_content: str, period: Dict[str, Any],
+                            system_name: Optional[str]) -> Dict[str, Any]:
+        """新渲染的报告写入缓存，并交给报告回调"""
+        cached = {"key": key, "content": report_content, "period": period, "output_path": None,
+                  "etag": report_etag(report_content)}
+        await self.report_cache.put_async(key, cached, len(report_content.encode("utf-8")))
+        for listener in self.report_listeners:
+            await listener(cached, system_name)
+        return cached
+    
+    def save_report(self, content: str, output_path: str = None, system_name: Optional[str] = None,
+                    period: Optional[Dict[str, Any]] = None) -> str:
+        """保存报告到文件（原子写入）
+        
+        未指定路径时保存到输出目录下按周期日期和系统划分的子目录，文件名不重复，
+        内容按哈希只存储一份并预先压缩；指定路径时只写入该文件
+        """
+        with self.metrics.stage("write") as timing:
+            timing.bytes = len(content.encode("utf-8"))
+            if output_path is None:
+                return self.report_writer.write(content, self.report_writer.path_for(system_name, period))
+            return self.report_writer.write(content, output_path, archive=False)
+    
+    async def save_report_async(self, content: str, output_path: str = None, system_name: Optional[str] = None,
+                                period: Optional[Dict[str, Any]] = None) -> str:
+        """保存报告到文件，文件操作在渲染执行器的线程池中执行，不阻塞事件循环"""
+        with self.metrics.stage("write") as timing:
+            timing.bytes = len(content.encode("utf-8"))
+            archive = output_path is None
+            if archive:
+                output_path = self.report_writer.path_for(system_name, period)
+            return await self.render_executor.call(self.report_writer.write, content, output_path, archive)
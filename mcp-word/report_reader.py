@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+报告分段读取：按字节范围或按章节读取已保存的报告
+功能：报告按内容哈希保存在报告写入器的对象目录中，哈希即报告句柄（与报告资源的 ETag 相同）；
+     读取时内存映射对象文件，只复制请求的范围，范围边界对齐到UTF-8字符；
+     章节目录在首次打开时扫描一次，之后按章节读取只需查表
+"""
+
+import mmap
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Tuple
+
+from report_writer import ReportWriter
+from template_engine import SECTION_BOUNDARY_BYTES, section_title
+
+
+# 单次读取的默认和最大字节数
+DEFAULT_READ_LENGTH = 64 * 1024
+MAX_READ_LENGTH = 1024 * 1024
+
+# 同时保持映射的报告数
+MAX_OPEN_REPORTS = 32
+
+_HANDLE_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def index_sections(data) -> List[Dict[str, Any]]:
+    """按章节元素切分报告，返回 [{"index", "title", "offset", "bytes"}]，各章节首尾相接覆盖全文
+
+    章节边界和标题与模板引擎的章节划分相同（template_engine.SECTION_BOUNDARY、section_title），
+    流式生成时逐章节发送的内容与按本目录切分缓存的报告得到的内容一致
+    """
+    size = len(data)
+    starts = [0] + [match.start() for match in SECTION_BOUNDARY_BYTES.finditer(data) if match.start() > 0]
+    sections = []
+    for index, start in enumerate(starts):
+        end = starts[index + 1] if index + 1 < len(starts) else size
+        title = section_title(bytes(data[start:end]).decode("utf-8"), index, len(starts))
+        sections.append({"index": index, "title": title, "offset": start, "bytes": end - start})
+    return sections
+
+
+def _char_start(data, position: int, limit: int) -> int:
+    """把位置向后移到UTF-8字符的首字节"""
+    while position < limit and data[position] & 0xC0 == 0x80:
+        position += 1
+    return position
+
+
+class ReportReader:
+    """报告分段读取器：报告句柄为报告内容的SHA-256，对应写入器对象目录中的 .html 对象
+
+    对象按内容寻址、写入后不再修改，映射可以一直复用；超过 max_open 个时关闭最久未使用的映射
+    """
+
+    def __init__(self, writer: ReportWriter, max_open: int = MAX_OPEN_REPORTS):
+        self.writer = writer
+        self.max_open = max_open
+        # 句柄 -> (内存映射, 章节目录)
+        self._open: "OrderedDict[str, Tuple[mmap.mmap, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def store(self, content: str) -> str:
+        """保存报告内容（已保存时跳过），返回报告句柄"""
+        object_path = self.writer.store_object(content.encode("utf-8"))
+        return os.path.splitext(os.path.basename(object_path))[0]
+
+    def _get(self, handle: str) -> Tuple[mmap.mmap, List[Dict[str, Any]]]:
+        if not _HANDLE_PATTERN.match(handle):
+            raise Exception(f"无效的报告句柄: {handle}")
+        with self._lock:
+            opened = self._open.get(handle)
+            if opened is not None:
+                self._open.move_to_end(handle)
+                return opened
+        path = self.writer.object_path(handle)
+        if not os.path.exists(path):
+            raise Exception(f"报告句柄不存在: {handle}，请先调用 open_report 打开报告")
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        opened = (data, index_sections(data))
+        with self._lock:
+            self._open[handle] = opened
+            while len(self._open) > self.max_open:
+                # 正在读取的映射由读取方持有引用，释放后自动关闭
+                self._open.popitem(last=False)
+        return opened
+
+    def outline(self, handle: str) -> Dict[str, Any]:
+        """报告的总字节数和章节目录"""
+        data, sections = self._get(handle)
+        return {"handle": handle, "bytes": len(data), "sections": sections}
+
+    def find_section(self, handle: str, section: str) -> Dict[str, Any]:
+        """按序号或标题查找章节，标题可以只写一部分（如"服务趋势"）"""
+        _, sections = self._get(handle)
+        if section.isdigit():
+            index = int(section)
+            if index < len(sections):
+                return sections[index]
+        for item in sections:
+            if section in item["title"]:
+                return item
+        raise Exception(f"报告中没有章节: {section}")
+
+    def read(self, handle: str, offset: int = 0, length: int = DEFAULT_READ_LENGTH,
+             section: Optional[str] = None) -> Dict[str, Any]:
+        """读取字节范围；指定 section 时 offset 为章节内的偏移，范围限于该章节
+
+        返回的范围对齐到UTF-8字符，实际读取的字节数可能比 length 少几个字节；
+        next_offset 为下一次读取的偏移，读完时为 None
+        """
+        data, _ = self._get(handle)
+        if section is not None:
+            item = self.find_section(handle, section)
+            base, size = item["offset"], item["bytes"]
+        else:
+            base, size = 0, len(data)
+        if offset < 0 or length <= 0:
+            raise Exception(f"无效的读取范围: offset={offset}, length={length}")
+        length = min(length, MAX_READ_LENGTH)
+        start = _char_start(data, base + min(offset, size), base + size)
+        end = min(start + length, base + size)
+        if end < base + size:
+            aligned = end
+            while aligned > start and data[aligned] & 0xC0 == 0x80:
+                aligned -= 1
+            # length 小于一个字符时至少读取一个完整字符
+            end = aligned if aligned > start else _char_start(data, start + 1, base + size)
+        return {
+            "handle": handle,
+            "section": item["title"] if section is not None else None,
+            "offset": start - base,
+            "length": end - start,
+            "total_bytes": size,
+            "next_offset": end - base if end < base + size else None,
+            "content": data[start:end].decode("utf-8"),
+        }
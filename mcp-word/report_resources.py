@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+报告资源：把生成的报告发布为MCP资源 report://{system}/{period}
+功能：资源内容为HTML报告，ETag 为报告内容的哈希，随报告缓存保存；
+     客户端可先用 ETag 检查报告是否变化（check_report 工具或 HTTP If-None-Match），
+     只在变化时重新读取；订阅资源后，报告重新渲染且内容变化时收到资源更新通知
+
+URI 格式：
+    report://all/month                          全部系统的当前月报（week/month/quarter/year/fiscal_quarter/fiscal_year）
+    report://<系统名称>/2025-11-01_2025-11-30    指定系统、指定日期范围的报告
+系统名称按URL编码，all 表示不区分系统
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Set, Tuple
+from urllib.parse import quote, unquote
+
+from pydantic import AnyUrl
+
+from period_engine import PERIOD_TYPES, CUSTOM
+
+
+SCHEME = "report://"
+URI_TEMPLATE = "report://{system}/{period}"
+ALL_SYSTEMS = "all"
+
+_RANGE_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})_(\d{4}-\d{2}-\d{2})$")
+
+# 记录最近的 ETag 的资源数上限
+MAX_TRACKED_URIS = 4096
+
+
+def report_etag(content: str) -> str:
+    """报告内容的SHA-256，与报告归档中的对象名相同，也用作分段读取的报告句柄"""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def report_uri(system_name: Optional[str], period_segment: str) -> str:
+    """报告资源URI，period_segment 为报告类型或 YYYY-MM-DD_YYYY-MM-DD"""
+    return f"{SCHEME}{quote(system_name, safe='') if system_name else ALL_SYSTEMS}/{period_segment}"
+
+
+def period_segment(period: Dict[str, Any]) -> str:
+    """周期在URI中的写法：起止日期"""
+    return f"{period['start_date'].strftime('%Y-%m-%d')}_{period['end_date'].strftime('%Y-%m-%d')}"
+
+
+def parse_report_uri(uri: str) -> Tuple[str, str]:
+    """拆分报告资源URI，返回 (系统, 周期) 两段"""
+    uri = str(uri)
+    parts = uri[len(SCHEME):].split("/") if uri.startswith(SCHEME) else []
+    if len(parts) != 2 or not all(parts):
+        raise Exception(f"无效的报告资源URI: {uri}")
+    return parts[0], parts[1]
+
+
+class ReportResources:
+    """报告资源：解析URI、读取报告及其 ETag，维护订阅并在报告内容变化时通知订阅者
+
+    generator 为 ReportGenerator 或 StreamingReportGenerator；
+    订阅只对有状态的会话有效（stdio、SSE 和有状态的 streamable-HTTP）
+    """
+
+    def __init__(self, generator, refresh_interval: Optional[float] = None):
+        self.generator = generator
+        # 订阅者定期检查数据指纹，数据变化时重新渲染并通知
+        self.refresh_interval = refresh_interval if refresh_interval is not None else float(
+            os.environ.get("REPORT_SUBSCRIPTION_INTERVAL", "60"))
+        # URI -> 订阅该资源的会话
+        self._subscribers: Dict[str, Set[Any]] = {}
+        # URI -> 最近一次读取或渲染的 ETag
+        self._etags: "OrderedDict[str, str]" = OrderedDict()
+        self._refresh_task: Optional[asyncio.Task] = None
+        generator.report_listeners.append(self.on_report_rendered)
+
+    def resolve(self, system: str, period: str) -> Tuple[str, Optional[str], Dict[str, Any]]:
+        """URI 的两段 -> (报告类型, 系统名称, 周期)"""
+        system = unquote(system)
+        system_name = None if system == ALL_SYSTEMS else system
+        if period in PERIOD_TYPES:
+            return period, system_name, self.generator.get_time_period(period)
+        match = _RANGE_PATTERN.match(period)
+        if not match:
+            raise Exception(f"无效的报告资源周期: {period}")
+        resolved = self.generator.get_custom_period(match.group(1), match.group(2))
+        # 恰好是完整周期时与对应的周期报告共用缓存
+        granularity = resolved.get("granularity", CUSTOM)
+        return (granularity if granularity in PERIOD_TYPES else CUSTOM), system_name, resolved
+
+    def uri_for(self, system_name: Optional[str], period: Dict[str, Any]) -> str:
+        """报告的规范URI（日期范围形式）"""
+        return report_uri(system_name, period_segment(period))
+
+    def note(self, system_name: Optional[str], period: Dict[str, Any], output_format: str = "html") -> str:
+        """工具结果中附带的报告资源URI，远程客户端可按URI读取报告；DOCX报告不发布为资源"""
+        if output_format != "html":
+            return ""
+        return f"\n报告资源: {self.uri_for(system_name, period)}"
+
+    def normalize(self, uri: str) -> str:
+        """统一URI的编码形式，用作订阅和 ETag 的键"""
+        system, period = parse_report_uri(uri)
+        system = unquote(system)
+        return report_uri(None if system == ALL_SYSTEMS else system, period)
+
+    async def get(self, system: str, period: str) -> Dict[str, Any]:
+        """读取报告（使用报告缓存），返回 {"uri", "etag", "content", "period"}，uri 为规范URI"""
+        report_type, system_name, resolved = self.resolve(system, period)
+        report = await self.generator.get_report_async(report_type, system_name, resolved)
+        uri = self.uri_for(system_name, resolved)
+        self._remember(uri, report["etag"])
+        self._remember(report_uri(system_name, period), report["etag"])
+        return {"uri": uri, "etag": report["etag"], "content": report["content"], "period": resolved}
+
+    async def get_uri(self, uri: str) -> Dict[str, Any]:
+        """按URI读取报告"""
+        return await self.get(*parse_report_uri(self.normalize(uri)))
+
+    async def check(self, uri: str, etag: Optional[str] = None) -> Dict[str, Any]:
+        """条件获取：只返回 ETag 和大小，不含报告内容；etag 为客户端已有版本"""
+        report = await self.get_uri(uri)
+        return {
+            "uri": report["uri"],
+            "period": report["period"]["period"],
+            "etag": report["etag"],
+            "bytes": len(report["content"].encode("utf-8")),
+            "changed": etag != report["etag"],
+        }
+
+    def _remember(self, uri: str, etag: str) -> Optional[str]:
+        """记录 URI 的最新 ETag，返回之前的 ETag"""
+        previous = self._etags.pop(uri, None)
+        self._etags[uri] = etag
+        while len(self._etags) > MAX_TRACKED_URIS:
+            self._etags.popitem(last=False)
+        return previous
+
+    def subscribe(self, uri: str, session: Any):
+        self._subscribers.setdefault(self.normalize(uri), set()).add(session)
+        if self.refresh_interval > 0 and (self._refresh_task is None or self._refresh_task.done()):
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+
+    def unsubscribe(self, uri: str, session: Any):
+        uri = self.normalize(uri)
+        sessions = self._subscribers.get(uri)
+        if sessions is not None:
+            sessions.discard(session)
+            if not sessions:
+                del self._subscribers[uri]
+
+    def subscriptions(self) -> int:
+        return sum(len(sessions) for sessions in self._subscribers.values())
+
+    async def on_report_rendered(self, report: Dict[str, Any], system_name: Optional[str]):
+        """生成器渲染出新报告后调用：ETag 与之前不同时通知订阅了对应资源的会话"""
+        period = report["period"]
+        uris = [self.uri_for(system_name, period)]
+        # 当前周期的报告同时对应周期别名
+        granularity = period.get("granularity")
+        if granularity in PERIOD_TYPES and self.generator.get_time_period(granularity)["period"] == period["period"]:
+            uris.append(report_uri(system_name, granularity))
+        for uri in uris:
+            previous = self._remember(uri, report["etag"])
+            if previous is not None and previous != report["etag"]:
+                await self._notify(uri)
+
+    async def _notify(self, uri: str):
+        for session in list(self._subscribers.get(uri, ())):
+            try:
+                await session.send_resource_updated(AnyUrl(uri))
+                self.generator.metrics.increment("resource_notifications")
+            except Exception:
+                # 会话已关闭
+                self.unsubscribe(uri, session)
+
+    async def _refresh(self):
+        """订阅期间定期读取被订阅的资源：数据指纹变化时会重新渲染，进而触发通知"""
+        while self._subscribers:
+            for uri in list(self._subscribers):
+                try:
+                    await self.get_uri(uri)
+                except Exception:
+                    pass
+            await asyncio.sleep(self.refresh_interval)
+
+    def install(self, server):
+        """在底层MCP服务上注册订阅和退订处理，并声明支持资源订阅"""
+        @server.subscribe_resource()
+        async def subscribe_report(uri: AnyUrl):
+            self.subscribe(str(uri), server.request_context.session)
+
+        @server.unsubscribe_resource()
+        async def unsubscribe_report(uri: AnyUrl):
+            self.unsubscribe(str(uri), server.request_context.session)
+
+        # 底层服务声明的资源能力固定为不支持订阅
+        get_capabilities = server.get_capabilities
+
+        def get_capabilities_with_subscribe(*args, **kwargs):
+            capabilities = get_capabilities(*args, **kwargs)
+            if capabilities.resources is not None:
+                capabilities.resources.subscribe = True
+            return capabilities
+
+        server.get_capabilities = get_capabilities_with_subscribe
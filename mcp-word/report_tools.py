@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+MCP工具注册：main 和 streaming_main 两个服务共用的工具、报告资源和HTTP路由
+功能：报告生成、模板和缓存信息、批量生成、服务指标（含 /metrics）、
+     报告资源 report://{system}/{period}（含 check_report、open_report、read_report 和 /reports 路由）
+"""
+
+import asyncio
+import json
+from typing import Dict, Any, Optional, List
+from urllib.parse import quote
+
+from mcp.server.fastmcp import FastMCP
+from starlette.requests import Request
+from starlette.responses import FileResponse, PlainTextResponse, Response
+
+from template_engine import fragment_cache
+from batch_reports import BatchReportRunner
+from report_reader import DEFAULT_READ_LENGTH
+from report_resources import ReportResources, URI_TEMPLATE
+from report_writer import select_variant
+from svg_charts import chart_cache
+
+
+def register_report_tools(mcp: FastMCP, generator) -> ReportResources:
+    """在 mcp 上注册共用的工具、资源和路由，generator 为 ReportGenerator 或其子类
+
+    Returns:
+        报告资源（服务模块用它生成报告资源URI）
+    """
+    # 批量生成报告，渲染提交到生成器的渲染执行器
+    batch_runner = BatchReportRunner(generator)
+
+    # 各阶段和各工具的耗时与计数
+    metrics = generator.metrics
+
+    # 生成的报告同时作为MCP资源 report://{system}/{period} 发布，ETag 为报告内容的哈希
+    resources = ReportResources(generator)
+    resources.install(mcp._mcp_server)
+
+    @mcp.tool()
+    async def generate_weekly_report(system_name: Optional[str] = None, output_format: str = "html") -> str:
+        """生成系统运维服务周报
+
+        Args:
+            system_name: 系统名称（可选）
+            output_format: 输出格式，html（默认）或 docx
+        """
+        try:
+            with metrics.tool("generate_weekly_report"):
+                period = generator.get_time_period("week")
+                output_path = await generator.generate_and_save_report_async("week", system_name, period, output_format)
+                return f"周报生成成功！文件已保存至: {output_path}" + resources.note(system_name, period, output_format)
+        except Exception as e:
+            return f"生成周报失败: {str(e)}"
+
+    @mcp.tool()
+    async def generate_monthly_report(system_name: Optional[str] = None, output_format: str = "html") -> str:
+        """生成系统运维服务月报
+
+        Args:
+            system_name: 系统名称（可选）
+            output_format: 输出格式，html（默认）或 docx
+        """
+        try:
+            with metrics.tool("generate_monthly_report"):
+                period = generator.get_time_period("month")
+                output_path = await generator.generate_and_save_report_async("month", system_name, period, output_format)
+                return f"月报生成成功！文件已保存至: {output_path}" + resources.note(system_name, period, output_format)
+        except Exception as e:
+            return f"生成月报失败: {str(e)}"
+
+    @mcp.tool()
+    async def generate_custom_report(start_date: str, end_date: str, system_name: Optional[str] = None,
+                                     output_format: str = "html") -> str:
+        """生成自定义时间范围的系统运维服务报告
+
+        Args:
+            start_date: 开始日期（格式：YYYY-MM-DD）
+            end_date: 结束日期（格式：YYYY-MM-DD）
+            system_name: 系统名称（可选）
+            output_format: 输出格式，html（默认）或 docx
+        """
+        try:
+            with metrics.tool("generate_custom_report"):
+                period = generator.get_custom_period(start_date, end_date)
+                output_path = await generator.generate_and_save_report_async("custom", system_name, period, output_format)
+                return f"自定义报告生成成功！文件已保存至: {output_path}" + resources.note(system_name, period, output_format)
+        except Exception as e:
+            return f"生成自定义报告失败: {str(e)}"
+
+    @mcp.tool()
+    async def get_report_template_info() -> str:
+        """获取报告模板信息"""
+        try:
+            with metrics.tool("get_report_template_info"):
+                # 直接读取注册表中的内存信息，不访问文件系统
+                lines = [f"已加载 {len(generator.templates.entries())} 个模板"]
+                for entry in generator.templates.entries():
+                    info = entry.info()
+                    lines.append(
+                        f"- {info['name']}（{info['system'] or '通用'}）: {info['path']}，大小: {info['size']} 字节，"
+                        f"版本: {info['version']}，加载时间: {info['loaded_at']}"
+                    )
+                return "\n".join(lines)
+        except Exception as e:
+            return f"获取模板信息失败: {str(e)}"
+
+    @mcp.tool()
+    async def generate_batch_reports(jobs: List[Dict[str, Any]], output_dir: Optional[str] = None) -> str:
+        """批量生成多个系统、多个周期的运维服务报告
+
+        Args:
+            jobs: 任务列表，每项为 {"system_name": "...", "report_type": "week"|"month"|"quarter"|"year"|"fiscal_quarter"|"fiscal_year"}
+                  或 {"system_name": "...", "start_date": "YYYY-MM-DD", "end_date": "YYYY-MM-DD"}，
+                  可选 "output_format": "html"|"docx"
+            output_dir: 报告保存目录（可选，默认为 REPORT_OUTPUT_DIR 指定的输出目录）
+
+        Returns:
+            JSON格式的清单：各任务的输出文件、取数和渲染耗时
+        """
+        try:
+            with metrics.tool("generate_batch_reports"):
+                manifest = await batch_runner.run(jobs, output_dir)
+                return json.dumps(manifest, ensure_ascii=False, indent=2)
+        except Exception as e:
+            return f"批量生成报告失败: {str(e)}"
+
+    @mcp.tool()
+    async def get_report_cache_info() -> str:
+        """获取报告缓存统计信息"""
+        try:
+            with metrics.tool("get_report_cache_info"):
+                stats = await asyncio.to_thread(generator.report_cache.stats)
+                fragments = fragment_cache.stats()
+                return (
+                    f"缓存条目: {stats['entries']}，占用: {stats['bytes']} 字节，"
+                    f"命中: {stats['hits']}，未命中: {stats['misses']}，命中率: {stats['hit_rate']}%，"
+                    f"淘汰: {stats['evictions']}，过期: {stats['expirations']}\n"
+                    f"章节片段缓存条目: {fragments['entries']}，占用: {fragments['bytes']} 字节，"
+                    f"命中率: {fragments['hit_rate']}%"
+                )
+        except Exception as e:
+            return f"获取缓存信息失败: {str(e)}"
+
+    def metrics_gauges() -> Dict[str, float]:
+        """指标导出时附带的即时值"""
+        stats = generator.report_cache.stats()
+        render_stats = generator.render_executor.stats()
+        return {"cache_entries": stats["entries"], "cache_bytes": stats["bytes"],
+                "templates": len(generator.templates.entries()),
+                "render_active": render_stats["active"], "render_queued": render_stats["queued"],
+                "render_rejected": render_stats["rejected"],
+                "chart_cache_entries": chart_cache.stats()["entries"],
+                "fragment_cache_entries": len(fragment_cache),
+                "resource_subscriptions": resources.subscriptions()}
+
+    @mcp.tool()
+    async def get_server_metrics() -> str:
+        """获取服务指标：各生成阶段和各工具的调用次数、错误次数、产出字节数和耗时，以及缓存计数
+
+        Returns:
+            JSON格式的指标；同样的指标以Prometheus文本格式在 SSE/HTTP 服务的 /metrics 路径提供
+        """
+        try:
+            snapshot = metrics.snapshot()
+            snapshot["gauges"] = metrics_gauges()
+            return json.dumps(snapshot, ensure_ascii=False, indent=2)
+        except Exception as e:
+            return f"获取服务指标失败: {str(e)}"
+
+    @mcp.custom_route("/metrics", methods=["GET"])
+    async def prometheus_metrics(request: Request) -> PlainTextResponse:
+        """Prometheus文本格式的服务指标"""
+        return PlainTextResponse(metrics.prometheus_text(metrics_gauges()), media_type="text/plain; version=0.0.4")
+
+    @mcp.resource(URI_TEMPLATE, name="report", mime_type="text/html",
+                  description="运维服务报告（HTML）。system 为URL编码的系统名称，all 表示全部系统；"
+                              "period 为 week/month/quarter/year/fiscal_quarter/fiscal_year（当前周期）"
+                              "或 YYYY-MM-DD_YYYY-MM-DD。可订阅，报告内容变化时发送资源更新通知")
+    async def report_resource(system: str, period: str) -> str:
+        """运维服务报告资源"""
+        with metrics.tool("report_resource"):
+            return (await resources.get(system, period))["content"]
+
+    @mcp.tool()
+    async def check_report(uri: str, etag: Optional[str] = None) -> str:
+        """检查报告资源的 ETag，不传输报告内容；客户端只在 ETag 变化时重新读取资源
+
+        Args:
+            uri: 报告资源URI，如 report://all/month 或 report://<系统名称>/2025-11-01_2025-11-30
+            etag: 客户端已有版本的 ETag（可选）
+
+        Returns:
+            JSON：规范URI（日期范围形式）、周期、ETag、字节数，以及与传入的 ETag 相比是否变化
+        """
+        try:
+            with metrics.tool("check_report"):
+                return json.dumps(await resources.check(uri, etag), ensure_ascii=False)
+        except Exception as e:
+            return f"检查报告失败: {str(e)}"
+
+    @mcp.tool()
+    async def open_report(uri: str) -> str:
+        """打开报告资源，返回报告句柄和章节目录，之后用 read_report 只读取需要的部分
+
+        Args:
+            uri: 报告资源URI，如 report://all/month 或 report://<系统名称>/2025-11-01_2025-11-30
+
+        Returns:
+            JSON：报告句柄（报告内容的哈希，与 ETag 相同）、规范URI、总字节数，
+            以及各章节的序号、标题、偏移和字节数
+        """
+        try:
+            with metrics.tool("open_report"):
+                report = await resources.get_uri(uri)
+                handle = await generator.render_executor.call(generator.report_reader.store, report["content"])
+                outline = await generator.render_executor.call(generator.report_reader.outline, handle)
+                return json.dumps({"uri": report["uri"], "period": report["period"]["period"], **outline},
+                                  ensure_ascii=False)
+        except Exception as e:
+            return f"打开报告失败: {str(e)}"
+
+    @mcp.tool()
+    async def read_report(handle: str, offset: int = 0, length: int = DEFAULT_READ_LENGTH,
+                          section: Optional[str] = None) -> str:
+        """按字节范围或章节读取报告的一部分
+
+        Args:
+            handle: open_report 返回的报告句柄
+            offset: 起始字节偏移（指定 section 时为章节内的偏移）
+            length: 读取的字节数，默认 65536，最大 1048576；范围对齐到UTF-8字符
+            section: 章节序号或标题（可只写一部分，如"服务趋势"），为空时读取全文范围
+
+        Returns:
+            JSON：本次读取的偏移、字节数、范围总字节数、下一次读取的偏移（读完时为 null）和内容
+        """
+        try:
+            with metrics.tool("read_report"):
+                result = await generator.render_executor.call(generator.report_reader.read, handle, offset, length,
+                                                              section)
+                return json.dumps(result, ensure_ascii=False)
+        except Exception as e:
+            return f"读取报告失败: {str(e)}"
+
+    @mcp.custom_route("/reports/{system}/{period}", methods=["GET"])
+    async def report_http(request: Request) -> Response:
+        """HTTP获取报告：响应带 ETag，请求头 If-None-Match 与之相同时返回 304，不重复传输；
+        报告从归档对象发送，客户端接受 br/gzip 时直接发送预压缩文件
+        """
+        try:
+            report = await resources.get(quote(request.path_params["system"], safe=""), request.path_params["period"])
+        except Exception as e:
+            return PlainTextResponse(f"获取报告失败: {str(e)}", status_code=404)
+        etag = f'"{report["etag"]}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        # 对象按内容寻址，句柄即 ETag，已保存时不重复写入
+        handle = await generator.render_executor.call(generator.report_reader.store, report["content"])
+        path, encoding = select_variant(generator.report_writer.object_path(handle),
+                                        request.headers.get("accept-encoding", ""))
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return FileResponse(path, media_type="text/html", headers=headers)
+
+    return resources
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+报告持久化：原子写入、不重名、按日期和系统分目录保存
+功能：内容先写入同目录的临时文件再原子重命名，读者不会看到写了一半的文件；
+     文件名包含微秒时间戳和随机后缀，并发生成的报告互不覆盖；
+     报告内容按哈希只存储一份，并预先压缩为gzip（安装brotli时同时生成br），
+     HTTP按 Accept-Encoding 直接发送预压缩文件
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from datetime import datetime
+from typing import Dict, Any, BinaryIO, Callable, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+DEFAULT_OUTPUT_DIR = "reports"
+ALL_SYSTEMS_DIR = "全部系统"
+OBJECTS_DIR = "objects"
+
+# 文件名中不允许出现的字符
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+def write_atomic(path: str, data: bytes, fsync: bool = False):
+    """原子写入：写入临时文件后重命名为目标文件"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".part")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def compress(data: bytes) -> List[Tuple[str, bytes]]:
+    """预压缩内容，返回 [(扩展名, 压缩后字节)]；mtime 固定为0，相同内容的压缩结果相同"""
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+    return variants
+
+
+def _link_atomic(source: str, path: str):
+    """把 path 原子地指向 source 的内容：优先硬链接，文件系统不支持时复制"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}.part")
+    try:
+        try:
+            os.link(source, temp_path)
+        except OSError:
+            shutil.copyfile(source, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def select_variant(path: str, accept_encoding: str = "") -> Tuple[str, Optional[str]]:
+    """按 Accept-Encoding 选择预压缩文件，返回 (文件路径, Content-Encoding)"""
+    accepted = {item.split(";")[0].strip().lower() for item in accept_encoding.split(",")}
+    for encoding, suffix in (("br", ".br"), ("gzip", ".gz")):
+        if encoding in accepted and os.path.exists(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+class ReportWriter:
+    """报告文件写入器
+
+    目录结构：{output_dir}/{周期开始日期 YYYY-MM-DD}/{系统名称}/运维服务报告_{时间戳}_{随机后缀}.html，
+    未指定周期时使用当天日期，未指定系统时为"全部系统"。
+
+    内容寻址时，报告内容保存在 {output_dir}/objects/{哈希前2位}/{哈希}.html（及 .gz/.br），
+    报告路径及其 .gz/.br 是指向对象的硬链接，重复生成的相同内容只占用一份磁盘空间。
+    """
+
+    def __init__(self, output_dir: str = DEFAULT_OUTPUT_DIR, fsync: bool = False,
+                 content_addressed: bool = True, precompress: bool = True):
+        self.output_dir = output_dir
+        self.fsync = fsync
+        self.content_addressed = content_addressed
+        self.precompress = precompress
+
+    def object_path(self, digest: str, suffix: str = ".html", output_dir: Optional[str] = None) -> str:
+        """内容哈希对应的对象路径"""
+        return os.path.join(output_dir or self.output_dir, OBJECTS_DIR, digest[:2], digest + suffix)
+
+    def store_object(self, data: bytes, output_dir: Optional[str] = None) -> str:
+        """按内容哈希保存对象（已存在时跳过），返回对象路径"""
+        object_path = self.object_path(hashlib.sha256(data).hexdigest(), output_dir=output_dir)
+        if not os.path.exists(object_path):
+            # 先写压缩文件，对象存在即表示压缩文件齐全
+            if self.precompress:
+                for suffix, compressed in compress(data):
+                    write_atomic(object_path + suffix, compressed, self.fsync)
+            write_atomic(object_path, data, self.fsync)
+        return object_path
+
+    def path_for(self, system_name: Optional[str] = None, period: Optional[Dict[str, Any]] = None,
+                 output_dir: Optional[str] = None, suffix: str = ".html") -> str:
+        """生成不重名的报告路径"""
+        now = datetime.now()
+        day = (period or {}).get("start_date") or now
+        system_dir = _UNSAFE_CHARS.sub("_", system_name).strip("._") if system_name else ALL_SYSTEMS_DIR
+        filename = f"运维服务报告_{now.strftime('%Y%m%d_%H%M%S_%f')}_{uuid.uuid4().hex[:8]}{suffix}"
+        return os.path.join(output_dir or self.output_dir, day.strftime("%Y-%m-%d"), system_dir or ALL_SYSTEMS_DIR,
+                            filename)
+
+    def write(self, content: str, output_path: str, archive: bool = True, output_dir: Optional[str] = None) -> str:
+        """同步写入报告
+
+        archive 为 False 时只原子写入该文件，不做内容寻址和预压缩；
+        output_dir 为对象所在的输出目录，应与生成 output_path 时使用的目录一致
+        """
+        data = content.encode("utf-8")
+        if not archive:
+            write_atomic(output_path, data, self.fsync)
+            return output_path
+        if not self.content_addressed:
+            write_atomic(output_path, data, self.fsync)
+            if self.precompress:
+                for suffix, compressed in compress(data):
+                    write_atomic(output_path + suffix, compressed, self.fsync)
+            return output_path
+
+        object_path = self.store_object(data, output_dir)
+        if self.precompress:
+            for suffix in (".gz", ".br"):
+                if os.path.exists(object_path + suffix):
+                    _link_atomic(object_path + suffix, output_path + suffix)
+        _link_atomic(object_path, output_path)
+        return output_path
+
+    def write_with(self, output_path: str, write_content: Callable[[BinaryIO], None],
+                   output_dir: Optional[str] = None) -> str:
+        """由 write_content 向文件对象写入内容（用于DOCX等已压缩的二进制格式），按内容寻址但不预压缩"""
+        directory = os.path.dirname(output_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".part")
+        try:
+            with os.fdopen(fd, 'w+b') as f:
+                write_content(f)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+                f.seek(0)
+                digest = hashlib.sha256()
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+            if not self.content_addressed:
+                os.replace(temp_path, output_path)
+                return output_path
+            object_path = self.object_path(digest.hexdigest(), os.path.splitext(output_path)[1], output_dir)
+            if os.path.exists(object_path):
+                os.remove(temp_path)
+            else:
+                os.makedirs(os.path.dirname(object_path), exist_ok=True)
+                shutil.move(temp_path, object_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        _link_atomic(object_path, output_path)
+        return output_path
+
+
+def create_report_writer_from_env() -> ReportWriter:
+    """根据环境变量 REPORT_OUTPUT_DIR 创建报告写入器"""
+    return ReportWriter(os.environ.get("REPORT_OUTPUT_DIR", DEFAULT_OUTPUT_DIR))
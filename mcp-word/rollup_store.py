@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+日汇总存储：按 (日期, 系统) 和 (日期, 系统, 服务类别) 持久化计数器
+功能：工单导入时批量汇总为每日计数器并增量写入SQLite；
+     任意日期范围的报告数据由几十个日汇总行求和得到，不再扫描原始工单
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from data_providers import DataProvider, METRIC_GROUPS
+from data_providers import build_trend_series
+from metrics_engine import COUNTER_FIELDS, TicketTable, build_report_data
+from period_engine import get_period_engine
+
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS daily_metrics (
+    day TEXT NOT NULL,
+    system TEXT NOT NULL,
+    {", ".join(f"{name} INTEGER NOT NULL DEFAULT 0" for name in COUNTER_FIELDS)},
+    PRIMARY KEY (day, system)
+);
+CREATE INDEX IF NOT EXISTS idx_daily_metrics_system_day ON daily_metrics (system, day);
+CREATE TABLE IF NOT EXISTS daily_categories (
+    day TEXT NOT NULL,
+    system TEXT NOT NULL,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, system, category)
+);
+CREATE INDEX IF NOT EXISTS idx_daily_categories_system_day ON daily_categories (system, day);
+CREATE TABLE IF NOT EXISTS rollup_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _day_str(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d")
+
+
+def summarize_tickets(table: TicketTable) -> Tuple[List[tuple], List[tuple]]:
+    """把工单表批量汇总为日汇总行
+
+    Returns:
+        (每日计数器行 (day, system, *计数器), 每日类别行 (day, system, category, count))
+    """
+    if len(table) == 0:
+        return [], []
+    day_values, day_codes = np.unique(table.created_at.astype("datetime64[D]"), return_inverse=True)
+    system_count = len(table.systems)
+    groups, inverse = np.unique(day_codes.astype(np.int64) * system_count + table.system, return_inverse=True)
+    group_days = day_values[groups // system_count].astype(str).tolist()
+    group_systems = table.systems[groups % system_count].tolist()
+
+    masks = table.counter_masks()
+    columns = [np.bincount(inverse, weights=masks[name], minlength=len(groups)).astype(np.int64).tolist()
+               for name in COUNTER_FIELDS]
+    metric_rows = list(zip(group_days, group_systems, *columns))
+
+    category_count = len(table.categories)
+    keys, counts = np.unique(inverse.astype(np.int64) * category_count + table.category, return_counts=True)
+    key_groups = keys // category_count
+    category_rows = list(zip(
+        [group_days[index] for index in key_groups.tolist()],
+        [group_systems[index] for index in key_groups.tolist()],
+        table.categories[keys % category_count].tolist(),
+        counts.tolist(),
+    ))
+    return metric_rows, category_rows
+
+
+class RollupStore:
+    """基于SQLite的日汇总存储
+
+    每个线程使用独立连接；数据库使用WAL模式，多个进程可同时读取。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def add_tickets(self, table: TicketTable) -> int:
+        """累加新工单：已有日汇总行的计数器加上新工单的计数，返回写入的日汇总行数"""
+        metric_rows, category_rows = summarize_tickets(table)
+        updates = ", ".join(f"{name} = {name} + excluded.{name}" for name in COUNTER_FIELDS)
+        with self._connect() as connection:
+            connection.executemany(
+                f"INSERT INTO daily_metrics (day, system, {', '.join(COUNTER_FIELDS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(COUNTER_FIELDS))}) "
+                f"ON CONFLICT (day, system) DO UPDATE SET {updates}",
+                metric_rows,
+            )
+            connection.executemany(
+                "INSERT INTO daily_categories (day, system, category, count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (day, system, category) DO UPDATE SET count = count + excluded.count",
+                category_rows,
+            )
+            self._bump_revision(connection)
+        return len(metric_rows)
+
+    def replace_days(self, table: TicketTable) -> int:
+        """重算工单覆盖的 (日期, 系统)：这些日期中这些系统的汇总行被完整替换（用于工单状态变化后的重新导出），
+        其他系统同一天的汇总行保持不变
+        """
+        metric_rows, category_rows = summarize_tickets(table)
+        pairs = sorted({row[:2] for row in metric_rows} | {row[:2] for row in category_rows})
+        with self._connect() as connection:
+            connection.executemany("DELETE FROM daily_metrics WHERE day = ? AND system = ?", pairs)
+            connection.executemany("DELETE FROM daily_categories WHERE day = ? AND system = ?", pairs)
+            connection.executemany(
+                f"INSERT INTO daily_metrics (day, system, {', '.join(COUNTER_FIELDS)}) "
+                f"VALUES (?, ?, {', '.join('?' * len(COUNTER_FIELDS))})",
+                metric_rows,
+            )
+            connection.executemany(
+                "INSERT INTO daily_categories (day, system, category, count) VALUES (?, ?, ?, ?)",
+                category_rows,
+            )
+            self._bump_revision(connection)
+        return len(metric_rows)
+
+    @staticmethod
+    def _bump_revision(connection: sqlite3.Connection):
+        connection.execute(
+            "INSERT INTO rollup_meta (key, value) VALUES ('revision', '1') "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def revision(self) -> str:
+        """数据版本，每次写入后递增"""
+        row = self._connect().execute("SELECT value FROM rollup_meta WHERE key = 'revision'").fetchone()
+        return row[0] if row else "0"
+
+    def sum_counters(self, start_day: str, end_day: str, system_name: Optional[str] = None) -> Dict[str, int]:
+        """对 [start_day, end_day] 的日汇总行求和"""
+        sql = f"SELECT {', '.join(f'COALESCE(SUM({name}), 0)' for name in COUNTER_FIELDS)} FROM daily_metrics WHERE "
+        sql, params = self._where(sql, start_day, end_day, system_name)
+        row = self._connect().execute(sql, params).fetchone()
+        return dict(zip(COUNTER_FIELDS, row))
+
+    def sum_categories(self, start_day: str, end_day: str, system_name: Optional[str] = None) -> List[Tuple[str, int]]:
+        """对 [start_day, end_day] 的类别日汇总行按类别求和"""
+        sql, params = self._where("SELECT category, SUM(count) FROM daily_categories WHERE ",
+                                  start_day, end_day, system_name)
+        return self._connect().execute(sql + " GROUP BY category", params).fetchall()
+
+    def sum_totals(self, starts: List[str], end_day: str, system_name: Optional[str] = None) -> List[int]:
+        """相邻周期的服务总量：第 i 个周期为 [starts[i], starts[i+1])，最后一个周期到 end_day 为止
+
+        一次查询取出整个范围的每日总量，再按周期边界分桶
+        """
+        sql, params = self._where("SELECT day, SUM(total_service) FROM daily_metrics WHERE ",
+                                  starts[0], end_day, system_name)
+        rows = self._connect().execute(sql + " GROUP BY day", params).fetchall()
+        totals = np.zeros(len(starts), dtype=np.int64)
+        if rows:
+            days, counts = zip(*rows)
+            # 日期为 YYYY-MM-DD 文本，按字符串比较即按日期比较
+            np.add.at(totals, np.searchsorted(np.array(starts), np.array(days), side="right") - 1, counts)
+        return totals.tolist()
+
+    def unresolved_before(self, start_day: str, system_name: Optional[str] = None) -> int:
+        """start_day 之前创建且仍未解决的工单数"""
+        sql = "SELECT COALESCE(SUM(unresolved), 0) FROM daily_metrics WHERE day < ?"
+        params: List[Any] = [start_day]
+        if system_name:
+            sql += " AND system = ?"
+            params.append(system_name)
+        return self._connect().execute(sql, params).fetchone()[0]
+
+    @staticmethod
+    def _where(sql: str, start_day: str, end_day: str, system_name: Optional[str]) -> Tuple[str, List[Any]]:
+        params: List[Any] = [start_day, end_day]
+        sql += "day BETWEEN ? AND ?"
+        if system_name:
+            sql += " AND system = ?"
+            params.append(system_name)
+        return sql, params
+
+    def compute(self, start: datetime, end: datetime, system_name: Optional[str] = None,
+                trend_periods: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """计算 [start, end] 日期范围内的报告数据
+
+        trend_periods 为本期及之前各周期（按时间先后、首尾相接，最后一项为本期），
+        各周期的服务总量由一次查询得出，组成趋势序列，上一周期为其中的倒数第二项；
+        为空时上一周期为紧邻的等长区间，不计算趋势序列
+        """
+        start_day, end_day = _day_str(start), _day_str(end)
+        if trend_periods and len(trend_periods) > 1:
+            starts = [_day_str(period["start_date"]) for period in trend_periods[:-1]]
+        else:
+            length = (end.date() - start.date()).days + 1
+            starts = [_day_str(start - timedelta(days=length))]
+        totals = self.sum_totals(starts + [start_day], end_day, system_name)
+        return build_report_data(
+            self.sum_counters(start_day, end_day, system_name),
+            previous_total=totals[-2],
+            unresolved_history=self.unresolved_before(start_day, system_name),
+            category_counts=self.sum_categories(start_day, end_day, system_name),
+            trend_series=build_trend_series(trend_periods, totals[-len(trend_periods):]) if trend_periods else None,
+        )
+
+
+class RollupDataProvider(DataProvider):
+    """日汇总数据源：报告数据由日汇总行求和得到，查询在线程中执行"""
+
+    def __init__(self, store: RollupStore):
+        self.store = store
+
+    async def fetch(self, period: Dict[str, Any], system_name: Optional[str] = None) -> Dict[str, Any]:
+        # 上一周期取日历上的前一周期（如上个自然月），而不是等长区间
+        return await asyncio.to_thread(self.store.compute, period["start_date"], period["end_date"], system_name,
+                                       get_period_engine().trend(period))
+
+    async def fetch_group(self, group: str, period: Dict[str, Any], system_name: Optional[str]) -> Dict[str, Any]:
+        data = await self.fetch(period, system_name)
+        return {field: data[field] for field in METRIC_GROUPS[group]}
+
+    async def fingerprint(self, period: Dict[str, Any], system_name: Optional[str] = None) -> str:
+        return await asyncio.to_thread(self.store.revision)
+
+
+def main():
+    """命令行：把工单导出文件导入日汇总存储"""
+    parser = argparse.ArgumentParser(description="导入工单到日汇总存储")
+    parser.add_argument("tickets", help="工单导出文件（CSV 或 JSONL）")
+    parser.add_argument("--db", default=os.environ.get("REPORT_ROLLUP_DB", "rollups.db"), help="日汇总数据库路径")
+    parser.add_argument("--replace", action="store_true", help="替换工单覆盖日期的已有汇总（默认累加）")
+    args = parser.parse_args()
+
+    store = RollupStore(args.db)
+    table = TicketTable.from_file(args.tickets)
+    rows = store.replace_days(table) if args.replace else store.add_tickets(table)
+    print(f"已导入 {len(table)} 条工单，写入 {rows} 条日汇总，数据版本: {store.revision()}")
+
+
+if __name__ == "__main__":
+    main()
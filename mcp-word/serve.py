@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+生产部署：多进程 streamable-HTTP 服务
+功能：启动 N 个工作进程共享同一个监听端口，每个进程运行一份MCP服务；
+     会话使用无状态模式，任一进程都能处理任一请求；无状态模式下没有持续的会话，
+     报告资源的订阅和更新通知不可用，客户端改用 check_report 或 HTTP If-None-Match 检查报告是否变化；
+     报告缓存、日汇总存储和报告归档放在本机共享存储（SQLite数据库和报告目录）中，
+     所有工作进程看到同一份已生成的报告
+
+用法：
+    python serve.py --workers 4 --port 8000
+    python serve.py --app main --workers 2     # 使用非流式版本的工具集
+环境变量（REPORT_CACHE_DB、REPORT_OUTPUT_DIR、REPORT_ROLLUP_DB 等）和 --cache-db 中的相对路径以启动目录为准
+"""
+
+import argparse
+import importlib
+import os
+import sys
+from typing import Optional
+
+import uvicorn
+from starlette.applications import Starlette
+
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_MODULES = ("streaming_main", "main")
+DEFAULT_CACHE_DB = "report_cache.db"
+
+# 取值为文件或目录路径的环境变量
+PATH_SETTINGS = ("REPORT_CACHE_DB", "REPORT_OUTPUT_DIR", "REPORT_ROLLUP_DB", "REPORT_TICKET_FILE",
+                 "REPORT_DATA_FILE", "REPORT_TEMPLATE_DIR")
+
+
+def create_app() -> Starlette:
+    """工作进程中创建ASGI应用（uvicorn 工厂函数），服务模块由环境变量 REPORT_SERVER_MODULE 指定"""
+    module = importlib.import_module(os.environ.get("REPORT_SERVER_MODULE", "streaming_main"))
+    # 请求可能落到任一工作进程，不能依赖进程内的会话状态
+    module.mcp.settings.stateless_http = True
+    return module.mcp.streamable_http_app()
+
+
+def resolve_path_settings(cache_db: Optional[str] = None):
+    """把环境变量和 --cache-db 给出的相对路径转为以启动目录为准的绝对路径（服务随后切换到本目录）；
+    未设置时共享缓存使用本目录下的 DEFAULT_CACHE_DB
+    """
+    if cache_db:
+        os.environ["REPORT_CACHE_DB"] = cache_db
+    for name in PATH_SETTINGS:
+        if os.environ.get(name):
+            os.environ[name] = os.path.abspath(os.environ[name])
+    if not os.environ.get("REPORT_CACHE_DB"):
+        os.environ["REPORT_CACHE_DB"] = os.path.join(APP_DIR, DEFAULT_CACHE_DB)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程 streamable-HTTP 报告服务")
+    parser.add_argument("--app", choices=SERVER_MODULES, default="streaming_main", help="服务模块")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="工作进程数，默认CPU核数")
+    parser.add_argument("--cache-db", help=f"共享报告缓存数据库，默认取 REPORT_CACHE_DB 或 {DEFAULT_CACHE_DB}")
+    args = parser.parse_args()
+
+    # 工作进程继承环境变量
+    os.environ["REPORT_SERVER_MODULE"] = args.app
+    resolve_path_settings(args.cache_db)
+    # 默认模板等内置的相对路径以本目录为准
+    os.chdir(APP_DIR)
+    print(f"启动 {args.workers} 个工作进程: http://{args.host}:{args.port}/mcp，"
+          f"共享缓存: {os.environ['REPORT_CACHE_DB']}", file=sys.stderr)
+    uvicorn.run("serve:create_app", factory=True, host=args.host, port=args.port, workers=args.workers,
+                app_dir=APP_DIR, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
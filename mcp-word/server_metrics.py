@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+服务指标：报告生成各阶段和各MCP工具的耗时与计数
+功能：记录调用次数、错误次数、产出字节数和耗时分布（固定分桶的直方图），
+     以及缓存命中等计数器；可导出为字典或Prometheus文本格式
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+
+# 直方图分桶上限（秒）
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE = "stage"
+TOOL = "tool"
+
+
+class TimingStats:
+    """单个阶段或工具的统计"""
+
+    __slots__ = ("calls", "errors", "bytes", "total_ns", "max_ns", "bucket_counts")
+
+    def __init__(self, bucket_count: int):
+        self.calls = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        # 最后一个分桶为 +Inf
+        self.bucket_counts = [0] * (bucket_count + 1)
+
+
+class Timing:
+    """计时中的一次调用，调用方可在结束前设置产出字节数"""
+
+    __slots__ = ("bytes",)
+
+    def __init__(self):
+        self.bytes = 0
+
+
+class ServerMetrics:
+    """线程安全的服务指标，记录一次调用只需一次加锁和一次二分查找"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._bucket_ns = [int(bound * 1e9) for bound in self.buckets]
+        self._timings: Dict[Tuple[str, str], TimingStats] = {}
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def observe(self, kind: str, name: str, elapsed_ns: int, nbytes: int = 0, error: bool = False):
+        """记录一次调用：kind 为 stage 或 tool"""
+        bucket = bisect.bisect_left(self._bucket_ns, elapsed_ns)
+        with self._lock:
+            stats = self._timings.get((kind, name))
+            if stats is None:
+                stats = self._timings[(kind, name)] = TimingStats(len(self.buckets))
+            stats.calls += 1
+            stats.bytes += nbytes
+            stats.total_ns += elapsed_ns
+            if elapsed_ns > stats.max_ns:
+                stats.max_ns = elapsed_ns
+            stats.bucket_counts[bucket] += 1
+            if error:
+                stats.errors += 1
+
+    @contextmanager
+    def timer(self, kind: str, name: str) -> Iterator[Timing]:
+        """计时上下文：退出时记录耗时，抛出异常时计为错误"""
+        timing = Timing()
+        started = time.perf_counter_ns()
+        try:
+            yield timing
+        except BaseException:
+            self.observe(kind, name, time.perf_counter_ns() - started, timing.bytes, error=True)
+            raise
+        self.observe(kind, name, time.perf_counter_ns() - started, timing.bytes)
+
+    def stage(self, name: str):
+        """报告生成阶段计时：period、fingerprint、fetch、render、write 等"""
+        return self.timer(STAGE, name)
+
+    def tool(self, name: str):
+        """MCP工具计时"""
+        return self.timer(TOOL, name)
+
+    def increment(self, name: str, value: int = 1):
+        """累加计数器"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def reset(self):
+        """清空所有指标"""
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前指标：{"uptime_seconds", "stages": {...}, "tools": {...}, "counters": {...}}"""
+        with self._lock:
+            timings = [(key, stats.calls, stats.errors, stats.bytes, stats.total_ns, stats.max_ns)
+                       for key, stats in self._timings.items()]
+            counters = dict(self._counters)
+        result: Dict[str, Any] = {"uptime_seconds": round(time.time() - self.started_at, 1),
+                                  "stages": {}, "tools": {}, "counters": counters}
+        for (kind, name), calls, errors, nbytes, total_ns, max_ns in sorted(timings):
+            result["stages" if kind == STAGE else "tools"][name] = {
+                "calls": calls,
+                "errors": errors,
+                "bytes": nbytes,
+                "total_ms": round(total_ns / 1e6, 3),
+                "mean_ms": round(total_ns / calls / 1e6, 3) if calls else 0,
+                "max_ms": round(max_ns / 1e6, 3),
+            }
+        return result
+
+    def prometheus_text(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """导出为Prometheus文本格式，gauges 为额外的即时值（如缓存条目数）"""
+        with self._lock:
+            timings = [(kind, name, stats.calls, stats.errors, stats.bytes, stats.total_ns, list(stats.bucket_counts))
+                       for (kind, name), stats in self._timings.items()]
+            counters = dict(self._counters)
+
+        lines: List[str] = []
+        for kind in (STAGE, TOOL):
+            metric = f"report_{kind}"
+            rows = sorted(timing[1:] for timing in timings if timing[0] == kind)
+            lines.append(f"# HELP {metric}_duration_seconds 耗时分布")
+            lines.append(f"# TYPE {metric}_duration_seconds histogram")
+            for name, calls, _, _, total_ns, bucket_counts in rows:
+                label = f'{kind}="{_escape(name)}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, bucket_counts):
+                    cumulative += count
+                    lines.append(f'{metric}_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_duration_seconds_bucket{{{label},le="+Inf"}} {calls}')
+                lines.append(f"{metric}_duration_seconds_sum{{{label}}} {total_ns / 1e9:.9f}")
+                lines.append(f"{metric}_duration_seconds_count{{{label}}} {calls}")
+            for suffix, index, help_text in (("calls_total", 0, "调用次数"), ("errors_total", 1, "错误次数"),
+                                             ("bytes_total", 2, "产出字节数")):
+                lines.append(f"# HELP {metric}_{suffix} {help_text}")
+                lines.append(f"# TYPE {metric}_{suffix} counter")
+                for name, *values in rows:
+                    lines.append(f'{metric}_{suffix}{{{kind}="{_escape(name)}"}} {values[index]}')
+
+        for name in sorted(counters):
+            lines.append(f"# TYPE report_{name}_total counter")
+            lines.append(f"report_{name}_total {counters[name]}")
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE report_{name} gauge")
+            lines.append(f"report_{name} {value}")
+        lines.append("# TYPE report_uptime_seconds gauge")
+        lines.append(f"report_uptime_seconds {time.time() - self.started_at:.1f}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    """转义Prometheus标签值"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+请求合并：相同的并发请求共享一次执行
+功能：按键记录执行中的任务，同一键的后续调用直接等待该任务的结果，
+     任务结束后移除记录，之后的调用重新执行；
+     某个调用方被取消时不影响共享同一任务的其他调用方
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from server_metrics import ServerMetrics
+
+
+class SingleFlight:
+    """按键合并并发调用，只在事件循环中使用"""
+
+    def __init__(self, metrics: Optional[ServerMetrics] = None):
+        self.metrics = metrics
+        self._tasks: Dict[Hashable, "asyncio.Task"] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 func()；同一键已有执行中的任务时等待其结果，不再重复执行"""
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self.coalesced += 1
+            if self.metrics is not None:
+                self.metrics.increment("coalesced_requests")
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: "asyncio.Task"):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # 所有调用方都已取消时，避免出现未读取异常的警告
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._tasks)
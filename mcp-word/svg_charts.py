@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+SVG图表：服务类别分布和服务趋势的内嵌图表
+功能：直接拼接SVG文本，不依赖绘图库；坐标取整，样式写在分组元素上，输出紧凑；
+     图表按输入数据的哈希缓存，相同数据只绘制一次
+"""
+
+import hashlib
+import html
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+
+FONT = 'font-family="Microsoft YaHei,Arial,sans-serif"'
+BAR_COLOR = "#3498db"
+LINE_COLOR = "#2c3e50"
+TEXT_COLOR = "#333"
+MUTED_COLOR = "#666"
+
+# 类别图最多显示的类别数，其余合并为"其他"
+CATEGORY_LIMIT = 10
+# 标签超出此长度时截断，完整名称放在 <title> 中
+LABEL_LENGTH = 14
+
+
+class ChartCache:
+    """图表缓存：按 (图表类型, 输入数据) 的哈希保存绘制结果，按最久未使用淘汰"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, kind: str, payload: Tuple, render: Callable[[Tuple], str]) -> str:
+        key = hashlib.blake2b(repr((kind, payload)).encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            svg = self._entries.get(key)
+            if svg is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return svg
+            self.misses += 1
+        # 绘制不持锁，并发的相同请求最多重复绘制一次
+        svg = render(payload)
+        with self._lock:
+            self._entries[key] = svg
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return svg
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+chart_cache = ChartCache()
+
+
+def _label(text: str) -> str:
+    return html.escape(text if len(text) <= LABEL_LENGTH else text[:LABEL_LENGTH - 1] + "…")
+
+
+def _draw_category_chart(items: Tuple[Tuple[str, int], ...]) -> str:
+    """横向条形图：每个类别一行，显示数量和占比"""
+    total = sum(count for _, count in items)
+    rows = list(items[:CATEGORY_LIMIT])
+    rest = sum(count for _, count in items[CATEGORY_LIMIT:])
+    if rest:
+        rows.append(("其他", rest))
+
+    width, label_width, bar_width, row_height = 640, 180, 340, 24
+    height = len(rows) * row_height + 8
+    largest = max(count for _, count in rows)
+    labels: List[str] = []
+    bars: List[str] = []
+    values: List[str] = []
+    for index, (name, count) in enumerate(rows):
+        y = 4 + index * row_height
+        length = max(round(count / largest * bar_width), 1)
+        labels.append(f'<text x="{label_width - 8}" y="{y + 16}">{_label(name.rsplit("/", 1)[-1])}</text>')
+        bars.append(f'<rect x="{label_width}" y="{y + 4}" width="{length}" height="16">'
+                    f'<title>{html.escape(name)}</title></rect>')
+        values.append(f'<text x="{label_width + length + 6}" y="{y + 16}">{count}（{count / total * 100:.1f}%）</text>')
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="{width}" height="{height}" '
+        f'font-size="12" {FONT} role="img" aria-label="服务类别分布">'
+        f'<g text-anchor="end" fill="{TEXT_COLOR}">{"".join(labels)}</g>'
+        f'<g fill="{BAR_COLOR}">{"".join(bars)}</g>'
+        f'<g fill="{MUTED_COLOR}">{"".join(values)}</g>'
+        f'</svg>'
+    )
+
+
+def _draw_trend_chart(points: Tuple[Tuple[str, int], ...]) -> str:
+    """折线图：每个周期一个点，标注服务总量，末点（本期）突出显示"""
+    count = len(points)
+    width = max(600, 60 * count)
+    height, left, right, top, plot_height = 180, 30, 30, 24, 110
+    baseline = top + plot_height
+    largest = max(total for _, total in points) or 1
+    step = (width - left - right) / (count - 1) if count > 1 else 0
+    coordinates = [(round(left + index * step) if count > 1 else width // 2,
+                    round(baseline - total / largest * plot_height)) for index, (_, total) in enumerate(points)]
+
+    dots = "".join(f'<circle cx="{x}" cy="{y}" r="3"/>' for x, y in coordinates[:-1])
+    last_x, last_y = coordinates[-1]
+    values = "".join(f'<text x="{x}" y="{y - 8}">{total}</text>'
+                     for (x, y), (_, total) in zip(coordinates, points))
+    labels = "".join(f'<text x="{x}" y="{baseline + 20}">{_label(label)}</text>'
+                     for (x, _), (label, _) in zip(coordinates, points))
+    polyline = " ".join(f"{x},{y}" for x, y in coordinates)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="{width}" height="{height}" '
+        f'font-size="11" {FONT} role="img" aria-label="服务趋势">'
+        f'<path d="M{left} {baseline}H{width - right}" stroke="#ddd"/>'
+        f'<polyline points="{polyline}" fill="none" stroke="{BAR_COLOR}" stroke-width="2"/>'
+        f'<g fill="{BAR_COLOR}">{dots}<circle cx="{last_x}" cy="{last_y}" r="5" fill="{LINE_COLOR}"/></g>'
+        f'<g text-anchor="middle" fill="{TEXT_COLOR}">{values}</g>'
+        f'<g text-anchor="middle" fill="{MUTED_COLOR}" font-size="10">{labels}</g>'
+        f'</svg>'
+    )
+
+
+def category_chart(categories: List[Dict[str, Any]], cache: Optional[ChartCache] = None) -> str:
+    """服务类别分布图，按数量降序；没有数据时返回空字符串"""
+    items = tuple(sorted(((category["name"], category["count"]) for category in categories if category["count"]),
+                         key=lambda item: (-item[1], item[0])))
+    if not items:
+        return ""
+    return (cache or chart_cache).get_or_render("category", items, _draw_category_chart)
+
+
+def trend_chart(series: List[Dict[str, Any]], cache: Optional[ChartCache] = None) -> str:
+    """服务趋势图，series 为按时间先后排列的 {"label", "total"}；没有数据时返回空字符串"""
+    points = tuple((item["label"], item["total"]) for item in series)
+    if not points:
+        return ""
+    return (cache or chart_cache).get_or_render("trend", points, _draw_trend_chart)
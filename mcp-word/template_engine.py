@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+模板引擎：将HTML模板一次性编译为渲染计划
+功能：加载时把模板按章节解析为字面量片段、具名槽位和循环行块，渲染时只做一次拼接，
+     每个占位符只会被替换一次，替换结果不会再被后续规则命中；
+     也可逐章节渲染，用于流式输出；含循环行块的章节按输入缓存渲染结果，输入不变时直接复用
+"""
+
+import hashlib
+import html
+import os
+import pickle
+import re
+from datetime import datetime
+from typing import Dict, Any, List, Tuple, Callable, Iterable, Iterator, Optional
+
+from report_cache import ReportCache
+from svg_charts import category_chart, trend_chart
+
+
+# 模板占位符 -> 槽位名称
+# 同一占位符多次出现时按出现顺序依次分配槽位，超出部分沿用最后一个槽位
+DEFAULT_PLACEHOLDERS: Dict[str, Tuple[str, ...]] = {
+    "【周|月】": ("period_type",),
+    "【（2025年10月01日-2025年10月31日）】": ("period_range_paren",),
+    "【2025年10月01日-2025年10月31日】": ("period_range",),
+    "【90】": ("total_service",),
+    "【44】": ("service_request",),
+    "【0】": ("incident",),
+    "【46】": ("approval",),
+    "【18】": ("self_service",),
+    "【26】": ("manual_service",),
+    "【91】": ("previous_total",),
+    "【2.2】": ("change_rate",),
+    "【下降|上升】": ("change_direction",),
+    "【100】": ("resolution_rate", "timeliness_rate", "satisfaction_rate"),
+    "【100%】": ("completion_rate",),
+    "【3】": ("unresolved_current",),
+    "【5】": ("unresolved_history",),
+    "【空】": ("knowledge_base",),
+    "【趋势图表】": ("trend_chart",),
+    "【类别图表】": ("category_chart",),
+    "生成时间：2025年11月24日": ("generated_at",),
+}
+
+
+# 循环行块：<!--【循环:名称】--> 行模板 <!--【循环结束】-->，每条数据渲染一次行模板
+BLOCK_PATTERN = r"[ \t]*<!--【循环:(?P<block_name>\w+)】-->\n?(?P<block_body>.*?)[ \t]*<!--【循环结束】-->\n?"
+
+# 章节片段缓存：(章节, 槽位取值, 行数据) 的哈希 -> 章节渲染结果，进程内所有模板共享，
+# 容量由环境变量 REPORT_FRAGMENT_CACHE_MB 指定（默认 32MB）
+fragment_cache = ReportCache(max_entries=1024,
+                             max_bytes=int(os.environ.get("REPORT_FRAGMENT_CACHE_MB", "32")) * 1024 * 1024,
+                             ttl=float("inf"))
+
+# 章节边界：每个 <div class="section"> 和页脚各成一章，之前的内容为报告头部；
+# 报告分段读取（report_reader）按同一边界和标题切分渲染后的报告，流式发送的章节与缓存命中时一致
+SECTION_BOUNDARY = re.compile(r'^(?=[ \t]*<div class="(?:section|footer)">)', re.MULTILINE)
+SECTION_BOUNDARY_BYTES = re.compile(SECTION_BOUNDARY.pattern.encode("utf-8"), re.MULTILINE)
+SECTION_TITLE = re.compile(r"<h2[^>]*>(.*?)</h2>", re.S)
+_SECTION_START = re.compile(r'[ \t]*<div class="(section|footer)">')
+_TAGS = re.compile(r"<[^>]+>")
+
+HEAD_TITLE = "报告头部"
+FOOTER_TITLE = "页脚"
+FULL_TITLE = "全文"
+
+
+def section_title(source: str, index: int, count: int) -> str:
+    """第 index 个章节（共 count 个）的标题
+
+    章节标题取其中的 <h2>，没有时为"章节N"；第一个章节之前为报告头部，页脚元素起为页脚；
+    没有章节元素时整份内容为一个章节
+    """
+    if count == 1:
+        return FULL_TITLE
+    start = _SECTION_START.match(source)
+    if start is None:
+        return HEAD_TITLE
+    if start.group(1) == "footer":
+        return FOOTER_TITLE
+    heading = SECTION_TITLE.search(source)
+    title = _TAGS.sub("", heading.group(1)).strip() if heading else ""
+    return title or f"章节{index}"
+
+
+def split_sections(source: str) -> List[str]:
+    """按章节边界切分，首个章节元素位于开头时不产生空的报告头部"""
+    return [part for part in SECTION_BOUNDARY.split(source) if part] or [source]
+
+
+def _format_text(value: Any) -> str:
+    return html.escape(str(value))
+
+
+def _format_number(value: Any) -> str:
+    return str(value)
+
+
+def _format_percentage(value: Any) -> str:
+    return f"{value:.2f}"
+
+
+def _format_change(value: Any) -> str:
+    # 序列首项没有上一周期
+    return "-" if value is None else f"{value:+.1f}%"
+
+
+# 行模板占位符 -> (数据字段, 格式化函数)
+DEFAULT_ROW_FIELDS: Dict[str, Tuple[str, Callable[[Any], str]]] = {
+    "【类别名称】": ("name", _format_text),
+    "【类别数量】": ("count", _format_number),
+    "【类别占比】": ("percentage", _format_percentage),
+    "【趋势周期】": ("label", _format_text),
+    "【趋势总量】": ("total", _format_number),
+    "【趋势环比】": ("change_rate", _format_change),
+}
+
+
+def build_template_values(data: Dict[str, Any], period: Dict[str, Any], charts: bool = True) -> Dict[str, str]:
+    """根据报告数据和时间周期计算各槽位的替换文本；charts 为 False 时不绘制图表（DOCX报告没有图表槽位）"""
+    current_time = datetime.now().strftime("%Y年%m月%d日")
+    values = {
+        "period_type": f"【{period['type']}】",
+        "period_range_paren": f"【（{period['period']}）】",
+        "period_range": f"【{period['period']}】",
+        "total_service": f"【{data['total_service']}】",
+        "service_request": f"【{data['service_request']}】",
+        "incident": f"【{data['incident']}】",
+        "approval": f"【{data['approval']}】",
+        "self_service": f"【{data['self_service']}】",
+        "manual_service": f"【{data['manual_service']}】",
+        "previous_total": f"【{data['previous_total']}】",
+        "change_rate": f"【{abs(data['change_rate'])}】",
+        "change_direction": "【下降】" if data['change_rate'] < 0 else "【上升】",
+        "resolution_rate": f"【{data['resolution_rate']}】",
+        "timeliness_rate": f"【{data['timeliness_rate']}】",
+        "satisfaction_rate": f"【{data['satisfaction_rate']}】",
+        "completion_rate": f"【{data['completion_rate']}%】",
+        "unresolved_current": f"【{data['unresolved_current']}】",
+        "unresolved_history": f"【{data['unresolved_history']}】",
+        "knowledge_base": f"【{data['knowledge_base']}】",
+        "generated_at": f"生成时间：{current_time}",
+    }
+    if charts:
+        # 内嵌SVG图表，按数据哈希缓存
+        values["trend_chart"] = trend_chart(data.get("trend_series", []))
+        values["category_chart"] = category_chart(data.get("service_categories", []))
+    return values
+
+
+def build_template_rows(data: Dict[str, Any]) -> Dict[str, Iterable[Dict[str, Any]]]:
+    """根据报告数据获取各循环行块的数据"""
+    return {
+        "service_categories": data.get("service_categories", []),
+        "trend_series": data.get("trend_series", []),
+    }
+
+
+def _marker_pattern(markers: Iterable[str]) -> str:
+    # 长的占位符优先匹配，避免被其前缀截断
+    return "|".join(re.escape(marker) for marker in sorted(markers, key=len, reverse=True))
+
+
+class RowBlock:
+    """编译后的循环行块：行模板的字面量片段与数据字段交替排列"""
+
+    def __init__(self, name: str, source: str, row_fields: Dict[str, Tuple[str, Callable[[Any], str]]]):
+        self.name = name
+        self.source = source
+        self.literals: List[str] = []
+        self.fields: List[Tuple[str, Callable[[Any], str]]] = []
+        position = 0
+        for match in re.finditer(_marker_pattern(row_fields), source):
+            self.literals.append(source[position:match.start()])
+            self.fields.append(row_fields[match.group(0)])
+            position = match.end()
+        self.literals.append(source[position:])
+
+    def render_into(self, out: List[str], rows: Iterable[Dict[str, Any]]):
+        """逐行把片段直接追加到输出缓冲区，不为每行拼接中间字符串"""
+        append = out.append
+        steps = list(zip(self.literals, self.fields))
+        tail = self.literals[-1]
+        for row in rows:
+            for literal, (key, formatter) in steps:
+                append(literal)
+                append(formatter(row[key]))
+            append(tail)
+
+
+class TemplateSection:
+    """编译后的模板章节：字面量片段与具名槽位交替排列"""
+
+    def __init__(self, title: str, source: str):
+        self.title = title
+        self.source = source
+        # literals 比 slots 多一个元素：literals[0] slots[0] literals[1] ... literals[n]
+        self.literals: List[str] = []
+        self.slots: List[Tuple[str, str]] = []
+        # 槽位下标 -> 循环行块
+        self.blocks: Dict[int, RowBlock] = {}
+        # 章节结构的摘要，编译完成后计算，作为片段缓存键的一部分
+        self.digest = b""
+
+    def seal(self):
+        """编译完成：计算章节结构摘要"""
+        fields = [(index, [(key, formatter.__qualname__) for key, formatter in block.fields])
+                  for index, block in self.blocks.items()]
+        self.digest = hashlib.blake2b(repr((self.source, self.slots, fields)).encode("utf-8"),
+                                      digest_size=16).digest()
+
+    def render_fragment(self, values: Dict[str, str], rows: Dict[str, Iterable[Dict[str, Any]]],
+                        cache: Optional[ReportCache] = None) -> str:
+        """渲染章节；没有槽位的章节直接返回原文，含循环行块的章节按输入的哈希使用片段缓存
+
+        只含普通槽位的章节拼接几个字符串即可完成，比计算缓存键更快，不使用缓存
+        """
+        if not self.slots:
+            return self.literals[0]
+        if cache is None or not self.blocks:
+            out: List[str] = []
+            self.render_into(out, values, rows)
+            return "".join(out)
+
+        # 行数据可能是只能遍历一次的迭代器，先转为列表
+        section_rows = {}
+        inputs: List[Any] = [self.digest]
+        for index, (name, marker) in enumerate(self.slots):
+            if index in self.blocks:
+                block_rows = rows.get(name, ())
+                if not isinstance(block_rows, (list, tuple)):
+                    block_rows = list(block_rows)
+                section_rows[name] = block_rows
+                inputs.append(block_rows)
+            else:
+                inputs.append(values.get(name, marker))
+        try:
+            key = hashlib.blake2b(pickle.dumps(inputs, pickle.HIGHEST_PROTOCOL), digest_size=16).digest()
+        except (pickle.PicklingError, TypeError, AttributeError):
+            key = None
+        fragment = cache.get(key) if key is not None else None
+        if fragment is None:
+            out = []
+            self.render_into(out, values, section_rows)
+            fragment = "".join(out)
+            if key is not None:
+                cache.put(key, fragment, len(fragment.encode("utf-8")))
+        return fragment
+
+    def render_into(self, out: List[str], values: Dict[str, str], rows: Dict[str, Iterable[Dict[str, Any]]]):
+        """把章节渲染结果追加到输出缓冲区"""
+        literals = self.literals
+        for index, (name, marker) in enumerate(self.slots):
+            out.append(literals[index])
+            block = self.blocks.get(index)
+            if block is None:
+                out.append(values.get(name, marker))
+            else:
+                block.render_into(out, rows.get(name, ()))
+        out.append(literals[-1])
+
+
+class CompiledTemplate:
+    """编译后的模板：按章节（报告头部、各 section、页脚）组织的渲染计划"""
+
+    def __init__(self, source: str, placeholders: Dict[str, Tuple[str, ...]] = None,
+                 row_fields: Dict[str, Tuple[str, Callable[[Any], str]]] = None, cache_fragments: bool = True):
+        self.source = source
+        self.placeholders = placeholders if placeholders is not None else DEFAULT_PLACEHOLDERS
+        self.row_fields = row_fields if row_fields is not None else DEFAULT_ROW_FIELDS
+        # 为 None 时每次都完整渲染
+        self.fragment_cache: Optional[ReportCache] = fragment_cache if cache_fragments else None
+        self.sections: List[TemplateSection] = []
+        self._compile()
+
+    def _compile(self):
+        """扫描一遍模板，按章节切分出字面量片段、槽位和循环行块"""
+        pattern = re.compile(f"{BLOCK_PATTERN}|{_marker_pattern(self.placeholders)}", re.DOTALL)
+        # 出现次数跨章节累计，保证同一占位符的槽位分配与章节划分无关
+        occurrences: Dict[str, int] = {}
+        parts = split_sections(self.source)
+        for index, section_source in enumerate(parts):
+            section = TemplateSection(section_title(section_source, index, len(parts)), section_source)
+            position = 0
+            for match in pattern.finditer(section_source):
+                section.literals.append(section_source[position:match.start()])
+                position = match.end()
+                block_name = match.group("block_name")
+                if block_name is not None:
+                    section.blocks[len(section.slots)] = RowBlock(block_name, match.group("block_body"), self.row_fields)
+                    section.slots.append((block_name, match.group(0)))
+                    continue
+                marker = match.group(0)
+                names = self.placeholders[marker]
+                index = occurrences.get(marker, 0)
+                occurrences[marker] = index + 1
+                section.slots.append((names[min(index, len(names) - 1)], marker))
+            section.literals.append(section_source[position:])
+            section.seal()
+            self.sections.append(section)
+
+    @property
+    def slot_names(self) -> List[str]:
+        """模板中出现的槽位名称（按出现顺序）"""
+        return [name for section in self.sections for name, _ in section.slots]
+
+    @property
+    def section_titles(self) -> List[str]:
+        """模板章节标题（按出现顺序）"""
+        return [section.title for section in self.sections]
+
+    def render_into(self, out: List[str], values: Dict[str, str],
+                    rows: Optional[Dict[str, Iterable[Dict[str, Any]]]] = None):
+        """把渲染结果追加到输出缓冲区，各章节输入不变时复用缓存的片段"""
+        rows = rows or {}
+        cache = self.fragment_cache
+        for section in self.sections:
+            if cache is not None and section.blocks:
+                out.append(section.render_fragment(values, rows, cache))
+            else:
+                # 不缓存时逐行追加，输出缓冲区可以是边写边压缩的文件流
+                section.render_into(out, values, rows)
+
+    def render(self, values: Dict[str, str], rows: Optional[Dict[str, Iterable[Dict[str, Any]]]] = None) -> str:
+        """渲染模板，缺少取值的槽位保留原占位符，缺少数据的循环行块不输出任何行"""
+        out: List[str] = []
+        self.render_into(out, values, rows)
+        return "".join(out)
+
+    def iter_sections(self, values: Dict[str, str],
+                      rows: Optional[Dict[str, Iterable[Dict[str, Any]]]] = None) -> Iterator[Tuple[str, str]]:
+        """逐章节渲染，每次只完成一个章节的工作并产出 (章节标题, HTML片段)"""
+        rows = rows or {}
+        for section in self.sections:
+            yield section.title, section.render_fragment(values, rows, self.fragment_cache)
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+模板注册表：在内存中保存多个已编译模板
+功能：按 (模板名称, 系统名称) 索引模板；定期检查文件的修改时间和大小，
+     只有文件确实变化时才重新读取和编译，无需重启服务即可更新模板
+"""
+
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+from template_engine import CompiledTemplate
+
+
+DEFAULT_TEMPLATE = "default"
+
+# 模板目录中的文件命名：<模板名称>.html 或 <模板名称>@<系统名称>.html
+SYSTEM_SEPARATOR = "@"
+
+
+class TemplateSnapshot(NamedTuple):
+    """模板的一个版本：版本号（模板内容的哈希）、源码和渲染计划，三者总是对应同一份内容"""
+    version: str
+    content: str
+    compiled: Optional[CompiledTemplate]
+
+
+class TemplateEntry:
+    """已加载的模板及其文件状态
+
+    重新加载时整体替换 snapshot；渲染时应先取一次 snapshot，用它计算缓存键并渲染，
+    分别读取 version、content、compiled 可能跨越两次加载
+    """
+
+    def __init__(self, name: str, path: str, system: Optional[str] = None):
+        self.name = name
+        self.path = path
+        self.system = system
+        self.snapshot = TemplateSnapshot("", "", None)
+        self.mtime_ns = 0
+        self.size = 0
+        self.loaded_at: Optional[datetime] = None
+        self.last_checked = 0.0
+
+    def load(self):
+        """读取并编译模板文件"""
+        try:
+            stat = os.stat(self.path)
+            with open(self.path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            raise Exception(f"模板文件不存在: {self.path}")
+        except Exception as e:
+            raise Exception(f"加载模板文件失败: {e}")
+
+        self.snapshot = TemplateSnapshot(hashlib.sha256(content.encode('utf-8')).hexdigest()[:16], content,
+                                         CompiledTemplate(content))
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.loaded_at = datetime.now()
+        self.last_checked = time.monotonic()
+
+    @property
+    def version(self) -> str:
+        return self.snapshot.version
+
+    @property
+    def content(self) -> str:
+        return self.snapshot.content
+
+    @property
+    def compiled(self) -> Optional[CompiledTemplate]:
+        return self.snapshot.compiled
+
+    def is_stale(self) -> bool:
+        """文件的修改时间或大小是否与已加载版本不同"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            # 文件暂时不可访问时继续使用已加载的版本
+            return False
+        return (stat.st_mtime_ns, stat.st_size) != (self.mtime_ns, self.size)
+
+    def info(self) -> Dict[str, Any]:
+        """模板信息（不访问文件系统）"""
+        return {
+            "name": self.name,
+            "system": self.system,
+            "path": self.path,
+            "size": self.size,
+            "version": self.version,
+            "loaded_at": self.loaded_at.strftime("%Y-%m-%d %H:%M:%S") if self.loaded_at else None,
+        }
+
+
+class TemplateRegistry:
+    """模板注册表
+
+    获取模板时最多每 check_interval 秒对文件做一次 stat 检查，
+    检查间隔内直接返回内存中的已编译模板。
+    """
+
+    def __init__(self, check_interval: float = 1.0):
+        self.check_interval = check_interval
+        self._entries: Dict[Tuple[str, Optional[str]], TemplateEntry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, path: str, system: Optional[str] = None) -> TemplateEntry:
+        """注册并立即编译模板，同名同系统的模板会被替换"""
+        entry = TemplateEntry(name, path, system)
+        entry.load()
+        with self._lock:
+            self._entries[(name, system)] = entry
+        return entry
+
+    def register_directory(self, directory: str) -> List[TemplateEntry]:
+        """注册目录下的所有HTML模板"""
+        entries = []
+        for filename in sorted(os.listdir(directory)):
+            stem, ext = os.path.splitext(filename)
+            if ext.lower() != ".html":
+                continue
+            name, _, system = stem.partition(SYSTEM_SEPARATOR)
+            entries.append(self.register(name, os.path.join(directory, filename), system or None))
+        return entries
+
+    def get(self, name: str = DEFAULT_TEMPLATE, system: Optional[str] = None) -> TemplateEntry:
+        """获取模板，优先使用系统专属模板，其次使用通用模板"""
+        entry = self._entries.get((name, system))
+        if entry is None and system is not None:
+            entry = self._entries.get((name, None))
+        if entry is None:
+            raise Exception(f"模板未注册: {name}" + (f" ({system})" if system else ""))
+        self._refresh(entry)
+        return entry
+
+    def reload(self, name: str = DEFAULT_TEMPLATE, system: Optional[str] = None) -> TemplateEntry:
+        """强制重新加载模板"""
+        entry = self.get(name, system)
+        with self._lock:
+            entry.load()
+        return entry
+
+    def _refresh(self, entry: TemplateEntry):
+        now = time.monotonic()
+        if now - entry.last_checked < self.check_interval:
+            return
+        with self._lock:
+            if now - entry.last_checked < self.check_interval:
+                return
+            entry.last_checked = now
+            if entry.is_stale():
+                try:
+                    entry.load()
+                except Exception:
+                    # 文件可能正在写入，保留旧版本，下次检查时重试
+                    pass
+
+    def entries(self) -> List[TemplateEntry]:
+        """所有已注册的模板"""
+        return list(self._entries.values())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证批量报告生成
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import zipfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import ReportGenerator
+from batch_reports import BatchReportRunner
+from render_executor import RenderExecutor
+
+
+TEMPLATE_PATH = "统建系统运维服务周月报模板-20251110.html"
+
+
+def test_batch_shares_fetches_and_writes_manifest():
+    """相同系统和周期只取数一次（HTML和DOCX共用），清单包含每个任务的输出和耗时"""
+    generator = ReportGenerator(TEMPLATE_PATH)
+    calls = []
+    fetch = generator.fetch_data
+
+    async def counting_fetch(period, system_name=None):
+        calls.append((system_name, period["period"]))
+        return await fetch(period, system_name)
+
+    generator.fetch_data = counting_fetch
+    runner = BatchReportRunner(generator)
+    jobs = [
+        {"system_name": "系统A", "report_type": "week"},
+        {"system_name": "系统A", "report_type": "week"},
+        {"system_name": "系统B", "report_type": "month"},
+        {"system_name": "系统A", "start_date": "2025-11-01", "end_date": "2025-11-30"},
+        {"system_name": "系统B", "report_type": "daily"},
+        {"system_name": "系统A", "report_type": "week", "output_format": "docx"},
+    ]
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = asyncio.run(runner.run(jobs, tmp))
+            assert manifest["jobs"] == 6 and manifest["succeeded"] == 5 and manifest["failed"] == 1
+            assert manifest["data_fetches"] == 3 and len(calls) == 3
+            reports = manifest["reports"]
+            assert reports[0]["output_path"] == reports[1]["output_path"]
+            assert len({report["output_path"] for report in reports[:4]}) == 3
+            for report in reports[:4]:
+                assert report["status"] == "ok" and report["bytes"] > 0
+                assert report["total_ms"] >= report["render_ms"]
+                with open(report["output_path"], 'r', encoding='utf-8') as f:
+                    assert "【" in f.read()
+            assert reports[3]["report_type"] == "custom" and reports[3]["period"] == "2025年11月01日-2025年11月30日"
+            assert "不支持的报告类型" in reports[4]["error"]
+            assert reports[5]["status"] == "ok" and reports[5]["output_path"].endswith(".docx")
+            assert zipfile.is_zipfile(reports[5]["output_path"])
+    finally:
+        generator.render_executor.shutdown()
+
+
+def test_batch_uses_render_executor_and_report_cache():
+    """批量渲染提交到生成器的渲染执行器，不超过其并发上限；已缓存的HTML报告不再取数和渲染，
+    批量生成的报告写入缓存，单个报告请求可直接复用"""
+    executor = RenderExecutor(max_concurrency=2, max_queue=0)
+    generator = ReportGenerator(TEMPLATE_PATH, render_executor=executor)
+    calls = []
+    fetch = generator.fetch_data
+
+    async def counting_fetch(period, system_name=None):
+        calls.append((system_name, period["period"]))
+        return await fetch(period, system_name)
+
+    generator.fetch_data = counting_fetch
+    runner = BatchReportRunner(generator)
+    jobs = [{"system_name": f"系统{index}", "report_type": "week"} for index in range(6)]
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            # 排队上限为 0，批量任务同时提交超过并发上限时会被拒绝
+            first = asyncio.run(runner.run(jobs, tmp))
+            assert first["succeeded"] == 6 and first["workers"] == 2, first
+            assert executor.rejected == 0 and executor.completed >= 12
+            assert generator.metrics.snapshot()["counters"]["cache_misses"] == 6
+
+            second = asyncio.run(runner.run(jobs + [{"system_name": "系统0", "report_type": "week",
+                                                     "output_format": "docx"}], tmp))
+            assert second["succeeded"] == 7 and second["data_fetches"] == 1
+            assert all(report.get("cached") for report in second["reports"][:6])
+            assert len(calls) == 7
+
+            content = asyncio.run(generator.generate_report_async("week", "系统3"))
+            assert len(calls) == 7
+            with open(second["reports"][3]["output_path"], 'r', encoding='utf-8') as f:
+                assert f.read() == content
+    finally:
+        executor.shutdown()
+
+
+if __name__ == "__main__":
+    test_batch_shares_fetches_and_writes_manifest()
+    test_batch_uses_render_executor_and_report_cache()
+    print("✓ 所有测试通过！")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证基准测试的结果格式与对比
+"""
+
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark import run_scenario, compare, percentile, scale_template, TEMPLATE_PATH
+
+
+def test_scenario_measures_every_stage():
+    """每个阶段都有分位数、吞吐量和内存峰值"""
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run_scenario(2, 50, iterations=3, warmup=1, work_dir=tmp)
+    stages = [result["stage"] for result in results]
+    assert stages == ["template_load", "get_time_period", "fetch_data", "render_charts",
+                      "replace_template_variables", "replace_template_variables_cached", "generate_report",
+                      "generate_report_streaming", "save_report"]
+    for result in results:
+        assert result["min_ms"] <= result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"] <= result["max_ms"]
+        assert result["ops_per_sec"] > 0 and result["peak_memory_kb"] > 0
+        assert result["category_count"] == 50 and result["template_scale"] == 2
+
+
+def test_scale_template_repeats_sections():
+    """模板放大后章节数成倍增加"""
+    with open(TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+        source = f.read()
+    sections = source.count('<div class="section">')
+    assert scale_template(source, 3).count('<div class="section">') == sections * 3
+
+
+def test_compare_flags_regressions():
+    """中位数变慢超过阈值时标记为退化"""
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.5
+    base = {"results": [{"scenario": "s", "stage": "a", "p50_ms": 1.0}, {"scenario": "s", "stage": "b", "p50_ms": 1.0}]}
+    head = {"results": [{"scenario": "s", "stage": "a", "p50_ms": 1.05}, {"scenario": "s", "stage": "b", "p50_ms": 1.5}]}
+    changes = {change["stage"]: change for change in compare(base, head)}
+    assert not changes["a"]["regression"]
+    assert changes["b"]["regression"] and changes["b"]["change"] == 0.5
+
+
+if __name__ == "__main__":
+    test_scenario_measures_every_stage()
+    test_scale_template_repeats_sections()
+    test_compare_flags_regressions()
+    print("✓ 所有测试通过！")
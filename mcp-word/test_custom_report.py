@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证自定义时间范围报告
+"""
+
+import csv
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import ReportGenerator
+from metrics_engine import TicketDataProvider
+from test_metrics_engine import COLUMNS, TICKETS
+
+
+TEMPLATE_PATH = "统建系统运维服务周月报模板-20251110.html"
+
+
+def test_custom_period_types_and_previous_window():
+    """自然周、月、季、年识别为对应类型，上一周期为日历上的前一周期；其他范围的上一周期为等长区间"""
+    generator = ReportGenerator(TEMPLATE_PATH)
+    assert generator.get_custom_period("2025-11-03", "2025-11-09")["type"] == "周"
+    assert generator.get_custom_period("2025-12-01", "2025-12-31")["type"] == "月"
+    assert generator.get_custom_period("2025-10-01", "2025-12-31")["type"] == "季"
+    assert generator.get_custom_period("2025-01-01", "2025-12-31")["type"] == "年"
+    assert generator.get_custom_period("2024-12-01", "2025-12-31")["type"] == "阶段"
+
+    march = generator.get_custom_period("2025-03-01", "2025-03-31")
+    assert generator.get_previous_period(march)["period"] == "2025年02月01日-2025年02月28日"
+
+    period = generator.get_custom_period("2025-11-05", "2025-11-14")
+    assert period["type"] == "阶段"
+    assert generator.get_previous_period(period)["period"] == "2025年10月26日-2025年11月04日"
+
+    for start_date, end_date in (("2025/11/01", "2025-11-30"), ("2025-11-30", "2025-11-01")):
+        try:
+            generator.get_custom_period(start_date, end_date)
+        except Exception:
+            continue
+        raise AssertionError(f"应拒绝无效日期范围: {start_date}, {end_date}")
+
+
+def test_custom_report_uses_requested_range():
+    """自定义报告按请求的日期范围统计，并按范围分别缓存"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tickets.csv")
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(TICKETS)
+        generator = ReportGenerator(TEMPLATE_PATH, data_provider=TicketDataProvider(path))
+
+        week = generator.get_custom_period("2025-11-03", "2025-11-09")
+        content = generator.generate_report("custom", "装备调度管理系统", week)
+        assert "2025年11月03日-2025年11月09日" in content
+        assert "系统运维服务【周】报" in content
+
+        year = generator.get_custom_period("2025-01-01", "2025-12-31")
+        assert "【7】" in generator.generate_report("custom", "装备调度管理系统", year)
+        assert len(generator.report_cache) == 2
+
+
+if __name__ == "__main__":
+    test_custom_period_types_and_previous_window()
+    test_custom_report_uses_requested_range()
+    print("✓ 所有测试通过！")
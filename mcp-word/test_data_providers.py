@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证数据源的并发获取、重试和本地文件替身
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import httpx
+
+from data_providers import DataProvider, FileDataProvider, HttpDataProvider, MockDataProvider, METRIC_GROUPS
+from period_engine import get_period_engine
+
+
+PERIOD = {"period": "2025年11月01日-2025年11月30日", "type": "月",
+          "start_date": datetime(2025, 11, 1), "end_date": datetime(2025, 11, 30)}
+
+SAMPLE_DATA = {
+    "total_service": 90, "service_request": 44, "incident": 0, "approval": 46,
+    "self_service": 18, "manual_service": 26, "previous_total": 91, "change_rate": -2.2,
+    "resolution_rate": 100, "completion_rate": 100, "timeliness_rate": 100, "satisfaction_rate": 100,
+    "unresolved_current": 3, "unresolved_history": 5, "knowledge_base": 0,
+    "service_categories": [{"name": "系统功能类", "count": 3}, {"name": "流程类", "count": 1}],
+}
+
+
+def group_response(group: str) -> dict:
+    # 接口可以不返回可选字段（趋势序列）
+    return {field: SAMPLE_DATA[field] for field in METRIC_GROUPS[group] if field in SAMPLE_DATA}
+
+
+def test_file_provider_with_system_overrides():
+    """本地文件数据源按系统覆盖字段并计算类别占比"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "data.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(dict(SAMPLE_DATA, systems={"装备调度管理系统": {"incident": 7}}), f, ensure_ascii=False)
+        provider = FileDataProvider(path)
+        data = asyncio.run(provider.fetch(PERIOD, "装备调度管理系统"))
+        assert data["incident"] == 7 and data["total_service"] == 90
+        assert [c["percentage"] for c in data["service_categories"]] == [75.0, 25.0]
+        assert asyncio.run(provider.fetch(PERIOD))["incident"] == 0
+
+
+def test_http_provider_fetches_groups_concurrently():
+    """各指标组并发请求，总耗时约等于单个请求耗时"""
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        assert request.url.params["start_date"] == "2025-11-01"
+        return httpx.Response(200, json=group_response(request.url.path.rsplit("/", 1)[-1]))
+
+    provider = HttpDataProvider("http://itsm.local/api", transport=httpx.MockTransport(handler))
+    data = asyncio.run(provider.fetch(PERIOD))
+    assert max_in_flight == len(METRIC_GROUPS), "指标组未并发获取"
+    assert data["approval"] == 46
+
+
+def test_http_provider_retries_server_errors():
+    """5xx 响应和连接错误会重试，超过重试次数后报错"""
+    attempts = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        group = request.url.path.strip("/")
+        attempts[group] = attempts.get(group, 0) + 1
+        if attempts[group] == 1:
+            return httpx.Response(503)
+        if attempts[group] == 2:
+            raise httpx.ConnectError("connection refused")
+        return httpx.Response(200, json=group_response(group))
+
+    provider = HttpDataProvider("http://itsm.local", retries=2, backoff=0, transport=httpx.MockTransport(handler))
+    assert asyncio.run(provider.fetch(PERIOD))["incident"] == 0
+
+    failing = HttpDataProvider("http://itsm.local", retries=1, backoff=0,
+                               transport=httpx.MockTransport(lambda request: httpx.Response(500)))
+    try:
+        asyncio.run(failing.fetch(PERIOD))
+        assert False, "超过重试次数后应报错"
+    except Exception as e:
+        assert "请求数据接口失败" in str(e)
+
+
+def test_sync_interface_inside_event_loop():
+    """在事件循环中调用同步接口时提示改用异步接口，同步接口结束前关闭HTTP数据源在临时事件循环上的连接池"""
+    from report_cache import ReportCache
+    from report_generator import ReportGenerator
+
+    provider = HttpDataProvider("http://itsm.local", transport=httpx.MockTransport(
+        lambda request: httpx.Response(200, json=group_response(request.url.path.strip("/")))))
+    generator = ReportGenerator("统建系统运维服务周月报模板-20251110.html",
+                                report_cache=ReportCache(), data_provider=provider)
+
+    async def call_from_loop():
+        try:
+            generator.fetch_data_from_api(PERIOD)
+            assert False, "事件循环中调用同步接口应报错"
+        except Exception as e:
+            assert "异步接口" in str(e)
+        try:
+            return await generator.fetch_data(PERIOD)
+        finally:
+            await provider.aclose()
+
+    assert asyncio.run(call_from_loop())["approval"] == 46
+    assert generator.fetch_data_from_api(PERIOD)["incident"] == 0
+    assert not provider._clients
+
+    try:
+        DataProvider()
+        assert False, "数据源基类不能直接实例化"
+    except TypeError:
+        pass
+
+
+def test_mock_trend_series_is_consistent():
+    """模拟数据的趋势序列末项为本期总量，上一周期总量和变化率由序列得出"""
+    period = get_period_engine().period_at("month", datetime(2025, 11, 5))
+    data = asyncio.run(MockDataProvider().fetch(period))
+    series = data["trend_series"]
+    assert len(series) == 12 and series[-1]["label"] == "2025年11月"
+    assert series[-1]["total"] == data["total_service"]
+    assert data["previous_total"] == series[-2]["total"]
+    assert data["change_rate"] == series[-1]["change_rate"]
+
+
+if __name__ == "__main__":
+    test_file_provider_with_system_overrides()
+    test_http_provider_fetches_groups_concurrently()
+    test_http_provider_retries_server_errors()
+    test_sync_interface_inside_event_loop()
+    test_mock_trend_series_is_consistent()
+    print("✓ 所有测试通过！")
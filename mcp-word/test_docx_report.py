@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证根据Word模板生成DOCX报告
+"""
+
+import io
+import os
+import re
+import sys
+import tempfile
+import tracemalloc
+import zipfile
+from datetime import datetime
+from xml.dom import minidom
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from docx_report import DocxTemplate, DOCUMENT_XML, build_docx_values
+from main import ReportGenerator
+from report_writer import ReportWriter
+from template_engine import build_template_rows
+
+
+TEMPLATE_PATH = "统建系统运维服务周月报模板-20251110.html"
+DOCX_TEMPLATE_PATH = "统建系统运维服务周月报模板-20251110.docx"
+
+DATA = {
+    "total_service": 120, "service_request": 70, "incident": 3, "approval": 47,
+    "self_service": 30, "manual_service": 40, "previous_total": 100, "change_rate": 20.0,
+    "resolution_rate": 98, "completion_rate": 97, "timeliness_rate": 96.5, "satisfaction_rate": 99,
+    "unresolved_current": 2, "unresolved_history": 4, "knowledge_base": 1,
+    "service_categories": [
+        {"name": "问题答疑/系统功能类 & 其他", "count": 3, "percentage": 60.0},
+        {"name": "系统BUG", "count": 2, "percentage": 40.0},
+    ],
+}
+PERIOD = {"period": "2025年11月03日-2025年11月09日", "type": "周",
+          "start_date": datetime(2025, 11, 3), "end_date": datetime(2025, 11, 9)}
+
+
+def document_text(content: bytes) -> str:
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        xml = archive.read(DOCUMENT_XML)
+    document = minidom.parseString(xml)
+    return "".join(node.firstChild.data for node in document.getElementsByTagName("w:t") if node.firstChild)
+
+
+def test_docx_placeholders_and_tables_are_filled():
+    """段落占位符和表格数据按报告数据填充，示例数据和统计说明不输出；DOCX报告不绘制图表"""
+    template = DocxTemplate(DOCX_TEMPLATE_PATH)
+    values = build_docx_values(DATA, PERIOD, "装备调度管理系统")
+    assert "trend_chart" not in values and "category_chart" not in values
+    content = template.render(values, build_template_rows(DATA))
+    text = document_text(content)
+    assert "【装备调度管理系统】支持服务【周】报" in text
+    assert "受理【装备调度管理系统】服务总量【120】单，其中服务请求类工单【70】单" in text
+    assert "环比上【周】【上升】【20.0】%" in text
+    assert "工单及时率【96.5%】" in text
+    assert "问题答疑/系统功能类 & 其他360.00%系统BUG240.00%总计5100%" in text
+    for sample in ("【90】", "装备调度管理系统/问题答疑/流程类", "S202511050526", "此区域不显示", "【周|月】"):
+        assert sample not in text, f"模板示例内容未被替换: {sample}"
+    assert not re.search(r"【单元格:", text)
+
+
+def test_generator_saves_docx_with_flat_memory():
+    """生成器保存DOCX报告，单份报告的内存峰值与模板大小相当"""
+    with tempfile.TemporaryDirectory() as tmp:
+        generator = ReportGenerator(TEMPLATE_PATH, report_writer=ReportWriter(tmp))
+        first = generator.generate_and_save_report("week", "装备调度管理系统", output_format="docx")
+        assert first.endswith(".docx") and zipfile.is_zipfile(first)
+
+        tracemalloc.start()
+        for _ in range(20):
+            generator.generate_and_save_report("week", "装备调度管理系统", output_format="docx")
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert peak < 4 * 1024 * 1024, f"内存峰值过高: {peak}"
+
+        try:
+            generator.generate_and_save_report("week", output_format="pdf")
+        except Exception as e:
+            assert "不支持的输出格式" in str(e)
+        else:
+            raise AssertionError("应拒绝不支持的输出格式")
+
+
+if __name__ == "__main__":
+    test_docx_placeholders_and_tables_are_filled()
+    test_generator_saves_docx_with_flat_memory()
+    print("✓ 所有测试通过！")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证负载测试的统计结果
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import load_test
+from load_test import run_load, summarize
+
+
+def test_summarize_percentiles_and_error_rate():
+    """按工具统计分位数、错误率和吞吐量"""
+    samples = [("a", i / 1000, False) for i in range(1, 101)] + [("b", 0.5, True), ("b", 0.5, False)]
+    result = summarize(samples, elapsed=2.0)
+    assert result["tools"]["a"]["calls"] == 100
+    assert result["tools"]["a"]["p50_ms"] == 50.5 and result["tools"]["a"]["p99_ms"] == 99.01
+    assert result["tools"]["b"]["error_rate"] == 0.5
+    assert result["total"]["calls"] == 102 and result["total"]["throughput_per_sec"] == 51.0
+
+
+def test_client_import_does_not_load_server():
+    """负载测试客户端只导入MCP客户端和统计函数，不加载报告生成器和服务模块"""
+    check = ("import sys, load_test; "
+             "print(sorted({'benchmark', 'streaming_main', 'report_generator'} & set(sys.modules)))")
+    output = subprocess.run([sys.executable, "-c", check], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "[]", output
+
+
+def test_memory_transport_drives_real_tools():
+    """进程内传输下每个客户端使用独立会话并发调用真实工具，未知工具计为错误"""
+    mix = [("get_report_template_info", {}),
+           ("generate_weekly_report_streaming", {"include_content": False}),
+           ("不存在的工具", {})]
+    opened = []
+    open_session = load_test.open_session
+
+    def counting_open_session(*args):
+        opened.append(args)
+        return open_session(*args)
+
+    load_test.open_session = counting_open_session
+    try:
+        result = asyncio.run(run_load("memory", clients=3, requests=3, mix=mix))
+    finally:
+        load_test.open_session = open_session
+    assert len(opened) == 3
+    tools = result["tools"]
+    assert sum(stats["calls"] for stats in tools.values()) == 9
+    assert tools["get_report_template_info"]["error_rate"] == 0
+    assert tools["generate_weekly_report_streaming"]["error_rate"] == 0
+    assert tools["不存在的工具"]["error_rate"] == 1
+    assert result["total"]["p50_ms"] <= result["total"]["p95_ms"] <= result["total"]["p99_ms"]
+
+
+if __name__ == "__main__":
+    test_summarize_percentiles_and_error_rate()
+    test_client_import_does_not_load_server()
+    test_memory_transport_drives_real_tools()
+    print("✓ 所有测试通过！")
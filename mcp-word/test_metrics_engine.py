@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证根据原始工单计算的报告数据
+"""
+
+import asyncio
+import csv
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from metrics_engine import MetricsEngine, TicketTable, TicketDataProvider
+from period_engine import PeriodEngine
+
+
+COLUMNS = ["created_at", "system", "ticket_type", "channel", "category",
+           "resolved", "completed", "on_time", "satisfaction", "knowledge"]
+
+TICKETS = [
+    # 本期（2025-11-03 至 2025-11-09）
+    ["2025-11-03 09:00:00", "装备调度管理系统", "服务请求", "自助", "问题答疑/系统功能类", "1", "1", "1", "1", "0"],
+    ["2025-11-04 10:30:00", "装备调度管理系统", "服务请求", "人工", "问题答疑/系统功能类", "1", "1", "0", "1", "1"],
+    ["2025-11-05 14:00:00", "装备调度管理系统", "事件", "人工", "系统BUG", "0", "0", "0", "", "0"],
+    ["2025-11-09 23:59:59", "装备调度管理系统", "审批", "人工", "权限开通/账号开通", "1", "1", "1", "0", "0"],
+    ["2025-11-06 08:00:00", "其他系统", "服务请求", "自助", "问题答疑/流程类", "1", "1", "1", "1", "0"],
+    # 上一周期
+    ["2025-10-28 09:00:00", "装备调度管理系统", "服务请求", "人工", "问题答疑/系统功能类", "0", "0", "0", "", "0"],
+    ["2025-11-02 09:00:00", "装备调度管理系统", "审批", "人工", "权限开通/账号开通", "1", "1", "1", "1", "0"],
+    # 下一周期
+    ["2025-11-10 00:00:00", "装备调度管理系统", "事件", "人工", "系统BUG", "0", "0", "0", "", "0"],
+]
+
+START = datetime(2025, 11, 3, 15, 42)
+END = datetime(2025, 11, 9, 15, 42)
+
+
+def make_table() -> TicketTable:
+    return TicketTable(dict(zip(COLUMNS, zip(*TICKETS))))
+
+
+def test_compute_period_metrics():
+    """按系统和日期范围统计各项指标"""
+    data = MetricsEngine(make_table()).compute(START, END, "装备调度管理系统")
+    assert data["total_service"] == 4
+    assert (data["service_request"], data["incident"], data["approval"]) == (2, 1, 1)
+    assert (data["self_service"], data["manual_service"]) == (1, 3)
+    assert data["previous_total"] == 2 and data["change_rate"] == 100.0
+    assert data["resolution_rate"] == 75 and data["completion_rate"] == 75
+    assert data["timeliness_rate"] == 66.7 and data["satisfaction_rate"] == 66.7
+    assert data["unresolved_current"] == 1 and data["unresolved_history"] == 1
+    assert data["knowledge_base"] == 1
+    assert data["service_categories"][0] == {"name": "问题答疑/系统功能类", "count": 2, "percentage": 50.0}
+    assert sum(c["count"] for c in data["service_categories"]) == 4
+
+
+def test_all_systems_and_unknown_system():
+    """未指定系统时统计全部工单，未知系统没有数据"""
+    engine = MetricsEngine(make_table())
+    assert engine.compute(START, END)["total_service"] == 5
+    empty = engine.compute(START, END, "不存在的系统")
+    assert empty["total_service"] == 0 and empty["service_categories"] == []
+
+
+def test_timezone_offsets_use_local_day():
+    """带时区偏移的创建时间按本地钟面时间计入日期，不换算为UTC"""
+    created_at = ["2025-11-03T00:30:00+08:00", "2025-11-09T23:30:00+0800",
+                  "2025-11-10T07:00:00+08:00", "2025-11-02T23:30:00Z"]
+    columns = {"created_at": created_at, "ticket_type": ["事件"] * 4, "category": ["系统BUG"] * 4}
+    local = ["2025-11-02T23:30:00", "2025-11-03T00:30:00", "2025-11-09T23:30:00", "2025-11-10T07:00:00"]
+    assert TicketTable(columns).created_at.astype(str).tolist() == local
+    assert MetricsEngine(TicketTable(columns)).compute(START, END)["total_service"] == 2
+
+    beijing = timezone(timedelta(hours=8))
+    columns["created_at"] = [datetime(2025, 11, 3, 0, 30, tzinfo=beijing), datetime(2025, 11, 9, 23, 30, tzinfo=beijing),
+                             datetime(2025, 11, 10, 7, 0, tzinfo=beijing), datetime(2025, 11, 2, 23, 30, tzinfo=timezone.utc)]
+    assert TicketTable(columns).created_at.astype(str).tolist() == local
+
+
+def test_ticket_provider_reads_csv_export():
+    """工单数据源从CSV导出文件计算报告数据"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "tickets.csv")
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            writer.writerows(TICKETS)
+        provider = TicketDataProvider(path)
+        period = {"start_date": START, "end_date": END}
+        data = asyncio.run(provider.fetch(period, "装备调度管理系统"))
+        assert data["total_service"] == 4
+        assert asyncio.run(provider.fetch_group("indicators", period, None))["resolution_rate"] == 80
+
+
+def test_trend_series_over_previous_periods():
+    """本期及之前各周期的服务总量组成趋势序列，上一周期总量和变化率与序列一致"""
+    periods = PeriodEngine().trend(PeriodEngine().period_at("week", START), 3)
+    data = MetricsEngine(make_table()).compute(START, END, "装备调度管理系统", periods)
+    series = data["trend_series"]
+    assert [item["total"] for item in series] == [0, 2, 4]
+    assert [item["label"] for item in series] == ["2025年第43周", "2025年第44周", "2025年第45周"]
+    assert [item["change_rate"] for item in series] == [None, 0.0, 100.0]
+    assert data["previous_total"] == 2 and data["change_rate"] == 100.0
+    assert MetricsEngine(make_table()).compute(START, END)["trend_series"] == []
+
+
+if __name__ == "__main__":
+    test_compute_period_metrics()
+    test_all_systems_and_unknown_system()
+    test_timezone_offsets_use_local_day()
+    test_ticket_provider_reads_csv_export()
+    test_trend_series_over_previous_periods()
+    print("✓ 所有测试通过！")
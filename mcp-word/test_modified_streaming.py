@@ -33,7 +33,7 @@ async def test_streaming_generation():
             print(f"收到内容块: {chunk[:100]}...")  # 只显示前100个字符
         
         print("\n=== 测试非流式版本 ===")
-        report_content = generator.generate_report("week")
+        report_content = await generator.generate_report_async("week")
         print(f"非流式版本返回内容长度: {len(report_content)} 字符")
         print(f"内容前200字符: {report_content[:200]}...")
         
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证周期引擎的周期边界、上一周期和日序号范围
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from period_engine import PeriodEngine, day_number
+from metrics_engine import MetricsEngine, TicketTable
+
+
+TEMPLATE_PATH = "统建系统运维服务周月报模板-20251110.html"
+
+
+def test_period_bounds_match_calendar():
+    """每天所在的周、月、季度、年度与逐日计算的日历一致，相邻周期首尾相接"""
+    engine = PeriodEngine()
+    day = datetime(2023, 12, 1)
+    while day < datetime(2025, 3, 1):
+        week = engine.period_at("week", day)
+        assert week["start_date"] == day - timedelta(days=day.weekday()) and week["start_date"].weekday() == 0
+        month = engine.period_at("month", day)
+        assert month["start_date"] == day.replace(day=1)
+        assert (month["end_date"] + timedelta(days=1)).day == 1
+        quarter = engine.period_at("quarter", day)
+        assert quarter["start_date"] == datetime(day.year, (day.month - 1) // 3 * 3 + 1, 1)
+        assert engine.period_at("year", day)["period"] == f"{day.year}年01月01日-{day.year}年12月31日"
+        assert engine.previous(month)["end_date"] + timedelta(days=1) == month["start_date"]
+        day += timedelta(days=1)
+
+    assert engine.period_at("month", datetime(2024, 2, 10, 15, 30))["end_date"] == datetime(2024, 2, 29)
+    assert engine.previous(engine.period_at("week", datetime(2025, 1, 1)))["period"] == "2024年12月23日-2024年12月29日"
+
+
+def test_fiscal_periods_and_custom_ranges():
+    """财年从指定月份开始；完整周期的日期范围识别为对应类型，其他范围的上一周期为等长区间"""
+    engine = PeriodEngine(fiscal_year_start=4)
+    fiscal_year = engine.period_at("fiscal_year", datetime(2025, 2, 1))
+    assert fiscal_year["period"] == "2024年04月01日-2025年03月31日" and fiscal_year["type"] == "财年"
+    assert engine.period_at("fiscal_quarter", datetime(2025, 5, 1))["start_date"] == datetime(2025, 4, 1)
+    assert engine.custom(datetime(2025, 4, 1), datetime(2026, 3, 31))["type"] == "财年"
+    assert engine.custom(datetime(2025, 10, 1), datetime(2025, 12, 31))["type"] == "季"
+    assert engine.custom(datetime(2025, 11, 3), datetime(2025, 11, 9))["type"] == "周"
+
+    custom = engine.custom(datetime(2025, 11, 5), datetime(2025, 11, 14))
+    assert custom["type"] == "阶段"
+    assert engine.previous(custom)["period"] == "2025年10月26日-2025年11月04日"
+    series = engine.series(engine.period_at("quarter", datetime(2025, 2, 1)), 3)
+    assert [period["start_date"].month for period in series] == [7, 10, 1]
+    assert engine.day_range(series[-1]) == (day_number(datetime(2025, 1, 1)), day_number(datetime(2025, 4, 1)))
+    assert PeriodEngine().custom(datetime(2025, 4, 1), datetime(2026, 3, 31))["type"] == "阶段"
+
+    for bad in (lambda: engine.current("daily"), lambda: engine.period_at("month", datetime(1990, 1, 1))):
+        try:
+            bad()
+            assert False, "应抛出异常"
+        except Exception as e:
+            assert "不支持" in str(e) or "超出" in str(e)
+
+
+def test_previous_total_uses_calendar_predecessor():
+    """月报的上一周期是上个自然月，而不是等长的前31天"""
+    records = [{"created_at": day, "ticket_type": "事件", "category": "账号"}
+               for day in ("2025-01-30", "2025-02-10", "2025-02-20", "2025-03-05")]
+    table = TicketTable.from_records(records)
+    engine = PeriodEngine()
+    march = engine.period_at("month", datetime(2025, 3, 1))
+    metrics = MetricsEngine(table)
+    assert metrics.compute(march["start_date"], march["end_date"])["previous_total"] == 3
+    assert metrics.compute(march["start_date"], march["end_date"], None, engine.trend(march, 2))["previous_total"] == 2
+
+
+def test_generator_periods():
+    """生成器的当前周期、自定义周期和上一周期都来自周期引擎"""
+    from main import ReportGenerator
+    from report_writer import ReportWriter
+    with tempfile.TemporaryDirectory() as tmp:
+        generator = ReportGenerator(TEMPLATE_PATH, report_writer=ReportWriter(tmp))
+        now = datetime.now()
+        week = generator.get_time_period("week")
+        assert week["start_date"] <= now < week["end_date"] + timedelta(days=1)
+        assert week["start_date"].hour == 0 and week["type"] == "周"
+        assert generator.get_time_period("quarter")["type"] == "季"
+        assert generator.get_custom_period("2025-01-01", "2025-12-31")["type"] == "年"
+        previous = generator.get_previous_period(generator.get_custom_period("2025-03-01", "2025-03-31"))
+        assert previous["period"] == "2025年02月01日-2025年02月28日" and previous["type"] == "月"
+        assert "【年】报" in generator.generate_report("year")
+
+
+if __name__ == "__main__":
+    test_period_bounds_match_calendar()
+    test_fiscal_periods_and_custom_ranges()
+    test_previous_total_uses_calendar_predecessor()
+    test_generator_periods()
+    print("✓ 所有测试通过！")
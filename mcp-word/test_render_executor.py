@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证渲染执行器的并发上限、排队与拒绝
+"""
+
+import asyncio
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from render_executor import RenderExecutor, ServerBusyError
+from template_engine import build_template_values, build_template_rows
+
+
+TEMPLATE_PATH = "统建系统运维服务周月报模板-20251110.html"
+
+
+def test_queue_then_reject_when_full():
+    """名额占满后排队，排队已满时立即拒绝，排队任务按顺序获得名额"""
+    executor = RenderExecutor(max_concurrency=2, max_queue=2, queue_timeout=None)
+
+    async def run():
+        tasks = [asyncio.ensure_future(executor.call(time.sleep, 0.05)) for _ in range(4)]
+        await asyncio.sleep(0.01)
+        assert executor.stats()["active"] == 2 and executor.stats()["queued"] == 2
+        try:
+            await executor.call(time.sleep, 0)
+            raise AssertionError("排队已满时应拒绝")
+        except ServerBusyError as e:
+            assert "服务繁忙" in str(e)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    stats = executor.stats()
+    assert stats["active"] == 0 and stats["queued"] == 0
+    assert stats["completed"] == 4 and stats["rejected"] == 1
+    executor.shutdown()
+
+
+def test_queued_task_times_out():
+    """排队超过等待时间的任务被拒绝，不占用名额"""
+    executor = RenderExecutor(max_concurrency=1, max_queue=4, queue_timeout=0.02)
+
+    async def run():
+        running = asyncio.ensure_future(executor.call(time.sleep, 0.1))
+        await asyncio.sleep(0.01)
+        try:
+            await executor.call(time.sleep, 0)
+            raise AssertionError("排队超时应拒绝")
+        except ServerBusyError:
+            pass
+        assert executor.stats()["queued"] == 0
+        await running
+        assert await executor.call(lambda: "ok") == "ok"
+
+    asyncio.run(run())
+    assert executor.stats()["rejected"] == 1 and executor.stats()["active"] == 0
+    executor.shutdown()
+
+
+def test_event_loop_stays_responsive_under_load():
+    """大量渲染任务执行和排队时，事件循环上的轻量调用仍能立即响应"""
+    executor = RenderExecutor(max_concurrency=2, max_queue=100, queue_timeout=None)
+
+    async def run():
+        tasks = [asyncio.ensure_future(executor.call(time.sleep, 0.02)) for _ in range(20)]
+        await asyncio.sleep(0.005)
+        latencies = []
+        for _ in range(10):
+            started = time.perf_counter()
+            await asyncio.sleep(0)
+            latencies.append(time.perf_counter() - started)
+        await asyncio.gather(*tasks)
+        return max(latencies)
+
+    assert asyncio.run(run()) < 0.01
+    executor.shutdown()
+
+
+def test_process_mode_matches_thread_mode():
+    """进程模式下模板在工作进程中渲染，结果与线程模式相同"""
+    from main import ReportGenerator
+    generator = ReportGenerator(TEMPLATE_PATH)
+    period = generator.get_time_period("week")
+    data = generator.fetch_data_from_api(period)
+    values, rows = build_template_values(data, period), build_template_rows(data)
+    template = generator.templates.get()
+
+    thread_executor = RenderExecutor(mode="thread", max_concurrency=1)
+    process_executor = RenderExecutor(mode="process", max_concurrency=1)
+    try:
+        expected = asyncio.run(thread_executor.render(template, values, rows))
+        assert expected == template.compiled.render(values, rows)
+        assert asyncio.run(process_executor.render(template, values, rows)) == expected
+    finally:
+        thread_executor.shutdown()
+        process_executor.shutdown()
+
+
+if __name__ == "__main__":
+    test_queue_then_reject_when_full()
+    test_queued_task_times_out()
+    test_event_loop_stays_responsive_under_load()
+    test_process_mode_matches_thread_mode()
+    print("✓ 所有测试通过！")
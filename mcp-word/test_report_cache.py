@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证报告缓存的淘汰、过期与命中统计
+"""
+
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import ReportGenerator
+from report_cache import ReportCache, SharedReportCache
+from report_writer import ReportWriter
+
+
+TEMPLATE_PATH = "统建系统运维服务周月报模板-20251110.html"
+
+
+def test_lru_eviction_by_entries_and_bytes():
+    """超出条目数或字节数时淘汰最久未使用的条目"""
+    cache = ReportCache(max_entries=2, max_bytes=100)
+    cache.put("a", 1, 10)
+    cache.put("b", 2, 10)
+    assert cache.get("a") == 1
+    cache.put("c", 3, 10)
+    assert cache.get("b") is None, "最久未使用的条目应被淘汰"
+    cache.put("d", 4, 95)
+    assert len(cache) == 1 and cache.get("d") == 4
+    assert cache.stats()["evictions"] == 3
+
+
+def test_oversized_value_replaces_old_entry():
+    """超过总量上限的新值不缓存，同一个键的旧值也被删除，不再返回过时内容"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for cache in (ReportCache(max_bytes=100), SharedReportCache(os.path.join(tmp, "cache.db"), max_bytes=100)):
+            cache.put("a", "旧报告", 10)
+            cache.put("a", "新报告", 101)
+            assert cache.get("a") is None
+            assert cache.stats()["bytes"] == 0
+
+
+def test_entries_expire_after_ttl():
+    """超过存活时间的条目视为未命中"""
+    cache = ReportCache(ttl=0.01)
+    cache.put("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_generator_reuses_cached_report():
+    """同一周期重复生成时直接命中缓存，不重复取数和写文件"""
+    output_dir = tempfile.TemporaryDirectory()
+    generator = ReportGenerator(TEMPLATE_PATH, report_writer=ReportWriter(output_dir.name))
+    calls = []
+    fetch = generator.fetch_data
+
+    async def counting_fetch(period, system_name=None):
+        calls.append(period)
+        return await fetch(period, system_name)
+
+    generator.fetch_data = counting_fetch
+
+    first_path = generator.generate_and_save_report("week")
+    try:
+        assert generator.generate_and_save_report("week") == first_path
+        assert generator.generate_report("week") == generator.generate_report("week")
+        assert len(calls) == 1, "缓存命中时不应重新获取数据"
+        generator.generate_report("month")
+        assert len(calls) == 2
+        stats = generator.report_cache.stats()
+        assert stats["hits"] == 3 and stats["misses"] == 2
+    finally:
+        output_dir.cleanup()
+
+
+if __name__ == "__main__":
+    test_lru_eviction_by_entries_and_bytes()
+    test_oversized_value_replaces_old_entry()
+    test_entries_expire_after_ttl()
+    test_generator_reuses_cached_report()
+    print("✓ 所有测试通过！")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证报告按字节范围和按章节的分段读取
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from report_reader import ReportReader, index_sections
+from report_resources import report_etag
+from report_writer import ReportWriter
+
+
+TEMPLATE_PATH = "统建系统运维服务周月报模板-20251110.html"
+
+
+def generate_report() -> str:
+    from main import ReportGenerator
+    with tempfile.TemporaryDirectory() as tmp:
+        return ReportGenerator(TEMPLATE_PATH, report_writer=ReportWriter(tmp)).generate_report("month")
+
+
+def test_byte_ranges_align_to_characters():
+    """小块读取时每块都是完整的UTF-8字符，按 next_offset 依次读取可还原全文"""
+    content = generate_report()
+    with tempfile.TemporaryDirectory() as tmp:
+        reader = ReportReader(ReportWriter(tmp))
+        handle = reader.store(content)
+        assert handle == report_etag(content) and reader.store(content) == handle
+
+        for length in (1, 2, 7, 4096):
+            parts, offset = [], 0
+            while offset is not None:
+                result = reader.read(handle, offset, length)
+                assert result["length"] <= max(length, 3)
+                parts.append(result["content"])
+                offset = result["next_offset"]
+            assert "".join(parts) == content
+        assert reader.read(handle, 10 ** 9)["content"] == ""
+
+
+def test_sections_cover_report():
+    """章节目录首尾相接覆盖全文，可按序号或部分标题读取章节"""
+    content = generate_report()
+    with tempfile.TemporaryDirectory() as tmp:
+        reader = ReportReader(ReportWriter(tmp))
+        handle = reader.store(content)
+        outline = reader.outline(handle)
+        titles = [section["title"] for section in outline["sections"]]
+        assert titles[0] == "报告头部" and titles[-1] == "页脚"
+        assert "二、服务趋势分析" in titles and "六、服务类别分布" in titles
+        assert sum(section["bytes"] for section in outline["sections"]) == outline["bytes"]
+
+        trend = reader.read(handle, section="服务趋势")
+        assert trend["section"] == "二、服务趋势分析" and trend["next_offset"] is None
+        assert trend["content"].lstrip().startswith('<div class="section">') and "<svg" in trend["content"]
+        assert reader.read(handle, section="6")["content"] == reader.read(handle, section="类别分布")["content"]
+        assert "".join(reader.read(handle, section=str(section["index"]))["content"]
+                       for section in outline["sections"]) == content
+
+    assert index_sections(b"<p>plain</p>") == [{"index": 0, "title": "全文", "offset": 0, "bytes": 12}]
+
+
+def test_invalid_handles_and_ranges():
+    """无效句柄、不存在的句柄、章节和范围都报错"""
+    with tempfile.TemporaryDirectory() as tmp:
+        reader = ReportReader(ReportWriter(tmp))
+        handle = reader.store("<html>报告</html>")
+        for bad in (lambda: reader.read("../../etc/passwd"), lambda: reader.read("0" * 64),
+                    lambda: reader.read(handle, section="不存在"), lambda: reader.read(handle, -1),
+                    lambda: reader.read(handle, 0, 0)):
+            try:
+                bad()
+                assert False, "应抛出异常"
+            except Exception as e:
+                assert "无效" in str(e) or "不存在" in str(e) or "没有章节" in str(e)
+
+
+async def open_and_read(server):
+    async with create_connected_server_and_client_session(server._mcp_server) as client:
+        opened = json.loads((await client.call_tool("open_report", {"uri": "report://all/month"})).content[0].text)
+        section = json.loads((await client.call_tool(
+            "read_report", {"handle": opened["handle"], "section": "服务概况"})).content[0].text)
+        head = json.loads((await client.call_tool(
+            "read_report", {"handle": opened["handle"], "length": 100})).content[0].text)
+        checked = json.loads((await client.call_tool("check_report", {"uri": opened["uri"]})).content[0].text)
+        return opened, section, head, checked
+
+
+def test_open_and_read_tools():
+    """open_report 返回与 ETag 相同的句柄和章节目录，read_report 只返回请求的部分"""
+    import streaming_main
+    with tempfile.TemporaryDirectory() as tmp:
+        reader = streaming_main.generator.report_reader
+        streaming_main.generator.report_reader = ReportReader(ReportWriter(tmp))
+        try:
+            opened, section, head, checked = asyncio.run(open_and_read(streaming_main.mcp))
+        finally:
+            streaming_main.generator.report_reader = reader
+    assert opened["handle"] == checked["etag"] and opened["uri"] == checked["uri"]
+    assert len(opened["sections"]) == 8
+    assert section["section"] == "一、服务概况" and "服务总量" in section["content"]
+    assert head["offset"] == 0 and head["length"] <= 100 and head["next_offset"] == head["length"]
+    assert head["total_bytes"] == opened["bytes"]
+
+
+if __name__ == "__main__":
+    test_byte_ranges_align_to_characters()
+    test_sections_cover_report()
+    test_invalid_handles_and_ranges()
+    test_open_and_read_tools()
+    print("✓ 所有测试通过！")
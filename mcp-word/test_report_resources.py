@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证报告资源的读取、ETag 条件获取和资源更新通知
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mcp import types
+from mcp.shared.memory import create_connected_server_and_client_session
+from pydantic import AnyUrl
+
+import main
+from data_providers import MockDataProvider
+from report_reader import ReportReader
+from report_resources import parse_report_uri, report_uri, URI_TEMPLATE
+from report_writer import ReportWriter
+
+
+class VersionedDataProvider(MockDataProvider):
+    """数据指纹随版本号变化的模拟数据源"""
+    version = 0
+
+    async def fingerprint(self, period, system_name=None):
+        return str(self.version)
+
+
+def test_report_uri_round_trip():
+    """系统名称按URL编码，周期别名和日期范围都能解析"""
+    uri = report_uri("统建系统 A", "month")
+    assert uri.startswith("report://%E7%BB%9F") and main.resources.normalize("report://统建系统 A/month") == uri
+    assert parse_report_uri(uri)[1] == "month"
+    report_type, system_name, period = main.resources.resolve(*parse_report_uri(uri))
+    assert (report_type, system_name) == ("month", "统建系统 A")
+    assert main.resources.resolve("all", "2025-11-01_2025-11-30")[0] == "month"
+    assert main.resources.resolve("all", "2025-11-05_2025-11-14")[0] == "custom"
+    for bad in ("report://all", "file://all/month", "report://all/daily"):
+        try:
+            main.resources.resolve(*parse_report_uri(bad))
+            assert False, "应抛出异常"
+        except Exception as e:
+            assert "无效" in str(e)
+
+
+async def read_and_check():
+    async with create_connected_server_and_client_session(main.mcp._mcp_server) as client:
+        templates = await client.list_resource_templates()
+        assert URI_TEMPLATE in [template.uriTemplate for template in templates.resourceTemplates]
+        assert client.get_server_capabilities().resources.subscribe
+
+        result = await client.read_resource(AnyUrl("report://all/month"))
+        content = result.contents[0]
+        assert content.mimeType == "text/html" and "</html>" in content.text
+
+        checked = json.loads((await client.call_tool("check_report", {"uri": "report://all/month"})).content[0].text)
+        assert checked["changed"] and checked["bytes"] == len(content.text.encode("utf-8"))
+        assert checked["uri"] == main.resources.uri_for(None, main.generator.get_time_period("month"))
+        unchanged = await client.call_tool("check_report", {"uri": checked["uri"], "etag": checked["etag"]})
+        assert json.loads(unchanged.content[0].text)["changed"] is False
+        return content.text, checked
+
+
+def test_read_resource_and_check_etag():
+    """资源内容与生成的报告一致；传入当前 ETag 时报告未变化，且不返回报告内容"""
+    text, checked = asyncio.run(read_and_check())
+    assert text == main.generator.generate_report("month")
+    assert "</html>" not in json.dumps(checked)
+
+
+async def subscribe_and_change_data():
+    updated = []
+    received = asyncio.Event()
+
+    async def on_message(message):
+        if isinstance(message, types.ServerNotification) and isinstance(message.root, types.ResourceUpdatedNotification):
+            updated.append(str(message.root.params.uri))
+            received.set()
+
+    async with create_connected_server_and_client_session(main.mcp._mcp_server, message_handler=on_message) as client:
+        await client.read_resource(AnyUrl("report://all/week"))
+        await client.subscribe_resource(AnyUrl("report://all/week"))
+        assert main.resources.subscriptions() == 1
+
+        # 数据未变化时读取不会触发通知
+        await main.resources.get("all", "week")
+        await asyncio.sleep(0.1)
+        assert not updated
+
+        main.generator.data_provider.version += 1
+        await main.resources.get("all", "week")
+        await asyncio.wait_for(received.wait(), 5)
+
+        await client.unsubscribe_resource(AnyUrl("report://all/week"))
+        assert main.resources.subscriptions() == 0
+    return updated
+
+
+def test_subscribers_notified_when_report_changes():
+    """数据变化导致报告重新渲染且内容变化时，订阅者收到资源更新通知"""
+    provider = main.generator.data_provider
+    main.generator.data_provider = VersionedDataProvider()
+    try:
+        updated = asyncio.run(subscribe_and_change_data())
+    finally:
+        main.generator.data_provider = provider
+    assert "report://all/week" in updated
+
+
+def test_http_conditional_fetch():
+    """HTTP响应带 ETag，If-None-Match 相同时返回 304 且不含报告内容；接受gzip时发送预压缩文件"""
+    from starlette.testclient import TestClient
+    writer, reader = main.generator.report_writer, main.generator.report_reader
+    with tempfile.TemporaryDirectory() as tmp:
+        main.generator.report_writer = ReportWriter(tmp)
+        main.generator.report_reader = ReportReader(main.generator.report_writer)
+        try:
+            client = TestClient(main.mcp.sse_app())
+            response = client.get("/reports/all/quarter", headers={"Accept-Encoding": "identity"})
+            assert response.status_code == 200 and "</html>" in response.text
+            assert "content-encoding" not in response.headers and response.headers["vary"] == "Accept-Encoding"
+            etag = response.headers["etag"]
+            cached = client.get("/reports/all/quarter", headers={"If-None-Match": etag})
+            assert cached.status_code == 304 and not cached.content
+
+            with client.stream("GET", "/reports/all/quarter", headers={"Accept-Encoding": "gzip"}) as compressed:
+                raw = b"".join(compressed.iter_raw())
+            assert compressed.headers["content-encoding"] == "gzip" and compressed.headers["etag"] == etag
+            assert gzip.decompress(raw).decode("utf-8") == response.text
+            assert int(compressed.headers["content-length"]) == len(raw) < len(response.content)
+            assert client.get("/reports/all/daily").status_code == 404
+        finally:
+            main.generator.report_writer, main.generator.report_reader = writer, reader
+
+
+if __name__ == "__main__":
+    test_report_uri_round_trip()
+    test_read_resource_and_check_etag()
+    test_subscribers_notified_when_report_changes()
+    test_http_conditional_fetch()
+    print("✓ 所有测试通过！")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证报告的原子写入与分目录保存
+"""
+
+import asyncio
+import gzip
+import os
+import sys
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from report_writer import ReportWriter, write_atomic, select_variant
+
+
+def test_paths_are_sharded_and_unique():
+    """路径按周期日期和系统分目录，同一时刻生成的文件名也不重复"""
+    writer = ReportWriter("out")
+    period = {"start_date": datetime(2025, 11, 3)}
+    paths = {writer.path_for("装备调度/管理 系统", period) for _ in range(1000)}
+    assert len(paths) == 1000
+    path = paths.pop()
+    assert path.startswith(os.path.join("out", "2025-11-03", "装备调度_管理_系统", "运维服务报告_"))
+    assert writer.path_for(None, period).split(os.sep)[2] == "全部系统"
+
+
+def test_concurrent_async_writes_do_not_clobber():
+    """并发写入的报告各自保存，不留下临时文件"""
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = ReportWriter(tmp, content_addressed=False, precompress=False)
+
+        async def write_all():
+            return await asyncio.gather(*(
+                asyncio.to_thread(writer.write, f"报告{i}", writer.path_for("系统A")) for i in range(50)
+            ))
+
+        paths = asyncio.run(write_all())
+        assert len(set(paths)) == 50
+        for i, path in enumerate(paths):
+            with open(path, 'r', encoding='utf-8') as f:
+                assert f.read() == f"报告{i}"
+        directory = os.path.dirname(paths[0])
+        assert sorted(os.listdir(directory)) == sorted(os.path.basename(path) for path in paths)
+
+
+def test_atomic_write_keeps_old_file_on_failure():
+    """写入失败时保留原文件并清理临时文件"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "report.html")
+        write_atomic(path, b"old")
+        try:
+            write_atomic(path, "not bytes")
+        except TypeError:
+            pass
+        with open(path, 'rb') as f:
+            assert f.read() == b"old"
+        assert os.listdir(tmp) == ["report.html"]
+
+
+def test_identical_reports_are_stored_once_with_compressed_variants():
+    """相同内容只存储一份，报告旁边有可直接发送的gzip文件"""
+    with tempfile.TemporaryDirectory() as tmp:
+        writer = ReportWriter(tmp)
+        content = "<html>" + "<style>body { color: #333; }</style>" * 200 + "</html>"
+        first = writer.write(content, writer.path_for("系统A"))
+        second = writer.write(content, writer.path_for("系统B"))
+        assert os.path.samefile(first, second)
+        assert os.stat(first).st_nlink == 3, "对象文件与两个报告路径共享同一份数据"
+
+        with open(first + ".gz", 'rb') as f:
+            compressed = f.read()
+        assert gzip.decompress(compressed).decode("utf-8") == content
+        assert len(compressed) < len(content) / 10
+        assert select_variant(first, "gzip, deflate") == (first + ".gz", "gzip")
+        assert select_variant(first, "identity") == (first, None)
+
+        explicit = os.path.join(tmp, "report.html")
+        writer.write(content, explicit, archive=False)
+        assert not os.path.exists(explicit + ".gz") and os.stat(explicit).st_nlink == 1
+
+
+if __name__ == "__main__":
+    test_paths_are_sharded_and_unique()
+    test_concurrent_async_writes_do_not_clobber()
+    test_atomic_write_keeps_old_file_on_failure()
+    test_identical_reports_are_stored_once_with_compressed_variants()
+    print("✓ 所有测试通过！")
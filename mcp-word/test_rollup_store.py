@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证日汇总存储的增量导入与按日期范围求和
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from metrics_engine import MetricsEngine, TicketTable
+from rollup_store import RollupStore, RollupDataProvider
+from period_engine import PeriodEngine
+from test_metrics_engine import COLUMNS, TICKETS, START, END, make_table
+
+
+def test_rollups_match_raw_ticket_metrics():
+    """日汇总求和的结果与扫描原始工单一致"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RollupStore(os.path.join(tmp, "rollups.db"))
+        store.add_tickets(make_table())
+        engine = MetricsEngine(make_table())
+        for system_name in ("装备调度管理系统", None, "不存在的系统"):
+            assert store.compute(START, END, system_name) == engine.compute(START, END, system_name)
+        month = (datetime(2025, 10, 1), datetime(2025, 11, 30))
+        assert store.compute(*month) == engine.compute(*month)
+        periods = PeriodEngine().trend(PeriodEngine().period_at("week", START), 4)
+        for system_name in ("装备调度管理系统", None):
+            trend = store.compute(START, END, system_name, periods)
+            assert trend == engine.compute(START, END, system_name, periods)
+        assert [item["total"] for item in trend["trend_series"]] == [0, 0, 2, 5]
+
+
+def test_incremental_add_and_replace_days():
+    """累加导入按日期合并计数，替换导入只重算覆盖的日期"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RollupStore(os.path.join(tmp, "rollups.db"))
+        store.add_tickets(TicketTable(dict(zip(COLUMNS, zip(*TICKETS[:3])))))
+        store.add_tickets(TicketTable(dict(zip(COLUMNS, zip(*TICKETS[3:])))))
+        assert store.compute(START, END) == MetricsEngine(make_table()).compute(START, END)
+        assert store.revision() == "2"
+
+        # 11-05 的事件工单重新导出为已解决
+        reexport = [list(TICKETS[2])]
+        reexport[0][5] = "1"
+        store.replace_days(TicketTable(dict(zip(COLUMNS, zip(*reexport)))))
+        data = store.compute(START, END, "装备调度管理系统")
+        assert data["total_service"] == 4 and data["unresolved_current"] == 0
+        assert store.revision() == "3"
+
+
+def test_replace_days_keeps_other_systems():
+    """替换导入只替换重新导出的系统，其他系统同一天的汇总行保持不变"""
+    other_system = ["2025-11-05 16:00:00", "其他系统", "事件", "人工", "系统BUG", "0", "0", "0", "", "0"]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = RollupStore(os.path.join(tmp, "rollups.db"))
+        store.add_tickets(TicketTable(dict(zip(COLUMNS, zip(*(TICKETS + [other_system]))))))
+        before = store.compute(START, END, "其他系统")
+        assert before["total_service"] == 2 and before["unresolved_current"] == 1
+
+        reexport = [list(TICKETS[2])]
+        reexport[0][5] = "1"
+        store.replace_days(TicketTable(dict(zip(COLUMNS, zip(*reexport)))))
+        assert store.compute(START, END, "其他系统") == before
+        assert store.compute(START, END, "装备调度管理系统")["unresolved_current"] == 0
+        assert store.compute(START, END)["total_service"] == 6
+
+
+def test_rollup_provider_fingerprint_follows_revision():
+    """数据源指纹随导入而变化"""
+    with tempfile.TemporaryDirectory() as tmp:
+        provider = RollupDataProvider(RollupStore(os.path.join(tmp, "rollups.db")))
+        period = {"start_date": START, "end_date": END}
+        before = asyncio.run(provider.fingerprint(period))
+        provider.store.add_tickets(make_table())
+        assert asyncio.run(provider.fingerprint(period)) != before
+        data = asyncio.run(provider.fetch(period, "装备调度管理系统"))
+        assert data["total_service"] == 4 and data["previous_total"] == 2
+
+
+if __name__ == "__main__":
+    test_rollups_match_raw_ticket_metrics()
+    test_incremental_add_and_replace_days()
+    test_replace_days_keeps_other_systems()
+    test_rollup_provider_fingerprint_follows_revision()
+    print("✓ 所有测试通过！")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证多进程部署的共享缓存与应用工厂
+"""
+
+import asyncio
+import importlib
+import os
+import sys
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from report_cache import SharedReportCache
+from report_writer import ReportWriter
+
+
+TEMPLATE_PATH = "统建系统运维服务周月报模板-20251110.html"
+
+
+def test_shared_cache_is_visible_across_instances():
+    """同一数据库文件的多个缓存实例共享内容，按最久未使用淘汰、按存活时间过期"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.db")
+        first = SharedReportCache(path, max_entries=2, access_update_interval=0)
+        second = SharedReportCache(path, max_entries=2, access_update_interval=0)
+        first.put(("week", None), {"content": "报告", "output_path": None}, 10)
+        assert second.get(("week", None)) == {"content": "报告", "output_path": None}
+
+        first.put("b", 2, 10)
+        assert first.get(("week", None)) is not None
+        second.put("c", 3, 10)
+        assert first.get("b") is None, "最久未使用的条目应被淘汰"
+        assert len(first) == 2 and second.stats()["evictions"] == 1
+
+        short = SharedReportCache(path, ttl=0.01)
+        short.put("d", 4)
+        time.sleep(0.02)
+        assert first.get("d") is None and first.stats()["expirations"] == 1
+
+
+def test_shared_cache_reads_without_blocking_writes():
+    """命中时最近访问时间未过期则不写数据库；协程接口在线程中读写，淘汰按索引读取"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = SharedReportCache(os.path.join(tmp, "cache.db"))
+        cache.put("a", 1, 10)
+        connection = cache._connect()
+        changes = connection.total_changes
+        assert cache.get("a") == 1 and connection.total_changes == changes
+
+        async def use_cache():
+            await cache.put_async("b", 2, 10)
+            return await cache.get_async("b")
+
+        assert asyncio.run(use_cache()) == 2
+        plan = connection.execute(
+            "EXPLAIN QUERY PLAN SELECT key, size FROM report_cache ORDER BY accessed_at, rowid").fetchall()
+        assert "USING INDEX report_cache_lru" in str(plan)
+
+
+def test_generators_share_reports_through_cache():
+    """使用同一共享缓存的两个生成器（模拟两个工作进程）复用已生成的报告文件"""
+    from main import ReportGenerator
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "cache.db")
+        workers = [ReportGenerator(TEMPLATE_PATH, report_cache=SharedReportCache(cache_path),
+                                   report_writer=ReportWriter(tmp)) for _ in range(2)]
+        fetches = []
+        for worker in workers:
+            fetch = worker.data_provider.fetch
+
+            async def counting_fetch(period, system_name=None, fetch=fetch):
+                fetches.append(system_name)
+                return await fetch(period, system_name)
+
+            worker.data_provider.fetch = counting_fetch
+
+        first_path = workers[0].generate_and_save_report("month", "系统A")
+        assert workers[1].generate_and_save_report("month", "系统A") == first_path
+        assert fetches == ["系统A"]
+        assert workers[1].report_cache.stats()["hits"] == 1
+
+
+def test_relative_path_settings_resolve_against_launch_directory():
+    """相对路径按启动目录转为绝对路径，未设置共享缓存时使用服务目录下的默认数据库"""
+    import serve
+    saved = {name: os.environ.get(name) for name in serve.PATH_SETTINGS}
+    try:
+        for name in serve.PATH_SETTINGS:
+            os.environ.pop(name, None)
+        os.environ["REPORT_ROLLUP_DB"] = "data/rollups.db"
+        serve.resolve_path_settings()
+        assert os.environ["REPORT_ROLLUP_DB"] == os.path.join(os.getcwd(), "data", "rollups.db")
+        assert os.environ["REPORT_CACHE_DB"] == os.path.join(serve.APP_DIR, serve.DEFAULT_CACHE_DB)
+        assert "REPORT_OUTPUT_DIR" not in os.environ
+        serve.resolve_path_settings("cache/shared.db")
+        assert os.environ["REPORT_CACHE_DB"] == os.path.join(os.getcwd(), "cache", "shared.db")
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def test_app_factory_is_stateless_with_metrics_route():
+    """工作进程的应用使用无状态会话，并提供 /metrics；测试后恢复服务模块的会话设置"""
+    import serve
+    from starlette.testclient import TestClient
+
+    module = importlib.import_module(os.environ.get("REPORT_SERVER_MODULE", "streaming_main"))
+    # 无状态设置和随之创建的会话管理器都留在模块级的 mcp 上
+    stateless_http, session_manager = module.mcp.settings.stateless_http, module.mcp._session_manager
+    try:
+        app = serve.create_app()
+        assert module.mcp.settings.stateless_http
+        paths = {route.path for route in app.routes}
+        assert {"/mcp", "/metrics"} <= paths
+        assert TestClient(app).get("/metrics").status_code == 200
+    finally:
+        module.mcp.settings.stateless_http, module.mcp._session_manager = stateless_http, session_manager
+
+
+if __name__ == "__main__":
+    test_shared_cache_is_visible_across_instances()
+    test_shared_cache_reads_without_blocking_writes()
+    test_generators_share_reports_through_cache()
+    test_relative_path_settings_resolve_against_launch_directory()
+    test_app_factory_is_stateless_with_metrics_route()
+    print("✓ 所有测试通过！")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证服务指标的计时、计数与Prometheus导出
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from server_metrics import ServerMetrics
+from report_writer import ReportWriter
+
+
+TEMPLATE_PATH = "统建系统运维服务周月报模板-20251110.html"
+
+
+def test_timer_records_calls_errors_and_bytes():
+    """计时上下文记录调用次数、字节数，异常计为错误并继续抛出"""
+    metrics = ServerMetrics()
+    with metrics.stage("render") as timing:
+        timing.bytes = 100
+    try:
+        with metrics.stage("render"):
+            raise ValueError("失败")
+    except ValueError:
+        pass
+    metrics.increment("cache_hits", 2)
+
+    snapshot = metrics.snapshot()
+    render = snapshot["stages"]["render"]
+    assert render["calls"] == 2 and render["errors"] == 1 and render["bytes"] == 100
+    assert render["max_ms"] >= render["mean_ms"] >= 0
+    assert snapshot["counters"] == {"cache_hits": 2}
+
+
+def test_prometheus_histogram_is_cumulative():
+    """直方图分桶累计计数，+Inf 等于调用次数"""
+    metrics = ServerMetrics(buckets=(0.001, 0.01))
+    metrics.observe("stage", "fetch", 500_000)
+    metrics.observe("stage", "fetch", 5_000_000)
+    metrics.observe("stage", "fetch", 50_000_000)
+    metrics.observe("tool", 'say "hi"', 1_000, error=True)
+    text = metrics.prometheus_text({"cache_entries": 3})
+
+    assert 'report_stage_duration_seconds_bucket{stage="fetch",le="0.001"} 1' in text
+    assert 'report_stage_duration_seconds_bucket{stage="fetch",le="0.01"} 2' in text
+    assert 'report_stage_duration_seconds_bucket{stage="fetch",le="+Inf"} 3' in text
+    assert 'report_stage_duration_seconds_sum{stage="fetch"} 0.055500000' in text
+    assert 'report_tool_errors_total{tool="say \\"hi\\""} 1' in text
+    assert "report_cache_entries 3" in text
+
+
+def test_generator_records_each_stage():
+    """生成报告时记录各阶段耗时，缓存命中时不再取数和渲染"""
+    from main import ReportGenerator
+    with tempfile.TemporaryDirectory() as tmp:
+        generator = ReportGenerator(TEMPLATE_PATH, report_writer=ReportWriter(tmp))
+        generator.generate_and_save_report("week")
+        generator.generate_and_save_report("week")
+    snapshot = generator.metrics.snapshot()
+    stages = snapshot["stages"]
+    for stage in ("period", "fingerprint", "fetch", "render", "write"):
+        assert stage in stages, stage
+    assert stages["fetch"]["calls"] == 1 and stages["period"]["calls"] == 2
+    assert stages["render"]["bytes"] == stages["write"]["bytes"] > 0
+    assert snapshot["counters"] == {"cache_hits": 1, "cache_misses": 1}
+
+
+def test_streaming_tools_and_metrics_endpoint():
+    """流式生成记录渲染耗时，工具调用被计数，/metrics 返回Prometheus文本"""
+    import streaming_main
+    from starlette.testclient import TestClient
+
+    # 缓存命中时不渲染，先清空缓存以统计流式渲染
+    streaming_main.generator.report_cache.clear()
+    asyncio.run(streaming_main.generate_weekly_report_streaming(include_content=False))
+    content, _ = asyncio.run(streaming_main.mcp.call_tool("get_server_metrics", {}))
+    snapshot = json.loads(content[0].text)
+    assert snapshot["tools"]["generate_weekly_report_streaming"]["calls"] >= 1
+    assert snapshot["stages"]["render_streaming"]["bytes"] > 0
+
+    response = TestClient(streaming_main.mcp.sse_app()).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'report_tool_calls_total{tool="generate_weekly_report_streaming"}' in response.text
+    assert "report_templates 1" in response.text
+
+
+if __name__ == "__main__":
+    test_timer_records_calls_errors_and_bytes()
+    test_prometheus_histogram_is_cumulative()
+    test_generator_records_each_stage()
+    test_streaming_tools_and_metrics_endpoint()
+    print("✓ 所有测试通过！")
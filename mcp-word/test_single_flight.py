@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证相同并发请求的合并
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from single_flight import SingleFlight
+from report_writer import ReportWriter
+
+
+TEMPLATE_PATH = "统建系统运维服务周月报模板-20251110.html"
+
+
+def test_concurrent_calls_share_one_execution():
+    """同一键的并发调用只执行一次，不同键各自执行，结束后重新执行"""
+    flight = SingleFlight()
+    calls = []
+
+    async def work(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return f"结果{key}"
+
+    async def run():
+        results = await asyncio.gather(*(flight.do(key, lambda key=key: work(key)) for key in "aaab"))
+        assert len(flight) == 0
+        await flight.do("a", lambda: work("a"))
+        return results
+
+    assert asyncio.run(run()) == ["结果a", "结果a", "结果a", "结果b"]
+    assert calls == ["a", "b", "a"]
+    assert flight.coalesced == 2
+
+
+def test_errors_and_cancellation():
+    """异常传给所有调用方；某个调用方被取消不影响其他调用方"""
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise Exception("取数失败")
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "完成"
+
+    async def run():
+        results = await asyncio.gather(flight.do("x", fail), flight.do("x", fail), return_exceptions=True)
+        assert [str(result) for result in results] == ["取数失败", "取数失败"]
+
+        first = asyncio.ensure_future(flight.do("y", slow))
+        second = asyncio.ensure_future(flight.do("y", slow))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        assert await second == "完成"
+
+    asyncio.run(run())
+
+
+def test_generator_coalesces_identical_reports():
+    """相同的并发报告请求只取数一次，返回同一个文件"""
+    from main import ReportGenerator
+    with tempfile.TemporaryDirectory() as tmp:
+        generator = ReportGenerator(TEMPLATE_PATH, report_writer=ReportWriter(tmp))
+        fetches = []
+        fetch = generator.data_provider.fetch
+
+        async def counting_fetch(period, system_name=None):
+            fetches.append(system_name)
+            await asyncio.sleep(0.01)
+            return await fetch(period, system_name)
+
+        generator.data_provider.fetch = counting_fetch
+
+        async def run():
+            return await asyncio.gather(
+                *(generator.generate_and_save_report_async("week", "系统A") for _ in range(5)),
+                generator.generate_and_save_report_async("week", "系统B"),
+            )
+
+        paths = asyncio.run(run())
+        assert len(set(paths[:5])) == 1 and paths[5] != paths[0]
+        assert sorted(fetches) == ["系统A", "系统B"]
+        assert generator.metrics.snapshot()["counters"]["coalesced_requests"] == 4
+        assert len(os.listdir(os.path.dirname(paths[0]))) == 2, "只生成一份报告及其压缩文件"
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_share_one_execution()
+    test_errors_and_cancellation()
+    test_generator_coalesces_identical_reports()
+    print("✓ 所有测试通过！")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证流式工具在生成过程中通过MCP通知逐章节推送HTML
+"""
+
+import asyncio
+import json
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from streaming_main import mcp, generator, STREAM_LOGGER
+from report_reader import ReportReader, index_sections
+from report_writer import ReportWriter
+
+
+async def collect_streamed_chunks_async(tool_name: str, arguments: dict):
+    """调用工具并收集期间收到的日志通知"""
+    chunks = []
+
+    async def on_log(params):
+        if params.logger == STREAM_LOGGER:
+            chunks.append(params.data)
+
+    async with create_connected_server_and_client_session(mcp._mcp_server, logging_callback=on_log) as client:
+        result = await client.call_tool(tool_name, arguments)
+    return chunks, result.content[0].text
+
+
+def collect_streamed_chunks(tool_name: str, arguments: dict):
+    return asyncio.run(collect_streamed_chunks_async(tool_name, arguments))
+
+
+def test_sections_streamed_as_notifications():
+    """每个章节作为独立的通知发送，拼接后即为完整报告"""
+    generator.report_cache.clear()
+    chunks, text = collect_streamed_chunks("generate_weekly_report_streaming", {})
+    html_chunks = [chunk for chunk in chunks if "<" in chunk]
+    assert len(html_chunks) == len(generator.compiled_template.sections), "章节未逐个推送"
+    assert html_chunks[0].startswith("<!DOCTYPE html>")
+    assert "".join(chunks) == text, "通知内容与工具结果不一致"
+
+
+def test_streaming_without_content_in_result():
+    """关闭 include_content 时工具结果只返回摘要和报告资源URI"""
+    chunks, text = collect_streamed_chunks("generate_monthly_report_streaming", {"include_content": False})
+    assert "</html>" in "".join(chunks)
+    assert "<html" not in text and f"共 {len(chunks)} 个内容块" in text
+    assert "报告资源: report://all/" in text
+
+
+async def stream_then_open(tool_name: str):
+    """流式生成（结果不附带内容）后按报告资源打开并读取全文"""
+    chunks, text = await collect_streamed_chunks_async(tool_name, {"include_content": False})
+    uri = text.rsplit("报告资源: ", 1)[1].strip()
+    async with create_connected_server_and_client_session(mcp._mcp_server) as client:
+        opened = json.loads((await client.call_tool("open_report", {"uri": uri})).content[0].text)
+        result = await client.call_tool("read_report", {"handle": opened["handle"], "length": 1024 * 1024})
+    return chunks, json.loads(result.content[0].text)["content"]
+
+
+def test_streamed_report_matches_cache_and_handle():
+    """流式发送的报告写入缓存：再次流式生成发送相同内容，按资源URI打开的报告与发送的内容一致"""
+    generator.report_cache.clear()
+    reader = generator.report_reader
+    with tempfile.TemporaryDirectory() as tmp:
+        generator.report_reader = ReportReader(ReportWriter(tmp))
+        try:
+            chunks, opened = asyncio.run(stream_then_open("generate_weekly_report_streaming"))
+        finally:
+            generator.report_reader = reader
+    streamed = "".join(chunk for chunk in chunks if "<" in chunk)
+    assert opened == streamed
+
+    replayed, _ = collect_streamed_chunks("generate_weekly_report_streaming", {})
+    assert "".join(chunk for chunk in replayed if "<" in chunk) == streamed
+
+
+def test_cache_hit_streams_same_sections_as_miss():
+    """缓存命中时按报告目录切分发送的章节与未命中时逐章节渲染的章节相同，章节标题也相同"""
+    generator.report_cache.clear()
+    missed, _ = collect_streamed_chunks("generate_monthly_report_streaming", {})
+    hit, _ = collect_streamed_chunks("generate_monthly_report_streaming", {})
+    missed_sections = [chunk for chunk in missed if "<" in chunk]
+    assert [chunk for chunk in hit if "<" in chunk] == missed_sections, "缓存命中与未命中时发送的章节不同"
+    outline = index_sections("".join(missed_sections).encode("utf-8"))
+    assert [section["title"] for section in outline] == generator.compiled_template.section_titles
+    assert outline[-1]["title"] == "页脚"
+
+
+if __name__ == "__main__":
+    test_sections_streamed_as_notifications()
+    test_streaming_without_content_in_result()
+    test_streamed_report_matches_cache_and_handle()
+    test_cache_hit_streams_same_sections_as_miss()
+    print("✓ 所有测试通过！")
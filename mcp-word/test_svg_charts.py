@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证内嵌SVG图表的绘制与缓存
+"""
+
+import os
+import sys
+import xml.etree.ElementTree as ElementTree
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from svg_charts import ChartCache, category_chart, trend_chart, CATEGORY_LIMIT
+from template_engine import build_template_values
+from test_template_engine import make_data
+
+
+SVG = "{http://www.w3.org/2000/svg}"
+CATEGORIES = [{"name": f"装备调度管理系统/类别<{index}>", "count": index, "percentage": 0} for index in range(15)]
+SERIES = [{"label": f"2025年{month:02d}月", "total": 80 + month} for month in range(1, 13)]
+
+
+def test_charts_are_well_formed_and_compact():
+    """图表是合法的SVG：类别超出上限的部分合并为"其他"，名称经过转义，趋势每个周期一个点"""
+    cache = ChartCache()
+    root = ElementTree.fromstring(category_chart(CATEGORIES, cache))
+    assert len(root.findall(f".//{SVG}rect")) == CATEGORY_LIMIT + 1
+    texts = [element.text for element in root.iter(f"{SVG}text")]
+    assert texts[0] == "类别<14>" and "其他" in texts
+
+    svg = trend_chart(SERIES, cache)
+    root = ElementTree.fromstring(svg)
+    assert len(root.findall(f".//{SVG}circle")) == len(SERIES)
+    assert "\n" not in svg and len(svg) < 3000
+    assert category_chart([], cache) == "" and trend_chart([], cache) == ""
+    assert ElementTree.fromstring(trend_chart(SERIES[:1], cache)).find(f".//{SVG}polyline") is not None
+
+
+def test_charts_cached_by_input_data():
+    """相同输入只绘制一次，数据变化时重新绘制；缓存按最久未使用淘汰"""
+    cache = ChartCache(max_entries=2)
+    first = category_chart(CATEGORIES, cache)
+    assert category_chart([dict(category) for category in CATEGORIES], cache) is first
+    changed = [dict(category, count=category["count"] + 1) for category in CATEGORIES]
+    assert category_chart(changed, cache) != first
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 2}
+    trend_chart(SERIES, cache)
+    category_chart(CATEGORIES, cache)
+    assert cache.stats()["misses"] == 4
+
+
+def test_report_values_include_charts():
+    """报告的模板值包含两张图表（绘制耗时由 benchmark.py 的 render_charts 阶段测量）"""
+    values = build_template_values(make_data(service_categories=CATEGORIES, trend_series=SERIES),
+                                   {"type": "月", "period": "x"})
+    assert values["category_chart"].startswith("<svg") and values["trend_chart"].startswith("<svg")
+
+
+if __name__ == "__main__":
+    test_charts_are_well_formed_and_compact()
+    test_charts_cached_by_input_data()
+    test_report_values_include_charts()
+    print("✓ 所有测试通过！")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证模板引擎的编译与渲染
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from main import ReportGenerator
+from report_cache import ReportCache
+from template_engine import CompiledTemplate, build_template_values, build_template_rows
+
+
+TEMPLATE_PATH = "统建系统运维服务周月报模板-20251110.html"
+
+
+def make_data(**overrides):
+    """构造固定的报告数据"""
+    data = {
+        "total_service": 120, "service_request": 60, "incident": 5, "approval": 55,
+        "self_service": 30, "manual_service": 40, "previous_total": 100, "change_rate": -3.5,
+        "resolution_rate": 97, "completion_rate": 98, "timeliness_rate": 96, "satisfaction_rate": 99,
+        "unresolved_current": 0, "unresolved_history": 3, "knowledge_base": 2,
+        "service_categories": [],
+    }
+    data.update(overrides)
+    return data
+
+
+def test_compiled_template_covers_all_placeholders():
+    """所有占位符都应被编译为槽位"""
+    generator = ReportGenerator(TEMPLATE_PATH)
+    template = generator.compiled_template
+    literals = "".join(literal for section in template.sections for literal in section.literals)
+    assert literals.count("【") == 0, "模板中仍有未识别的占位符"
+    assert template.slot_names.count("period_type") == 2
+    assert template.slot_names[-1] == "generated_at"
+
+
+def test_values_are_substituted_once():
+    """已替换的值不会被后续规则再次替换"""
+    generator = ReportGenerator(TEMPLATE_PATH)
+    period = generator.get_time_period("week")
+    report = generator.replace_template_variables(generator.template_content, make_data(), period)
+    # 事件数为5、本期未解决为0，旧实现会把【5】再替换为历史未解决数
+    assert '<div class="number">【5】</div>\n                    <div class="label">事件</div>' in report
+    assert '<div class="number">【0】</div>\n                    <div class="label">本期未解决</div>' in report
+    assert "【96】%" in report and "【99】%" in report, "及时率/满意度未使用各自的数据"
+    assert "【下降】【3.5】%" in report
+
+
+def test_render_keeps_unknown_slots():
+    """缺少取值的槽位保留原占位符"""
+    template = CompiledTemplate("共【90】条，事件【0】条")
+    assert template.render({"total_service": "【7】"}) == "共【7】条，事件【0】条"
+    values = build_template_values(make_data(), {"type": "月", "period": "x"})
+    assert template.render(values) == "共【120】条，事件【5】条"
+
+
+def test_category_rows_rendered_from_data():
+    """服务类别表格按数据逐行渲染"""
+    generator = ReportGenerator(TEMPLATE_PATH)
+    period = generator.get_time_period("month")
+    categories = [{"name": f"系统<{i}>/类别", "count": i, "percentage": i / 3} for i in range(5000)]
+    report = generator.replace_template_variables(
+        generator.template_content, make_data(service_categories=categories), period)
+    # 类别表和趋势表各有一行表头，数据中没有趋势序列
+    assert report.count("<tr>") == len(categories) + 2, "类别行数与数据不一致"
+    assert "<td>系统&lt;4999&gt;/类别</td>" in report, "类别名称未转义"
+    assert "<td>1.33%</td>" in report
+    assert "循环" not in report
+
+
+def test_sections_reuse_cached_fragments():
+    """只重新渲染输入变化的含循环行块章节，结果与完整渲染一致"""
+    with open(TEMPLATE_PATH, 'r', encoding='utf-8') as f:
+        source = f.read()
+    template = CompiledTemplate(source)
+    template.fragment_cache = cache = ReportCache(ttl=float("inf"))
+    uncached = CompiledTemplate(source, cache_fragments=False)
+    period = {"type": "月", "period": "x"}
+    categories = [{"name": f"类别{i}", "count": i, "percentage": i / 3} for i in range(100)]
+
+    def render(data):
+        values, rows = build_template_values(data, period), build_template_rows(data)
+        report = template.render(values, rows)
+        assert report == uncached.render(values, rows)
+        return report
+
+    render(make_data(service_categories=categories))
+    blocks = sum(1 for section in template.sections if section.blocks)
+    assert cache.stats()["misses"] == blocks == 2
+    # 只有服务指标变化：两个含循环行块的章节都命中缓存
+    render(make_data(service_categories=categories, resolution_rate=50))
+    assert cache.stats()["hits"] == 2
+    # 类别数据变化：只有类别章节重新渲染
+    changed = [dict(category) for category in categories]
+    changed[0]["count"] = 7
+    assert "<td>类别0</td>\n                        <td>7</td>" in render(make_data(service_categories=changed))
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 3
+
+    # 行数据为迭代器时同样可以缓存
+    values = build_template_values(make_data(), period)
+    sections = dict(template.iter_sections(values, {"service_categories": iter(categories)}))
+    assert sections["六、服务类别分布"].count("<tr>") == len(categories) + 1
+
+
+if __name__ == "__main__":
+    test_compiled_template_covers_all_placeholders()
+    test_values_are_substituted_once()
+    test_render_keeps_unknown_slots()
+    test_category_rows_rendered_from_data()
+    test_sections_reuse_cached_fragments()
+    print("✓ 所有测试通过！")
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+测试脚本：验证模板注册表的多模板索引与热更新
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from template_registry import TemplateRegistry, DEFAULT_TEMPLATE
+
+
+def write_file(path: str, content: str, mtime_ns: int):
+    """写入文件并设置修改时间"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_recompiles_only_when_file_changes():
+    """文件未变化时复用已编译模板，变化后重新编译"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "default.html")
+        write_file(path, "共【90】条", 1_000_000_000)
+        registry = TemplateRegistry(check_interval=0)
+        entry = registry.register(DEFAULT_TEMPLATE, path)
+        compiled = entry.compiled
+        version = entry.version
+
+        assert registry.get().compiled is compiled, "文件未变化时不应重新编译"
+
+        write_file(path, "合计【90】条", 2_000_000_000)
+        assert registry.get().compiled is not compiled, "文件变化后未重新编译"
+        assert registry.get().version != version
+        assert registry.get().compiled.render({"total_service": "【1】"}) == "合计【1】条"
+
+
+def test_check_interval_skips_stat():
+    """检查间隔内不访问文件系统"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "default.html")
+        write_file(path, "共【90】条", 1_000_000_000)
+        registry = TemplateRegistry(check_interval=3600)
+        compiled = registry.register(DEFAULT_TEMPLATE, path).compiled
+        write_file(path, "合计【90】条", 2_000_000_000)
+        assert registry.get().compiled is compiled
+
+
+def test_system_templates_fall_back_to_default():
+    """系统专属模板优先，未配置的系统使用通用模板"""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_file(os.path.join(tmp, "default.html"), "通用【90】", 1_000_000_000)
+        write_file(os.path.join(tmp, "default@装备调度管理系统.html"), "专属【90】", 1_000_000_000)
+        registry = TemplateRegistry()
+        assert len(registry.register_directory(tmp)) == 2
+        assert registry.get(system="装备调度管理系统").content == "专属【90】"
+        assert registry.get(system="其他系统").content == "通用【90】"
+
+
+def test_reload_during_fetch_keeps_key_and_content_consistent():
+    """取数期间模板重新加载时，报告仍用计算缓存键时的模板版本渲染，缓存中的内容与键一致"""
+    from data_providers import MockDataProvider
+    from report_cache import ReportCache
+    from report_generator import ReportGenerator
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "default.html")
+        write_file(path, "<p>旧模板 共【90】条</p>", 1_000_000_000)
+        registry = TemplateRegistry(check_interval=0)
+
+        class ReloadingProvider(MockDataProvider):
+            async def fetch(self, period, system_name=None):
+                write_file(path, "<p>新模板 共【90】条</p>", 2_000_000_000)
+                registry.reload()
+                return await super().fetch(period, system_name)
+
+        generator = ReportGenerator(path, templates=registry, report_cache=ReportCache(),
+                                    data_provider=ReloadingProvider())
+        old_version = registry.get().version
+        report = asyncio.run(generator._get_cached_report("week", None))
+        assert report["key"][0] == old_version and "旧模板" in report["content"]
+        assert registry.get().version != old_version and "新模板" in registry.get().content
+
+
+if __name__ == "__main__":
+    test_recompiles_only_when_file_changes()
+    test_check_interval_skips_stat()
+    test_system_templates_fall_back_to_default()
+    test_reload_during_fetch_keeps_key_and_content_consistent()
+    print("✓ 所有测试通过！")